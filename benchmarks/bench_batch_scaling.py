@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Wall time of the batch driver at 1/2/4/8 workers on a synthetic corpus.
+
+Usage:
+    python benchmarks/bench_batch_scaling.py [--logs 200] [--programs 50] [--steps 40]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sas_batch import run_batch
+
+PROGRAM_STEP = """data work.step{i};
+  set lib{j}.source{i};
+  amount = amount * 1.1;
+run;
+
+proc sort data=work.step{i} out=work.sorted{i};
+  by id;
+run;
+
+proc sql;
+  create table work.joined{i} as
+  select a.*, b.rate
+  from work.sorted{i} a
+  left outer join lib{j}.rates b
+  on a.id = b.id;
+quit;
+
+"""
+
+LOG_STEP = """{n0}         data work.step{i};
+{n1}           set lib{j}.source{i};
+{n2}         run;
+
+NOTE: There were 1000 observations read from the data set LIB{j}.SOURCE{i}.
+NOTE: The data set WORK.STEP{i} has 1000 observations and 5 variables.
+NOTE: DATA statement used (Total process time):
+      real time           0.01 seconds
+      cpu time            0.01 seconds
+
+
+{n3}         proc sort data=work.step{i} out=work.sorted{i};
+{n4}           by id;
+{n5}         run;
+
+NOTE: There were 1000 observations read from the data set WORK.STEP{i}.
+NOTE: The data set WORK.SORTED{i} has 1000 observations and 5 variables.
+NOTE: PROCEDURE SORT used (Total process time):
+      real time           0.01 seconds
+      cpu time            0.01 seconds
+
+
+"""
+
+
+def write_corpus(folder, nb_logs, nb_programs, nb_steps):
+    log_files = []
+    program_files = []
+    for f in range(nb_logs):
+        path = os.path.join(folder, "job{}.log".format(f))
+        with open(path, "w") as outfile:
+            for i in range(nb_steps):
+                n = 6 * i + 1
+                outfile.write(LOG_STEP.format(i=i, j=f % 7, n0=n, n1=n + 1, n2=n + 2, n3=n + 3, n4=n + 4, n5=n + 5))
+        log_files.append(path)
+    for f in range(nb_programs):
+        path = os.path.join(folder, "program{}.sas".format(f))
+        with open(path, "w") as outfile:
+            for i in range(nb_steps):
+                outfile.write(PROGRAM_STEP.format(i=i, j=f % 7))
+        program_files.append(path)
+    return log_files, program_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logs", type=int, default=200, help="number of synthetic logs")
+    parser.add_argument("--programs", type=int, default=50, help="number of synthetic programs")
+    parser.add_argument("--steps", type=int, default=40, help="steps per log/program")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        log_files, program_files = write_corpus(folder, args.logs, args.programs, args.steps)
+        cwd = os.getcwd()
+        os.chdir(folder)
+        os.mkdir("output")
+        try:
+            print("corpus: {} logs, {} programs, {} steps each, {} CPUs".format(
+                args.logs, args.programs, args.steps, os.cpu_count()))
+            print("{:>8} {:>10} {:>8}".format("workers", "wall (s)", "speedup"))
+            baseline = None
+            for workers in args.workers:
+                start = time.perf_counter()
+                report = run_batch(log_files, program_files, workers)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print("{:>8} {:>10.2f} {:>7.2f}x".format(workers, elapsed, baseline / elapsed))
+                if report.failures:
+                    print("{} files failed".format(len(report.failures)))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
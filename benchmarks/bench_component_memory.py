@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Memory retained per component on a large log and a large program, compact components (__slots__,
+offsets into a shared buffer, interned names) against the former layout (__dict__, private copy of
+the text and of the names).
+
+The shared buffer, i.e. the text of the log or program, is reported apart: it is held once per file
+whatever the number of components. The saving grows with the size of the components' text, so each
+file is also measured with FULLSTIMER step statistics (log) and with longer DATA steps (program).
+
+Usage:
+    python benchmarks/bench_component_memory.py [--steps 5000] [--statements 20]
+"""
+import argparse
+import contextlib
+import io
+import mmap
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_batch_scaling import LOG_STEP, PROGRAM_STEP
+from sas_log_parser import SASLog, SASLogComponent, classify_note
+from sas_program_mapper import SASProgram
+
+FULLSTIMER = """      real time           0.01 seconds
+      user cpu time       0.01 seconds
+      system cpu time     0.00 seconds
+      memory              1024.53k
+      OS Memory           24556.00k
+      Timestamp           01/15/2019 09:12:45 PM
+      Step Count                        12  Switch Count  2
+      Page Faults                       0
+      Page Reclaims                     215
+      Page Swaps                        0
+      Voluntary Context Switches        9
+      Involuntary Context Switches      0
+      Block Input Operations            0
+      Block Output Operations           264
+"""
+STIMER = """      real time           0.01 seconds
+      cpu time            0.01 seconds
+"""
+
+
+def fresh(value):
+    # Private copy of a value, as each component used to hold its own strings
+    if isinstance(value, str):
+        return (value + " ")[:-1]
+    if isinstance(value, tuple):
+        return tuple(fresh(x) for x in value)
+    if isinstance(value, list):
+        return [fresh(x) for x in value]
+    return value
+
+
+def segment_log_lines(log_lines):
+    """Messages of the lines of a log, each holding a copy of its text, as the logs were segmented
+    line by line before the bytes level segmentation."""
+    current_script_line = 0
+    start_line = None
+    lines = []
+    for line_number, line in enumerate(log_lines, 1):
+        message_start = line.startswith(("NOTE: ", "MACROGEN(EXTRACT):", "WARNING: "))
+        if not message_start:
+            script_line = re.match(r"\d+\s+", line)
+            if script_line is not None and int(script_line.group(0)) >= current_script_line + 1:
+                current_script_line = int(script_line.group(0))
+                message_start = True
+        if message_start:
+            if start_line is not None:
+                yield SASLogComponent(start_line, line_number - 1, "".join(lines))
+            start_line = line_number
+            lines = [line]
+        elif start_line is not None:
+            lines.append(line)
+    if start_line is not None:
+        # The last message of the log runs to the end of the file
+        yield SASLogComponent(start_line, 999999, "".join(lines))
+
+
+class LegacyLogComponent:
+    """Former layout of a log component."""
+    def __init__(self, start_line, end_line, contents):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.contents = contents
+
+
+class LegacyLogNote(LegacyLogComponent):
+    """Former layout of a Note."""
+    def __init__(self, start_line, end_line, contents):
+        super().__init__(start_line, end_line, contents)
+        self.Type, self.data_name, self.End_Proc = classify_note(self.contents)
+        self.ResName = ""
+
+
+class LegacyScriptComponent:
+    """Former layout of a program component, rebuilt from a compact one."""
+    def __init__(self, comp):
+        self.start = comp.start
+        self.end = comp.end
+        self.content = fresh(comp.content)
+        self.regex_sas_data_name = comp.regex_sas_data_name
+        for attribute in ("name", "type", "data", "set", "data_in", "data_out"):
+            if hasattr(comp, attribute):
+                setattr(self, attribute, fresh(getattr(comp, attribute)))
+
+
+def retained_bytes(objects, shared=()):
+    """Bytes reachable from objects, each object counted once, shared buffers excluded."""
+    seen = set(id(x) for x in shared)
+    stack = list(objects)
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(obj, mmap.mmap):
+            total += len(obj)
+            continue
+        if isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, re.Match):
+            stack.append(obj.string)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in cls.__dict__.get("__slots__", ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return total
+
+
+def log_components(path, log_text):
+    with open(path, "w") as outfile:
+        outfile.write(log_text)
+    log = SASLog(path, write_outputs=False)
+    legacy = []
+    with open(path, "r") as infile:
+        for log_message in segment_log_lines(infile):
+            cls = LegacyLogNote if log_message.contents.startswith("NOTE: ") else LegacyLogComponent
+            legacy.append(cls(log_message.start_line, log_message.end_line, log_message.contents))
+    return log.log_buffer, log.log_messages, legacy
+
+
+def program_components(path):
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    os.makedirs("output", exist_ok=True)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sas = SASProgram(path)
+    finally:
+        os.chdir(cwd)
+    compact = {}
+    for components in (sas.components, sas.comment_block, sas.comment_inline, sas.macro_invar_sas,
+                       sas.macro_var_let_sas, sas.macro_var_symput_sas, sas.data_step, sas.proc_sql):
+        for comp in components:
+            compact[id(comp)] = comp
+    compact = list(compact.values())
+    return sas.source, compact, [LegacyScriptComponent(comp) for comp in compact]
+
+
+def report(label, shared, compact, legacy):
+    compact_bytes = retained_bytes(compact, (shared,))
+    shared_bytes = retained_bytes([shared])
+    legacy_bytes = retained_bytes(legacy)
+    print("{:>18} {:>11} {:>14.0f} {:>14.0f} {:>7.1f}x {:>12}".format(
+        label, len(compact), legacy_bytes / len(legacy), compact_bytes / len(compact),
+        legacy_bytes / compact_bytes, shared_bytes))
+
+
+def write_log(nb_steps, log_step):
+    return "".join(log_step.format(i=i, j=i % 7, n0=6 * i + 1, n1=6 * i + 2, n2=6 * i + 3,
+                                   n3=6 * i + 4, n4=6 * i + 5, n5=6 * i + 6)
+                   for i in range(nb_steps))
+
+
+def write_program(path, nb_steps, program_step):
+    with open(path, "w") as outfile:
+        for i in range(nb_steps):
+            outfile.write("/* step {} */\n".format(i) + program_step.format(i=i, j=i % 7))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=5000, help="steps in the log and in the program")
+    parser.add_argument("--statements", type=int, default=20, help="statements of the longer DATA steps")
+    args = parser.parse_args()
+
+    statements = "".join("  x{0} = amount * {0};\n".format(k) for k in range(args.statements))
+    long_program_step = PROGRAM_STEP.replace("  amount = amount * 1.1;\n", "  amount = amount * 1.1;\n" + statements)
+
+    print("{:>18} {:>11} {:>14} {:>14} {:>8} {:>12}".format(
+        "file", "components", "former (B)", "compact (B)", "ratio", "buffer (B)"))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "job.log")
+        for label, log_step in (("log", LOG_STEP), ("log FULLSTIMER", LOG_STEP.replace(STIMER, FULLSTIMER))):
+            report(label, *log_components(path, write_log(args.steps, log_step)))
+
+        path = os.path.join(folder, "program.sas")
+        for label, program_step in (("program", PROGRAM_STEP),
+                                    ("program long steps", long_program_step)):
+            write_program(path, args.steps, program_step)
+            report(label, *program_components(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Parse time of plain, gzip and zstd compressed SAS logs and programs.
+
+The same synthetic job is written plain, as .gz and as .zst. Each copy is parsed without writing
+outputs, and the components of the compressed copies are checked to be those of the plain one.
+The MB/s are those of the decompressed size.
+
+Usage:
+    python benchmarks/bench_compressed.py [--lines 100000] [--repeat 3]
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import zstandard
+
+from sas_synthetic import write_job
+from sas_log_parser import SASLog
+from sas_program_mapper import SASProgram
+
+
+def compress(path):
+    """Write path.gz and path.zst next to path. Returns the paths of the three copies."""
+    with open(path, "rb") as infile:
+        data = infile.read()
+    with gzip.open(path + ".gz", "wb", compresslevel=6) as outfile:
+        outfile.write(data)
+    with open(path + ".zst", "wb") as outfile:
+        outfile.write(zstandard.ZstdCompressor(level=3).compress(data))
+    return {"plain": path, "gzip": path + ".gz", "zstd": path + ".zst"}
+
+
+def log_components(path):
+    sas = SASLog(path, write_outputs=False)
+    return [(type(comp).__name__, comp.start_line, comp.end_line, comp.contents) for comp in sas.log_messages]
+
+
+def program_components(path):
+    sas = SASProgram(path, write_outputs=False)
+    return [(type(comp).__name__, comp.start, comp.end, comp.content) for comp in sas.components]
+
+
+def best_time(function, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000, help="program size in lines")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>10} {:>6} {:>10} {:>9} {:>9} {:>8}  {}".format(
+        "parser", "input", "size (MB)", "time (s)", "MB/s", "ratio", "components"))
+    with tempfile.TemporaryDirectory() as folder:
+        program_path, log_path = write_job(folder, "job", args.lines)
+        for name, function, path in (("SASProgram", program_components, program_path),
+                                     ("SASLog", log_components, log_path)):
+            megabytes = os.path.getsize(path) / (1024 * 1024)
+            reference_time, reference = None, None
+            for kind, copy in compress(path).items():
+                seconds, components = best_time(function, copy, args.repeat)
+                if reference is None:
+                    reference_time, reference = seconds, components
+                print("{:>10} {:>6} {:>10.1f} {:>9.3f} {:>9.1f} {:>7.2f}x  {}".format(
+                    name, kind, os.path.getsize(copy) / (1024 * 1024), seconds, megabytes / seconds,
+                    seconds / reference_time, "same" if components == reference else "DIFFERENT"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Accuracy and throughput of the data sets read from the DATA steps of SASProgram.
+
+A program of DATA steps is generated with the lineage edges each step should give, the steps using
+SET, MERGE, UPDATE and MODIFY, several SET statements, data set and statement options, OUTPUT
+statements and hash objects. The program is parsed in a fresh interpreter. For each kind of step
+the table tells how many of its edges were found, then how many edges were found that no step
+implies. The parse time, and the share of it spent building the components, are those of the
+whole program.
+
+Edges are those of the data_in and data_out of the DataStep components, each input flowing to each
+output. Copy this script to the benchmarks folder of another checkout to measure that one.
+
+Usage:
+    python benchmarks/bench_data_steps.py [--steps 20000] [--repeat 3] [--seed 0]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def edges(data_in, data_out):
+    return {(x, y) for x in data_in for y in data_out}
+
+
+# Each generator returns the text of a step and its expected (input, output) edges
+def set_one(i):
+    return ("data work.a{0};\n  set lib.b{0};\n  x = 1;\nrun;\n".format(i),
+            edges(["lib.b{}".format(i)], ["work.a{}".format(i)]))
+
+
+def set_concat(i):
+    return ("data a{0};\n  set lib.b{0} c{0} lib.d{0};\nrun;\n".format(i),
+            edges(["lib.b{}".format(i), "work.c{}".format(i), "lib.d{}".format(i)], ["work.a{}".format(i)]))
+
+
+def set_options(i):
+    return ("data a{0}(keep=id x);\n  set lib.b{0}(where=(x in (1, 2)) rename=(y=z)) end=eof nobs=n;\nrun;\n"
+            .format(i),
+            edges(["lib.b{}".format(i)], ["work.a{}".format(i)]))
+
+
+def set_lookup(i):
+    return ("data a{0};\n  if _n_ = 1 then set lib.rates{0};\n  set lib.b{0};\n  y = x * rate;\nrun;\n"
+            .format(i),
+            edges(["lib.rates{}".format(i), "lib.b{}".format(i)], ["work.a{}".format(i)]))
+
+
+def set_key(i):
+    return ("data a{0};\n  set lib.b{0};\n  set lib.k{0} key=id / unique;\n  if _iorc_ ne 0 then _error_ = 0;\nrun;\n"
+            .format(i),
+            edges(["lib.b{}".format(i), "lib.k{}".format(i)], ["work.a{}".format(i)]))
+
+
+def merge(i):
+    return ("data a{0};\n  merge lib.b{0}(in=inb) c{0}(in=inc);\n  by id;\n  if inb and inc;\nrun;\n"
+            .format(i),
+            edges(["lib.b{}".format(i), "work.c{}".format(i)], ["work.a{}".format(i)]))
+
+
+def merge_options(i):
+    return ("data a{0};\n  merge lib.b{0} c{0} / nowarn;\n  by id;\nrun;\n".format(i),
+            edges(["lib.b{}".format(i), "work.c{}".format(i)], ["work.a{}".format(i)]))
+
+
+def update(i):
+    return ("data lib.master{0};\n  update lib.master{0} work.trans{0};\n  by id;\nrun;\n".format(i),
+            edges(["lib.master{}".format(i), "work.trans{}".format(i)], ["lib.master{}".format(i)]))
+
+
+def modify(i):
+    return ("data lib.m{0};\n  modify lib.m{0} work.t{0};\n  by id;\nrun;\n".format(i),
+            edges(["lib.m{}".format(i), "work.t{}".format(i)], ["lib.m{}".format(i)]))
+
+
+def modify_key(i):
+    return ("data lib.m{0};\n  set work.t{0};\n  modify lib.m{0} key=id / unique;\nrun;\n".format(i),
+            edges(["work.t{}".format(i), "lib.m{}".format(i)], ["lib.m{}".format(i)]))
+
+
+def output_routing(i):
+    return ("data good{0} bad{0} / view=good{0};\n  set lib.b{0};\n  if x > 0 then output good{0};\n"
+            "  else output bad{0};\nrun;\n".format(i),
+            edges(["lib.b{}".format(i)], ["work.good{}".format(i), "work.bad{}".format(i)]))
+
+
+def hash_lookup(i):
+    return ("data a{0};\n  if 0 then set lib.dim{0};\n  if _n_ = 1 then do;\n"
+            "    declare hash h(dataset: \"lib.dim{0}(where=(active = 1))\");\n"
+            "    h.definekey('k');\n    h.definedata(all: 'yes');\n    h.definedone();\n  end;\n"
+            "  set lib.fact{0};\n  rc = h.find();\nrun;\n".format(i),
+            edges(["lib.dim{}".format(i), "lib.fact{}".format(i)], ["work.a{}".format(i)]))
+
+
+def hash_output(i):
+    return ("data _null_;\n  declare hash h(dataset: 'lib.b{0}', ordered: 'a');\n  h.definekey('k');\n"
+            "  h.definedone();\n  rc = h.output(dataset: 'work.sorted{0}');\nrun;\n".format(i),
+            edges(["lib.b{}".format(i)], ["work._null_", "work.sorted{}".format(i)]))
+
+
+def macro_names(i):
+    return ("data &out..a{0};\n  set &lib..b{0};\nrun;\n".format(i),
+            edges(["&lib..b{}".format(i)], ["&out..a{}".format(i)]))
+
+
+STEPS = (set_one, set_concat, set_options, set_lookup, set_key, merge, merge_options, update, modify, modify_key,
+         output_routing, hash_lookup, hash_output, macro_names)
+
+
+def generate_program(nb_steps, seed):
+    """Text of a program of nb_steps DATA steps, with the expected edges of each kind of step."""
+    rng = random.Random(seed)
+    parts = []
+    expected = {generate.__name__: set() for generate in STEPS}
+    for i in range(nb_steps):
+        generate = rng.choice(STEPS)
+        text, step_edges = generate(i)
+        parts.append(text)
+        expected[generate.__name__].update(step_edges)
+    return "".join(parts), expected
+
+
+def data_name(x):
+    # The former DataStep kept the match of the first SET data set instead of a (library, table) tuple
+    if isinstance(x, tuple):
+        return ".".join(x)
+    return "{}.{}".format(x.group(1) or "work", x.group(2))
+
+
+def parse_in_child(path):
+    from sas_program_mapper import SASProgram
+    from sas_stats import StageStats
+
+    stats = StageStats()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sas = SASProgram(path, write_outputs=False, stats=stats)
+        # The program is parsed as its results are read, the residuals taking every pass
+        sas.script
+    seconds = time.perf_counter() - start
+    found = [[data_name(x), data_name(y)] for step in sas.data_step for x in step.data_in for y in step.data_out]
+    find_components = {name: stage_seconds for name, calls, stage_seconds, items in stats.rows()}["find_components"]
+    return {"seconds": seconds, "find_components": find_components, "lines": sas.script_length,
+            "steps": len(sas.data_step), "edges": found}
+
+
+def measure(path, workdir, repeat):
+    """Fastest of repeat parses, each in a fresh interpreter."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path], cwd=workdir,
+                                check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if best is None or run["seconds"] < best["seconds"]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=20000, help="number of DATA steps of the program")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(args.child)))
+        return 0
+
+    text, expected = generate_program(args.steps, args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "data_steps.sas")
+        with open(path, "w") as outfile:
+            outfile.write(text)
+        run = measure(path, folder, args.repeat)
+
+    found_edges = {tuple(edge) for edge in run["edges"]}
+    print("{:>15} {:>7} {:>7} {:>9}".format("step", "edges", "found", "coverage"))
+    nb_edges = nb_found = 0
+    for generate in STEPS:
+        name = generate.__name__
+        found = found_edges & expected[name]
+        nb_edges += len(expected[name])
+        nb_found += len(found)
+        print("{:>15} {:>7} {:>7} {:>8.0%}".format(name, len(expected[name]), len(found),
+                                                   len(found) / max(len(expected[name]), 1)))
+    wrong = found_edges - set().union(*expected.values())
+    print("\n{} steps found, {:.0%} of the edges found, {} wrong edges".format(
+        run["steps"], nb_found / max(nb_edges, 1), len(wrong)))
+    print("{} lines in {:.3f} s, {:.0f} lines/s, find_components {:.3f} s ({:.0%} of the parse)".format(
+        run["lines"], run["seconds"], run["lines"] / run["seconds"], run["find_components"],
+        run["find_components"] / run["seconds"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Time of SASProgram.extract on comment-heavy and step-heavy programs.
+
+Each program is parsed at two sizes in a fresh interpreter, the extract stage being timed by the
+StageStats of the parse. The ratio of the two times tells whether the extraction is linear: 4 times
+the size should take about 4 times as long. The extraction of components sharing lines is what used
+to be quadratic.
+
+The residuals are hashed, so that two checkouts can be checked to extract the same text: copy this
+script to the benchmarks folder of the other checkout and run it there.
+
+Usage:
+    python benchmarks/bench_extract.py [--size 5000] [--repeat 3] [--only NAME]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def comment_heavy(n):
+    # Comments above, inside and at the end of the lines of the steps
+    return "".join("/* Block {0}\n   of the job */\n"
+                   "* Step {0};\n"
+                   "data work.x{0}; /* output */\n"
+                   "  set lib.y{0}; * input;\n"
+                   "  x = 1; /* one */ y = 2; /* two */\n"
+                   "run;\n".format(i) for i in range(n))
+
+
+def step_heavy(n):
+    # A step per line, its statements sharing the line with the next step
+    return "".join("data work.x{0}; set lib.y{0}; run; proc sort data=work.x{0} out=work.s{0}; by id; run;\n"
+                   "%let a{0} = {0}; proc sql; create table work.t{0} as select * from work.s{0}; quit;\n"
+                   .format(i) for i in range(n))
+
+
+def one_line_program(n):
+    # The whole program on one line, as written by some code generators
+    return "".join("%let a{0} = {0}; data work.x{0}; set lib.y{0}; run; ".format(i) for i in range(n)) + "\n"
+
+
+PROGRAMS = (comment_heavy, step_heavy, one_line_program)
+
+
+def parse_in_child(path):
+    from sas_program_mapper import SASProgram
+    from sas_stats import StageStats
+
+    stats = StageStats()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sas = SASProgram(path, write_outputs=False, stats=stats)
+        # The program is parsed as its results are read, the residuals taking every pass
+        sas.script
+    seconds = time.perf_counter() - start
+    residuals = "".join("\n" if line in ("", "\n") else line for line in sas.script)
+    extract = {name: stage_seconds for name, calls, stage_seconds, items in stats.rows()}["extract"]
+    return {"seconds": seconds, "extract": extract, "lines": sas.script_length,
+            "prop_extracted": sas.prop_extracted, "residuals": hashlib.md5(residuals.encode()).hexdigest()}
+
+
+def measure(folder, name, text, repeat):
+    """Run of the fastest extraction out of repeat parses."""
+    path = os.path.join(folder, name + ".sas")
+    with open(path, "w") as outfile:
+        outfile.write(text)
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path], cwd=folder,
+                                check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if best is None or run["extract"] < best["extract"]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=5000, help="repetitions of the pattern of each program")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", default=None, help="names of the programs to parse")
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(args.child)))
+        return 0
+
+    print("{:>18} {:>8} {:>12} {:>10} {:>12} {:>7} {:>9}  {}".format(
+        "program", "lines", "extract (s)", "parse (s)", "4x extract", "ratio", "extracted", "residuals"))
+    with tempfile.TemporaryDirectory() as folder:
+        for generate in PROGRAMS:
+            name = generate.__name__
+            if args.only and name not in args.only:
+                continue
+            run = measure(folder, name, generate(args.size), args.repeat)
+            run_4x = measure(folder, name, generate(4 * args.size), args.repeat)
+            print("{:>18} {:>8} {:>12.3f} {:>10.3f} {:>12.3f} {:>6.1f}x {:>9.3f}  {}".format(
+                name, run["lines"], run["extract"], run["seconds"], run_4x["extract"],
+                run_4x["extract"] / max(run["extract"], 1e-9), run["prop_extracted"], run["residuals"][:12]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Time of a lineage-only parse of SASProgram against a full one, on synthetic jobs.
+
+A lineage-only parse reads the lineage edges of the program and nothing else; a full parse also
+reads its components and its residual script, as the output files do. Each parse runs in a fresh
+interpreter, nothing being written. A checkout parsing its programs at once takes the time of the
+full parse for both: copy this script to the benchmarks folder of another checkout to compare.
+
+Usage:
+    python benchmarks/bench_lazy_program.py [--lines 10000 100000] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sas_synthetic import write_job
+
+MODES = ("lineage", "full")
+
+
+def parse_in_child(path, mode):
+    from sas_program_mapper import SASProgram
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sas = SASProgram(path, write_outputs=False)
+        if mode == "full":
+            # In the order of the output files, all the passes then taking one lex of the program
+            sas.components
+            sas.script
+        edges = list(sas.lineage_edges())
+    return {"seconds": time.perf_counter() - start, "edges": len(edges)}
+
+
+def measure(path, mode, repeat):
+    """Fastest of repeat parses, each in a fresh interpreter."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path, mode],
+                                cwd=os.path.dirname(path), check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if best is None or run["seconds"] < best["seconds"]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(*args.child)))
+        return 0
+
+    print("{:>8} {:>12} {:>10} {:>8} {:>7}".format("lines", "lineage (s)", "full (s)", "ratio", "edges"))
+    with tempfile.TemporaryDirectory() as folder:
+        for nb_lines in args.lines:
+            program, log = write_job(folder, "job_{}".format(nb_lines), nb_lines)
+            runs = {mode: measure(program, mode, args.repeat) for mode in MODES}
+            print("{:>8} {:>12.3f} {:>10.3f} {:>7.2f}x {:>7}".format(
+                nb_lines, runs["lineage"]["seconds"], runs["full"]["seconds"],
+                runs["lineage"]["seconds"] / runs["full"]["seconds"], runs["lineage"]["edges"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
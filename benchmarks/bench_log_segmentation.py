@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Segmentation throughput of a large SAS log, bytes-level segmentation of the memory-mapped log
+against the line by line loop over the decoded text.
+
+Usage:
+    python benchmarks/bench_log_segmentation.py [--steps 20000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_batch_scaling import LOG_STEP
+from bench_component_memory import STIMER, FULLSTIMER, write_log, segment_log_lines
+from sas_log_parser import classify_log_message, iter_log_components
+
+
+def segment_lines(path):
+    with open(path, "r") as infile:
+        return [classify_log_message(log_message) for log_message in segment_log_lines(infile)]
+
+
+def segment_bytes(path):
+    return list(iter_log_components(path))
+
+
+def best_time(function, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        components = function(path)
+        best = min(best, time.perf_counter() - start)
+    return best, components
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=20000, help="steps in the log")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("{:>16} {:>10} {:>16} {:>16} {:>8} {:>10}".format(
+        "log", "lines", "lines (l/s)", "bytes (l/s)", "speedup", "mismatches"))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "job.log")
+        for label, log_step in (("STIMER", LOG_STEP), ("FULLSTIMER", LOG_STEP.replace(STIMER, FULLSTIMER))):
+            with open(path, "w") as outfile:
+                outfile.write(write_log(args.steps, log_step))
+            with open(path, "r") as infile:
+                nb_lines = sum(1 for _ in infile)
+            lines_time, lines_components = best_time(segment_lines, path, args.repeat)
+            bytes_time, bytes_components = best_time(segment_bytes, path, args.repeat)
+            mismatches = sum(1 for a, b in zip(lines_components, bytes_components)
+                             if (type(a), a.start_line, a.end_line, a.contents) !=
+                                (type(b), b.start_line, b.end_line, b.contents))
+            mismatches += abs(len(lines_components) - len(bytes_components))
+            print("{:>16} {:>10} {:>16.0f} {:>16.0f} {:>7.1f}x {:>10}".format(
+                label, nb_lines, nb_lines / lines_time, nb_lines / bytes_time, lines_time / bytes_time, mismatches))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Export time of a mapping table, columnar MappingTable against one-row DataFrame appends.
+
+Usage:
+    python benchmarks/bench_mapping_export.py [--rows 1000 5000 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sas_output import MappingTable, MAPPING_COLUMNS
+
+
+def mapping_rows(nb_rows):
+    for i in range(nb_rows):
+        yield [str(i), str(5 * i), str(5 * i + 4), "DATASTEP", "lib.source{}".format(i), "work.step{}".format(i),
+               str(10 * i), str(10 * i), "4"]
+
+
+def export_columnar(path, nb_rows):
+    output_map = MappingTable(MAPPING_COLUMNS)
+    output_map.extend(mapping_rows(nb_rows))
+    output_map.write_csv(path)
+
+
+def export_row_appends(path, nb_rows):
+    # Former export: one DataFrame per row, appended to the table built so far
+    import pandas
+    pd_output_map = pandas.DataFrame(columns=MAPPING_COLUMNS)
+    for row in mapping_rows(nb_rows):
+        df = pandas.DataFrame(data=[row], columns=MAPPING_COLUMNS)
+        pd_output_map = pandas.concat([pd_output_map, df])
+    pd_output_map.reset_index(drop = True, inplace = True)
+    pd_output_map.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--skip-pandas", action="store_true", help="only time the columnar export")
+    args = parser.parse_args()
+
+    print("{:>8} {:>14} {:>14}".format("rows", "columnar (s)", "appends (s)"))
+    with tempfile.TemporaryDirectory() as folder:
+        for nb_rows in args.rows:
+            start = time.perf_counter()
+            export_columnar(os.path.join(folder, "columnar.csv"), nb_rows)
+            columnar_time = time.perf_counter() - start
+            appends_time = float("nan")
+            if not args.skip_pandas:
+                start = time.perf_counter()
+                export_row_appends(os.path.join(folder, "appends.csv"), nb_rows)
+                appends_time = time.perf_counter() - start
+            print("{:>8} {:>14.3f} {:>14.3f}".format(nb_rows, columnar_time, appends_time))
+
+
+if __name__ == "__main__":
+    main()
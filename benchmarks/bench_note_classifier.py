@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Throughput of the NOTE classifier against the former per-note regex cascade.
+
+Usage:
+    python benchmarks/bench_note_classifier.py [--notes 200000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sas_log_parser import Note, Note_fullver, SASLogComponent
+
+NOTE_SAMPLES = [
+    "NOTE: There were 217 observations read from the data set XREF.ALMDTLIM.\n"
+    "      WHERE UPCASE(subdir)='JAMAICA';\n",
+    "NOTE: No observations in data set WORK.ERR6.\n",
+    "NOTE: The data set WORK.TRNS has 217 observations and 1 variables.\n",
+    "NOTE: DATA statement used (Total process time):\n"
+    "      real time           0.01 seconds\n"
+    "      cpu time            0.01 seconds\n",
+    "NOTE: PROCEDURE SORT used (Total process time):\n"
+    "      real time           0.01 seconds\n"
+    "      cpu time            0.01 seconds\n",
+    "NOTE: 48079 records were read from the infile FLT.\n"
+    "      The minimum record length was 80.\n",
+    "NOTE: Libref XREF has been deassigned.\n",
+    "NOTE: Libref XREF was successfully assigned as follows: \n"
+    "      Engine:        V9 \n"
+    "      Physical Name: C:\\data\\xref\n",
+    "NOTE: %INCLUDE (level 1) file c:\\x.sas is file c:\\x.sas.\n",
+    "NOTE: The infile FLT is:\n"
+    "      Filename=C:\\data\\flt.txt,\n",
+    "NOTE: No observations were selected from data set WORK.ERR7.\n",
+    "NOTE: Numeric values have been converted to character values at the places given by:\n",
+    "NOTE: SAS (r) Proprietary Software 9.4 (TS1M3) \n",
+    "NOTE: Table WORK.JOINED created, with 12 rows and 4 columns.\n",
+]
+
+
+class LegacyNote(SASLogComponent):
+    """Former Note class, compiling and running every pattern for every note."""
+    def __init__(self,start_line, end_line, contents):
+        super().__init__(start_line, end_line, contents)
+        self.Type = ""
+        self.data_name = ""
+        self.ResName = ""
+        self.End_Proc = False
+        reg_exp = re.compile(r"(?i)(?:^NOTE:.*observations\s+read\s+from\s+the\s+data\s+set\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}\.[a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "INPUT"
+            self.data_name = re.search(reg_exp, self.contents).group(1)
+        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+No\s+observations\s+in\s+data\s+set\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}\.[a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "INPUT"
+            self.data_name = re.search(reg_exp, self.contents).group(1)
+        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+The\s+data\s+set\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}\.[a-zA-Z_&][a-zA-Z0-9_&]{0,31}))\s+has")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "OUTPUT"
+            self.data_name = re.search(reg_exp, self.contents).group(1)
+        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+DATA\s+statement\s+used\s+)")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "DATASTEP"
+            self.data_name = ""
+            self.End_Proc = True
+        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+PROCEDURE\s+([a-zA-Z]+)\s+used\s+)")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "PROC " + re.search(reg_exp, self.contents).group(1)
+            self.data_name =  ""
+            self.End_Proc = True
+        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+read\s+from\s+the\s+infile\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "INPUT"
+            self.data_name = re.search(reg_exp, self.contents).group(1)
+        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+Libref\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))\shas\s+been\s+deassigned")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "LIBREFDEASSIGN"
+            self.data_name = re.search(reg_exp, self.contents).group(1)
+            self.End_Proc = True
+        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+Libref\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))\s+was\s+successfully\s+assigned\s+as\s+follows:")
+        if re.search(reg_exp, self.contents) != None:
+            self.Type = "LIBREFASSIGN"
+            self.data_name = re.search(reg_exp, self.contents).group(1)
+            self.End_Proc = True
+        if re.search(r"(?i)(?:^NOTE:.*%INCLUDE\s+)", self.contents) !=None:
+            self.End_Proc = True
+
+
+def run(note_class, corpus):
+    start = time.perf_counter()
+    notes = [note_class(i, i, contents) for i, contents in enumerate(corpus)]
+    return notes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=200000, help="number of notes to classify")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [rng.choice(NOTE_SAMPLES) for _ in range(args.notes)]
+
+    legacy_notes, legacy_time = run(LegacyNote, corpus)
+    notes, time_taken = run(Note, corpus)
+    _, fullver_time = run(Note_fullver, corpus)
+
+    mismatches = sum(1 for old, new in zip(legacy_notes, notes)
+                     if (old.Type, old.data_name, old.End_Proc) != (new.Type, new.data_name, new.End_Proc))
+    print("notes classified:    {}".format(args.notes))
+    print("legacy cascade:      {:>10.0f} notes/sec".format(args.notes / legacy_time))
+    print("precompiled classes: {:>10.0f} notes/sec".format(args.notes / time_taken))
+    print("speedup:             {:>10.1f}x".format(legacy_time / time_taken))
+    print("Note_fullver rules:  {:>10.0f} notes/sec".format(args.notes / fullver_time))
+    print("mismatches:          {:>10d}".format(mismatches))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Time of writing the output files of a batch through each output sink.
+
+A batch of synthetic jobs is parsed once, its output files being kept in a MemorySink. They are
+then written through each sink to --target, a folder of the file system to measure (a temporary
+folder by default, point it to the NFS share to measure that one). "files" is one file written
+through per output file, as the parsers wrote them before the sinks; "folder" is the same layout
+written in batches. The time of each sink includes closing it, and syncing what it wrote to disk
+with --fsync.
+
+Usage:
+    python benchmarks/bench_output_sinks.py [--jobs 500] [--lines 200] [--repeat 3] [--target FOLDER] [--fsync]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sas_synthetic import write_job
+from sas_batch import run_batch
+from sas_output import MemorySink, DirectorySink, open_sink
+
+SINKS = (("files", "output", 0), ("folder", "output", None), ("zip", "output.zip", None),
+         ("tar", "output.tar", None), ("tar.gz", "output.tar.gz", None), ("jsonl", "output.jsonl", None))
+
+
+def sync_tree(path):
+    for folder, _, filenames in os.walk(path) if os.path.isdir(path) else [("", [], [path])]:
+        for filename in filenames:
+            fd = os.open(os.path.join(folder, filename), os.O_RDONLY)
+            os.fsync(fd)
+            os.close(fd)
+
+
+def write_outputs(files, target, name, buffer_bytes, fsync):
+    path = os.path.join(target, name)
+    start = time.perf_counter()
+    sink = DirectorySink(path, buffer_bytes) if buffer_bytes is not None else open_sink(path)
+    with sink:
+        for filename, text in files:
+            sink.write(filename, text)
+    if fsync:
+        sync_tree(path)
+    seconds = time.perf_counter() - start
+    if os.path.isdir(path):
+        nb_files = len(os.listdir(path))
+        size = sum(os.path.getsize(os.path.join(path, filename)) for filename in os.listdir(path))
+        shutil.rmtree(path)
+    else:
+        nb_files = 1
+        size = os.path.getsize(path)
+        os.remove(path)
+    return seconds, nb_files, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=500, help="number of programs and logs of the batch")
+    parser.add_argument("--lines", type=int, default=200, help="lines per program")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--target", default=None, help="folder the sinks write to (default: a temporary folder)")
+    parser.add_argument("--fsync", action="store_true", help="sync the files written before stopping the clock")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = [write_job(folder, "job{}".format(i), args.lines, seed=i) for i in range(args.jobs)]
+        memory = MemorySink()
+        run_batch([log for program, log in paths], [program for program, log in paths], workers=1, sink=memory)
+        files = list(memory.files.items())
+
+        target = args.target or folder
+        print("{} output files, {:.1f} MB\n".format(len(files), sum(len(text) for name, text in files) / 1e6))
+        print("{:>8} {:>10} {:>7} {:>10}".format("sink", "time (s)", "files", "size (MB)"))
+        for kind, name, buffer_bytes in SINKS:
+            runs = [write_outputs(files, target, name, buffer_bytes, args.fsync) for _ in range(args.repeat)]
+            seconds, nb_files, size = min(runs)
+            print("{:>8} {:>10.3f} {:>7} {:>10.1f}".format(kind, seconds, nb_files, size / 1e6))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
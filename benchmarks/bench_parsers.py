@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Throughput, memory and per-stage time of SASProgram and SASLog on synthetic jobs of 1k to 1M lines.
+
+Each parse runs in a fresh interpreter, so that its peak RSS is its own. The stages are the ones the
+parsers record in their StageStats:
+    SASProgram: read, lex, find_components, extract, write_outputs
+    SASLog:     count_lines, segment_classify, group, write_outputs
+"other" is the part of the parse outside these stages.
+
+Results are saved as JSON with the commit they were measured on. --compare prints the ratio of each
+result to a former run, flagging the slowdowns above --threshold.
+
+Usage:
+    python benchmarks/bench_parsers.py [--lines 1000 10000 100000] [--repeat 3] [--output results.json]
+                                       [--compare baseline.json]
+    python benchmarks/bench_parsers.py --lines 1000000 --repeat 1
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sas_synthetic import write_job
+
+RESULTS_VERSION = 1
+PARSERS = ("SASProgram", "SASLog")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def parse_in_child(parser, path):
+    """Parse path once in this process. Returns the measures of the parse."""
+    from sas_log_parser import SASLog
+    from sas_program_mapper import SASProgram
+    from sas_stats import StageStats
+
+    stats = StageStats()
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    if parser == "SASProgram":
+        # The extraction summary is printed by write_outputs
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                sas = SASProgram(path, stats=stats)
+            finally:
+                sys.stdout = stdout
+        nb_lines = sas.script_length
+        components = set()
+        for kind in (sas.components, sas.comment_block, sas.comment_inline, sas.macro_invar_sas,
+                     sas.macro_var_let_sas, sas.macro_var_symput_sas, sas.data_step, sas.proc_sql,
+                     sas.proc_std, sas.macro_call_user_def):
+            components.update(id(comp) for comp in kind)
+        nb_components = len(components)
+    else:
+        sas = SASLog(path, stats=stats)
+        nb_lines = sas.log_length
+        nb_components = len(sas.log_messages)
+    seconds = time.perf_counter() - start
+    stages = {name: stage_seconds for name, calls, stage_seconds, items in stats.rows()}
+    stages["other"] = max(0.0, seconds - stats.seconds())
+    return {"seconds": seconds, "lines": nb_lines, "components": nb_components,
+            "peak_rss_mb": peak_rss_mb(), "baseline_rss_mb": baseline_rss, "stages": stages}
+
+
+def measure(parser, path, workdir, repeat):
+    """Best of repeat parses, each in a fresh interpreter run in workdir."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", parser, path],
+                                cwd=workdir, check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if best is None or run["seconds"] < best["seconds"]:
+            peak = max(run["peak_rss_mb"], best["peak_rss_mb"]) if best else run["peak_rss_mb"]
+            best = dict(run, peak_rss_mb=peak)
+        else:
+            best["peak_rss_mb"] = max(best["peak_rss_mb"], run["peak_rss_mb"])
+    best["lines_per_sec"] = best["lines"] / best["seconds"]
+    best["components_per_sec"] = best["components"] / best["seconds"]
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the ratio of each result to the matching baseline result."""
+    former = {(result["parser"], result["size"]): result for result in baseline["results"]}
+    print("\ncompared to {} ({})".format(baseline.get("commit"), baseline.get("date")))
+    print("{:>10} {:>9} {:>12} {:>12} {}".format("parser", "size", "lines/s", "peak RSS", ""))
+    nb_regressions = 0
+    for result in results:
+        base = former.get((result["parser"], result["size"]))
+        if base is None:
+            continue
+        speed = result["lines_per_sec"] / base["lines_per_sec"]
+        memory = result["peak_rss_mb"] / base["peak_rss_mb"]
+        flag = ""
+        if speed < 1 - threshold or memory > 1 + threshold:
+            flag = "REGRESSION"
+            nb_regressions += 1
+        print("{:>10} {:>9} {:>11.2f}x {:>11.2f}x {}".format(result["parser"], result["size"], speed, memory, flag))
+    return nb_regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 100000], help="program sizes in lines")
+    parser.add_argument("--parsers", nargs="+", choices=PARSERS, default=list(PARSERS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file to save the results to")
+    parser.add_argument("--compare", default=None, help="JSON file of former results to compare to")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown or memory growth flagged by --compare")
+    parser.add_argument("--child", nargs=2, metavar=("PARSER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(*args.child)))
+        return 0
+
+    results = []
+    print("{:>10} {:>9} {:>9} {:>9} {:>12} {:>12} {:>10}  {}".format(
+        "parser", "size", "lines", "time (s)", "lines/s", "comps/s", "RSS (MB)", "slowest stages"))
+    with tempfile.TemporaryDirectory() as folder:
+        os.mkdir(os.path.join(folder, "output"))
+        for size in args.lines:
+            paths = dict(zip(("SASProgram", "SASLog"), write_job(folder, "job{}".format(size), size, args.seed)))
+            for name in args.parsers:
+                result = dict(measure(name, paths[name], folder, args.repeat), parser=name, size=size)
+                results.append(result)
+                slowest = sorted(result["stages"].items(), key=lambda item: item[1], reverse=True)[:3]
+                print("{:>10} {:>9} {:>9} {:>9.3f} {:>12.0f} {:>12.0f} {:>10.1f}  {}".format(
+                    name, size, result["lines"], result["seconds"], result["lines_per_sec"],
+                    result["components_per_sec"], result["peak_rss_mb"],
+                    ", ".join("{} {:.0%}".format(stage, seconds / result["seconds"]) for stage, seconds in slowest)))
+
+    report = {"version": RESULTS_VERSION, "commit": git_commit(),
+              "date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+              "seed": args.seed, "repeat": args.repeat, "results": results}
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r") as infile:
+            if compare(results, json.load(infile), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Parse time of SAS programs built to make regular expressions backtrack, against a fixed bound.
+
+Each program of the corpus is parsed at two sizes, in a child process killed at --bound seconds. A
+parse over the bound, or failing, fails the run. The ratio of the two times tells whether the parse
+is linear: 4 times the size should take about 4 times as long.
+
+Usage:
+    python benchmarks/bench_pathological.py [--size 20000] [--bound 10] [--only NAME]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def missing_run(n):
+    # A DATA step without RUN; running to the end of the program
+    return "data work.out;\n  set lib.in;\n" + "  x = x + 1;\n" * n
+
+
+def unbalanced_data_options(n):
+    return "data work.out (keep=a" + " (b" * n + ";\n  set lib.in;\nrun;\n"
+
+
+def unbalanced_set_options(n):
+    return "data work.out;\n  set lib.in (where=(x=" + " (1" * n + ";\nrun;\n"
+
+
+def nested_set_options(n):
+    return "data work.out;\n  set lib.in (where=(x in " + "(1) " * n + "));\nrun;\n"
+
+
+def sort_without_semicolon(n):
+    return "proc sort data=lib.in" + " \n" * n
+
+
+def sort_many_outs(n):
+    return "proc sort data=lib.in" + " out=work.x" * n + ";\n  by id;\nrun;\n"
+
+
+def sql_without_quit(n):
+    return "proc sql;\n" + "  create table work.t as select * from lib.in a left join lib.b b on a.id = b.id;\n" * n
+
+
+def unterminated_comment(n):
+    return "/* header\n" + "data work.x; set lib.y; run;\n" * n
+
+
+def unterminated_quote(n):
+    return "data work.x;\n  msg = 'never closed;\n" + "  x = 1;\n" * n + "run;\n"
+
+
+def many_macro_variables(n):
+    return "data work.x;\n  set lib.y (where=(a = \"" + "&v" * n + "\"));\nrun;\n"
+
+
+def long_let(n):
+    return "%let x = " + "a " * n + "\n"
+
+
+def long_import_path(n):
+    return "proc import datafile=\"C:\\" + "d" * n + ".csv\" dbms=csv replace;\nrun;\n"
+
+
+def one_line_program(n):
+    # Every statement on one line, shared by all the components extracted. n // 10 steps make a program
+    # about as long as the others.
+    return "".join("%let a{0} = {0}; data work.x{0}; set lib.y{0}; run; ".format(i) for i in range(n // 10)) + "\n"
+
+
+CORPUS = (missing_run, unbalanced_data_options, unbalanced_set_options, nested_set_options,
+          sort_without_semicolon, sort_many_outs, sql_without_quit, unterminated_comment, unterminated_quote,
+          many_macro_variables, long_let, long_import_path, one_line_program)
+
+
+def parse_in_child(path):
+    from sas_program_mapper import SASProgram
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # The program is parsed as its results are read, the residuals taking every pass
+            SASProgram(path, write_outputs=False).script
+    except Exception as error:
+        return {"seconds": time.perf_counter() - start, "error": type(error).__name__}
+    return {"seconds": time.perf_counter() - start, "error": None}
+
+
+def parse_time(folder, name, text, bound):
+    """Seconds the parse of text took, None when it ran over bound, and the error it failed with."""
+    path = os.path.join(folder, name + ".sas")
+    with open(path, "w") as outfile:
+        outfile.write(text)
+    try:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path], cwd=folder,
+                                check=True, capture_output=True, text=True, timeout=bound).stdout
+    except subprocess.TimeoutExpired:
+        return None, None
+    run = json.loads(output.strip().splitlines()[-1])
+    return run["seconds"], run["error"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000, help="repetitions of the pathological pattern")
+    parser.add_argument("--bound", type=float, default=10.0, help="seconds allowed for a parse")
+    parser.add_argument("--only", nargs="+", default=None, help="names of the programs to parse")
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(args.child)))
+        return 0
+
+    nb_failures = 0
+    print("{:>24} {:>10} {:>10} {:>10} {:>7}".format("program", "size (KB)", "time (s)", "4x (s)", "ratio"))
+    with tempfile.TemporaryDirectory() as folder:
+        for generate in CORPUS:
+            name = generate.__name__
+            if args.only and name not in args.only:
+                continue
+            text = generate(4 * args.size)
+            seconds, error = parse_time(folder, name, generate(args.size), args.bound)
+            seconds_4x, error_4x = parse_time(folder, name, text, args.bound)
+            if seconds is None or seconds_4x is None:
+                flag = "OVER BOUND"
+            else:
+                flag = error or error_4x or ""
+            nb_failures += bool(flag)
+            print("{:>24} {:>10.0f} {:>10} {:>10} {:>7} {}".format(
+                name, len(text) / 1024, "-" if seconds is None else "{:.3f}".format(seconds),
+                "-" if seconds_4x is None else "{:.3f}".format(seconds_4x),
+                "-" if not (seconds and seconds_4x) else "{:.1f}x".format(seconds_4x / seconds), flag))
+    return 1 if nb_failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Coverage and throughput of the PROC handlers of SASProgram.
+
+A program mixing the procedures SASProgram has handlers for is generated with the lineage edges each
+step should give. The program is parsed in a fresh interpreter, and for each procedure the table
+tells how many steps were found and how many of their edges were. The parse time, and the share of
+it spent building the components, are those of the whole program.
+
+Copy this script to the benchmarks folder of another checkout to measure that one.
+
+Usage:
+    python benchmarks/bench_proc_handlers.py [--steps 2000] [--repeat 3] [--seed 0]
+"""
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# Each generator returns the text of a step and its expected (input, output) edges
+def proc_sort(i):
+    return ("proc sort data=lib.s{0} out=work.sorted{0};\n  by id;\nrun;\n".format(i),
+            {("lib.s{}".format(i), "work.sorted{}".format(i))})
+
+
+def proc_sort_options(i):
+    # Options before data=, which the handler reads in any order
+    return ("proc sort nodupkey data=lib.s{0} out=work.unique{0};\n  by id;\nrun;\n"
+            "proc sort force data=work.unique{0};\n  by id;\nrun;\n".format(i),
+            {("lib.s{}".format(i), "work.unique{}".format(i)), ("work.unique{}".format(i), "work.unique{}".format(i))})
+
+
+def proc_import(i):
+    return ("proc import datafile=\"C:\\data\\in{0}.csv\" out=work.imported{0}\n  dbms=csv replace;\nrun;\n".format(i),
+            {("none.\"C:\\data\\in{}.csv\"".format(i), "work.imported{}".format(i))})
+
+
+def proc_import_options(i):
+    return ("proc import dbms=csv out=work.loaded{0} replace\n  datafile='/data/in {0}.csv';\nrun;\n".format(i),
+            {("none.'/data/in {}.csv'".format(i), "work.loaded{}".format(i))})
+
+
+def proc_export(i):
+    return ("proc export data=work.e{0} outfile=\"C:\\out\\e{0}.csv\"\n  dbms=csv replace;\nrun;\n".format(i),
+            {("work.e{}".format(i), "none.\"C:\\out\\e{}.csv\"".format(i))})
+
+
+def proc_export_options(i):
+    return ("proc export dbms=xlsx replace outfile=\"/out/e{0}.xlsx\" data=lib.e{0};\nrun;\n".format(i),
+            {("lib.e{}".format(i), "none.\"/out/e{}.xlsx\"".format(i))})
+
+
+def proc_append(i):
+    return ("proc append base=mart.all{0} data=work.daily{0} force;\nrun;\n".format(i),
+            {("work.daily{}".format(i), "mart.all{}".format(i))})
+
+
+def proc_transpose(i):
+    return ("proc transpose data=work.long{0} out=work.wide{0} prefix=v;\n  by id;\n  var x;\nrun;\n".format(i),
+            {("work.long{}".format(i), "work.wide{}".format(i))})
+
+
+def proc_means(i):
+    return ("proc means data=lib.sales{0} noprint;\n  class region;\n  var amount;\n"
+            "  output out=work.stats{0} mean=avg;\nrun;\n".format(i),
+            {("lib.sales{}".format(i), "work.stats{}".format(i))})
+
+
+def proc_summary(i):
+    return ("proc summary data=lib.sales{0} nway;\n  class region;\n  output out=work.summ{0} sum=;\nrun;\n".format(i),
+            {("lib.sales{}".format(i), "work.summ{}".format(i))})
+
+
+def proc_freq(i):
+    return ("proc freq data=lib.claims{0};\n  tables state*type / out=work.counts{0} outpct;\nrun;\n".format(i),
+            {("lib.claims{}".format(i), "work.counts{}".format(i))})
+
+
+def proc_datasets(i):
+    return ("proc datasets lib=staging nolist;\n  append base=master{0} data=daily{0};\n"
+            "  change old{0}=new{0};\nquit;\n".format(i),
+            {("staging.daily{}".format(i), "staging.master{}".format(i)),
+             ("staging.old{}".format(i), "staging.new{}".format(i))})
+
+
+def proc_copy(i):
+    return ("proc copy in=src out=dst memtype=data;\n  select a{0} b{0};\nrun;\n".format(i),
+            {("src.a{}".format(i), "dst.a{}".format(i)), ("src.b{}".format(i), "dst.b{}".format(i))})
+
+
+def proc_format(i):
+    return ("proc format cntlin=work.fmtdata{0} library=fmtlib{0};\nrun;\n".format(i),
+            {("work.fmtdata{}".format(i), "fmtlib{}.formats".format(i))})
+
+
+PROCEDURES = (proc_sort, proc_sort_options, proc_import, proc_import_options, proc_export, proc_export_options,
+              proc_append, proc_transpose, proc_means, proc_summary, proc_freq, proc_datasets, proc_copy, proc_format)
+
+
+def procedure_name(generate):
+    # proc_sort and proc_sort_options both give PROC SORT steps
+    return generate.__name__.split("_")[1]
+
+
+def generate_program(nb_steps, seed):
+    """Text of a program of nb_steps PROC steps, with the expected edges of each procedure."""
+    rng = random.Random(seed)
+    parts = []
+    expected = collections.defaultdict(set)
+    for i in range(nb_steps):
+        generate = rng.choice(PROCEDURES)
+        text, edges = generate(i)
+        parts.append(text)
+        expected[procedure_name(generate)].update(edges)
+    return "".join(parts), expected
+
+
+def parse_in_child(path):
+    from sas_program_mapper import SASProgram
+    from sas_stats import StageStats
+
+    stats = StageStats()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sas = SASProgram(path, write_outputs=False, stats=stats)
+        # The program is parsed as its results are read, the residuals taking every pass
+        sas.script
+    seconds = time.perf_counter() - start
+    steps = collections.Counter(comp.name.lower() for comp in sas.proc_std)
+    edges = collections.defaultdict(list)
+    for data_in, data_out, name in sas.lineage_edges():
+        edges[name.lower()].append([data_in, data_out])
+    find_components = {name: stage_seconds for name, calls, stage_seconds, items in stats.rows()}["find_components"]
+    return {"seconds": seconds, "find_components": find_components, "lines": sas.script_length,
+            "steps": steps, "edges": edges}
+
+
+def measure(path, workdir, repeat):
+    """Fastest of repeat parses, each in a fresh interpreter."""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path], cwd=workdir,
+                                check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if best is None or run["seconds"] < best["seconds"]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=2000, help="number of PROC steps of the program")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(args.child)))
+        return 0
+
+    text, expected = generate_program(args.steps, args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "procs.sas")
+        with open(path, "w") as outfile:
+            outfile.write(text)
+        run = measure(path, folder, args.repeat)
+
+    print("{:>10} {:>7} {:>7} {:>7} {:>7} {:>9}".format("procedure", "steps", "found", "edges", "found", "coverage"))
+    nb_edges = nb_found = 0
+    for name in dict.fromkeys(procedure_name(generate) for generate in PROCEDURES):
+        found = {tuple(edge) for edge in run["edges"].get(name, [])} & expected[name]
+        nb_steps = text.count("proc {} ".format(name))
+        nb_edges += len(expected[name])
+        nb_found += len(found)
+        print("{:>10} {:>7} {:>7} {:>7} {:>7} {:>8.0%}".format(
+            name, nb_steps, run["steps"].get(name, 0), len(expected[name]), len(found),
+            len(found) / max(len(expected[name]), 1)))
+    print("\n{} lines in {:.3f} s, {:.0f} lines/s, {:.0%} of it building the components; {:.0%} of the edges found"
+          .format(run["lines"], run["seconds"], run["lines"] / run["seconds"],
+                  run["find_components"] / run["seconds"], nb_found / max(nb_edges, 1)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
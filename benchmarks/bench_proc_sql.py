@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Accuracy and time of the table extraction of PROC SQL steps.
+
+The fixture corpus below pairs PROC SQL steps with the lineage edges they imply. Each step is parsed
+by SASProgram, and the table tells the edges found, missed and wrongly found for each fixture.
+
+A PROC SQL step of about --lines lines, mixing the statements of the fixtures, is then parsed at two
+sizes in a fresh interpreter, the time being the one of the find_components stage: 4 times the lines
+should take about 4 times as long.
+
+Copy this script to the benchmarks folder of another checkout to measure that one.
+
+Usage:
+    python benchmarks/bench_proc_sql.py [--lines 5000] [--repeat 3] [--verbose]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# (name, PROC SQL step, expected (input, output) edges)
+FIXTURES = (
+    ("create_from", "proc sql;\n  create table work.a as select * from lib.b;\nquit;\n",
+     {("lib.b", "work.a")}),
+    ("one_level_names", "proc sql noprint;\n  create table a as\n    select x, y\n    from b\n    where x > 0;\nquit;\n",
+     {("work.b", "work.a")}),
+    ("comma_join", "proc sql;\n  create table work.a as select * from lib.b x, lib.c y, work.d\n"
+                   "  where x.id = y.id and y.id = d.id;\nquit;\n",
+     {("lib.b", "work.a"), ("lib.c", "work.a"), ("work.d", "work.a")}),
+    ("explicit_joins", "proc sql;\n  create table a as\n  select * from b inner join lib.c on b.id = c.id\n"
+                       "  left outer join d as dd on c.k = dd.k\n  full join e on e.k = dd.k;\nquit;\n",
+     {("work.b", "work.a"), ("lib.c", "work.a"), ("work.d", "work.a"), ("work.e", "work.a")}),
+    ("multiple_creates", "proc sql;\n  create table t1 as select * from s1;\n  create table t2 as select * from s2;\n"
+                         "  create view v3 as select * from t1 natural join t2;\nquit;\n",
+     {("work.s1", "work.t1"), ("work.s2", "work.t2"), ("work.t1", "work.v3"), ("work.t2", "work.v3")}),
+    ("where_subquery", "proc sql;\n  create table a as select * from b\n"
+                       "  where id in (select id from lib.keep where flag = 1)\n"
+                       "    and id not in (select id from lib.drop);\nquit;\n",
+     {("work.b", "work.a"), ("lib.keep", "work.a"), ("lib.drop", "work.a")}),
+    ("inline_view", "proc sql;\n  create table a as select v.* from\n"
+                    "    (select id, sum(x) as s from lib.sales group by id) as v, lib.cust c\n"
+                    "  where v.id = c.id;\nquit;\n",
+     {("lib.sales", "work.a"), ("lib.cust", "work.a")}),
+    ("scalar_subquery", "proc sql;\n  create table a as\n  select id, (select max(x) from lib.m where m.id = b.id) as mx\n"
+                        "  from b;\nquit;\n",
+     {("lib.m", "work.a"), ("work.b", "work.a")}),
+    ("set_operators", "proc sql;\n  create table a as\n    select id from b\n    union all\n    select id from c\n"
+                      "    except\n    select id from d\n    outer union corr\n    select id from e;\nquit;\n",
+     {("work.b", "work.a"), ("work.c", "work.a"), ("work.d", "work.a"), ("work.e", "work.a")}),
+    ("insert_select", "proc sql;\n  insert into lib.hist (id, x)\n    select id, x from work.today;\nquit;\n",
+     {("work.today", "lib.hist")}),
+    ("insert_values", "proc sql;\n  insert into lib.log values ('it''s; done', 1);\nquit;\n",
+     set()),
+    ("update_subquery", "proc sql;\n  update lib.t set x = (select max(x) from lib.s where s.id = t.id)\n"
+                        "  where id in (select id from work.k);\nquit;\n",
+     {("lib.s", "lib.t"), ("work.k", "lib.t")}),
+    ("delete_subquery", "proc sql;\n  delete from lib.t where id in (select id from work.gone);\nquit;\n",
+     {("work.gone", "lib.t")}),
+    ("data_set_options", "proc sql;\n  create table a(drop=tmp) as\n"
+                         "  select * from lib.b(where=(x in (1, 2)) rename=(y=z)) as b, c(keep=id);\nquit;\n",
+     {("lib.b", "work.a"), ("work.c", "work.a")}),
+    ("create_like", "proc sql;\n  create table work.empty like lib.model;\nquit;\n",
+     {("lib.model", "work.empty")}),
+    ("functions", "proc sql;\n  create table a as\n  select substring(name from 2 for 3) as s, count(*) as n\n"
+                  "  from b group by 1 order by n;\nquit;\n",
+     {("work.b", "work.a")}),
+    ("comments_and_quotes", "proc sql;\n  /* create table x as select * from y; */\n"
+                            "  * create table z as select * from w;\n"
+                            "  create table a as select 'from q;' as t, \"join r\" as u\n"
+                            "  from b /* , c */;\nquit;\n",
+     {("work.b", "work.a")}),
+    ("macro_variables", "proc sql;\n  create table &lib..out_&yr. as select * from &src..in_&yr. a\n"
+                        "  join &src..ref on a.k = ref.k;\nquit;\n",
+     {("&src..in_&yr.", "&lib..out_&yr."), ("&src..ref", "&lib..out_&yr.")}),
+    ("pass_through", "proc sql;\n  connect to odbc (dsn=dw);\n"
+                     "  create table work.loc as select * from connection to odbc\n"
+                     "    (select * from dbo.remote r join dbo.other o on r.id = o.id);\n"
+                     "  execute (create table dbo.x as select * from dbo.y) by odbc;\n"
+                     "  disconnect from odbc;\nquit;\n",
+     set()),
+    ("select_into", "proc sql noprint;\n  select count(*) into :n from lib.b;\n"
+                    "  create table a as select * from c where n < &n;\nquit;\n",
+     {("work.c", "work.a")}),
+)
+
+
+def sql_statements(nb_lines):
+    """Text of a PROC SQL step of about nb_lines lines, repeating the statements of the fixtures."""
+    parts = ["proc sql;\n"]
+    lines = 1
+    i = 0
+    while lines < nb_lines:
+        name, text, edges = FIXTURES[i % len(FIXTURES)]
+        body = text.split("\n", 1)[1].rsplit("quit;", 1)[0].replace(" a ", " a{} ".format(i))
+        parts.append(body)
+        lines += body.count("\n")
+        i += 1
+    parts.append("quit;\n")
+    return "".join(parts)
+
+
+def parse_in_child(path):
+    from sas_program_mapper import SASProgram
+    from sas_stats import StageStats
+
+    stats = StageStats()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sas = SASProgram(path, write_outputs=False, stats=stats)
+        # The program is parsed as its results are read, the residuals taking every pass
+        sas.script
+    seconds = time.perf_counter() - start
+    find_components = {name: stage_seconds for name, calls, stage_seconds, items in stats.rows()}["find_components"]
+    return {"seconds": seconds, "find_components": find_components, "lines": sas.script_length,
+            "edges": [[data_in, data_out] for data_in, data_out, name in sas.lineage_edges() if name == "ProcSQL"]}
+
+
+def run_child(path, folder):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path], cwd=folder,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(folder, name, text, repeat):
+    """Run of the fastest component search out of repeat parses."""
+    path = os.path.join(folder, name + ".sas")
+    with open(path, "w") as outfile:
+        outfile.write(text)
+    best = None
+    for _ in range(repeat):
+        run = run_child(path, folder)
+        if best is None or run["find_components"] < best["find_components"]:
+            best = run
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5000, help="lines of the PROC SQL step timed")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="print the edges missed and wrongly found")
+    parser.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parse_in_child(args.child)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as folder:
+        print("{:>20} {:>9} {:>7} {:>7} {:>7}".format("fixture", "expected", "found", "missed", "wrong"))
+        nb_expected = nb_found = nb_wrong = nb_exact = 0
+        for name, text, expected in FIXTURES:
+            path = os.path.join(folder, name + ".sas")
+            with open(path, "w") as outfile:
+                outfile.write(text)
+            edges = {tuple(edge) for edge in run_child(path, folder)["edges"]}
+            found, missed, wrong = edges & expected, expected - edges, edges - expected
+            nb_expected += len(expected)
+            nb_found += len(found)
+            nb_wrong += len(wrong)
+            nb_exact += not missed and not wrong
+            print("{:>20} {:>9} {:>7} {:>7} {:>7}".format(name, len(expected), len(found), len(missed), len(wrong)))
+            if args.verbose and (missed or wrong):
+                print("{:>20} missed {} wrong {}".format("", sorted(missed), sorted(wrong)))
+        print("\n{}/{} fixtures exact, {}/{} edges found ({:.0%}), {} wrong edges".format(
+            nb_exact, len(FIXTURES), nb_found, nb_expected, nb_found / max(nb_expected, 1), nb_wrong))
+
+        print("\n{:>8} {:>20} {:>10} {:>8} {:>12}".format("lines", "find_components (s)", "parse (s)", "edges",
+                                                          "lines/s"))
+        runs = []
+        for nb_lines in (args.lines, 4 * args.lines):
+            run = measure(folder, "sql_{}".format(nb_lines), sql_statements(nb_lines), args.repeat)
+            runs.append(run)
+            print("{:>8} {:>20.3f} {:>10.3f} {:>8} {:>12.0f}".format(
+                run["lines"], run["find_components"], run["seconds"], len(run["edges"]),
+                run["lines"] / run["find_components"]))
+        print("\n4x the lines: {:.1f}x the time".format(runs[1]["find_components"] / max(runs[0]["find_components"], 1e-9)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Import time of the parser modules in a fresh interpreter, with the heavy dependencies they load.
+
+The reference line imports the dependencies the program mapper used to import at module level
+(networkx, matplotlib.pyplot, tkinter.tix), which every batch worker paid before parsing anything.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "networkx", "matplotlib", "tkinter")
+
+MEASURE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+for module in {modules!r}:
+    try:
+        __import__(module)
+    except ImportError:
+        pass
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def import_time(modules, repeat):
+    """Best import time of modules over repeat fresh interpreters, and the heavy modules loaded."""
+    code = MEASURE.format(root=ROOT, modules=list(modules), heavy=list(HEAVY_MODULES))
+    best = float("inf")
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        elapsed, loaded = json.loads(output)
+        best = min(best, elapsed)
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>36} {:>10} {}".format("import", "time (ms)", "heavy modules loaded"))
+    for label, modules in (("sas_log_parser", ["sas_log_parser"]),
+                           ("sas_program_mapper", ["sas_program_mapper"]),
+                           ("sas_parser", ["sas_parser"]),
+                           ("sas_batch", ["sas_batch"]),
+                           ("reference: former eager dependencies", ["networkx", "matplotlib.pyplot", "tkinter.tix"])):
+        elapsed, loaded = import_time(modules, args.repeat)
+        print("{:>36} {:>10.1f} {}".format(label, 1000 * elapsed, ", ".join(loaded) or "-"))
+
+
+if __name__ == "__main__":
+    main()
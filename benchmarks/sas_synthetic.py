@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic SAS programs and the logs of their runs, of configurable size.
+
+.. pseudocode::
+
+    - Draw blocks at random: comment blocks, %let, DATA steps with macro variables, inline comments
+      and call symput, PROC SQL joins, PROC SORT, PROC IMPORT, PROC EXPORT and macro calls
+    - Append each block to the program, and its numbered source lines followed by the NOTE,
+      WARNING and MACROGEN messages SAS prints for it to the log
+    - Stop once the program reaches the number of lines asked for
+
+The same seed gives the same job.
+
+Usage:
+    python benchmarks/sas_synthetic.py FOLDER [--lines 10000] [--jobs 1] [--seed 0]
+"""
+import argparse
+import os
+import random
+
+LOG_HEADER = """1                                                          The SAS System                        09:12 Monday, June 4, 2018
+
+NOTE: Copyright (c) 2002-2012 by SAS Institute Inc., Cary, NC, USA.
+NOTE: SAS (r) Proprietary Software 9.4 (TS1M3)
+NOTE: This session is executing on the X64_7PRO  platform.
+"""
+
+STIMER = """      real time           {real:.2f} seconds
+      cpu time            {cpu:.2f} seconds
+"""
+FULLSTIMER = """      real time           {real:.2f} seconds
+      user cpu time       {user:.2f} seconds
+      system cpu time     {system:.2f} seconds
+      memory              {memory:.2f}k
+      OS Memory           {os_memory:.2f}k
+      Timestamp           06/04/2018 09:12:01 AM
+"""
+
+LIBRARIES = ("xref", "lib1", "lib2", "staging", "mart")
+COUNTRIES = ("JAMAICA", "CANADA", "PERU", "CHILE", "MEXICO")
+
+
+class SyntheticJob:
+    """SAS program and log of one synthetic job.
+    INPUT:  random number generator, FULLSTIMER share of the steps
+    OUTPUT: program text, log text
+    """
+    def __init__(self, rng, fullstimer=0.5):
+        self.rng = rng
+        self.fullstimer = fullstimer
+        self.program = []
+        self.log = [LOG_HEADER]
+        self.nb_lines = 0
+        self.nb_blocks = 0
+        self.macro_vars = []
+
+    def source(self, lines):
+        # Source lines go to the program and, numbered, to the log
+        for line in lines:
+            self.nb_lines += 1
+            self.program.append(line + "\n")
+            self.log.append("{:<10} {}\n".format(self.nb_lines, line))
+
+    def message(self, text):
+        self.log.append(text)
+
+    def step_used(self, step):
+        rng = self.rng
+        real = rng.uniform(0.0, 5.0) if rng.random() < 0.9 else rng.uniform(5.0, 600.0)
+        if rng.random() < self.fullstimer:
+            user = real * rng.uniform(0.1, 0.6)
+            stats = FULLSTIMER.format(real=real, user=user, system=real * 0.05, memory=rng.uniform(500, 50000),
+                                      os_memory=rng.uniform(10000, 200000))
+        else:
+            stats = STIMER.format(real=real, cpu=real * rng.uniform(0.1, 0.7))
+        self.message("NOTE: {} used (Total process time):\n".format(step) + stats + "      \n\n")
+
+    def table(self):
+        return "{}.t{}".format(self.rng.choice(LIBRARIES), self.rng.randrange(1000))
+
+    def comment_block(self):
+        k = self.nb_blocks
+        self.source(["/* Block {}".format(k)] +
+                    ["   rule {}: keep the records of the previous run".format(i) for i in range(self.rng.randint(0, 3))] +
+                    ["*/"])
+
+    def let(self):
+        name = "country{}".format(len(self.macro_vars))
+        self.macro_vars.append(name)
+        self.source(["%let {} = {};".format(name, self.rng.choice(COUNTRIES))])
+
+    def data_step(self):
+        rng, k = self.rng, self.nb_blocks
+        data_in = self.table()
+        data_out = "work.step{}".format(k)
+        lines = ["data {};".format(data_out)]
+        where = None
+        if self.macro_vars and rng.random() < 0.5:
+            variable = rng.choice(self.macro_vars)
+            lines.append('  set {} (where=(upcase(subdir)="&{}"));'.format(data_in, variable))
+            where = "      WHERE UPCASE(subdir)='{}';\n".format(rng.choice(COUNTRIES))
+        else:
+            lines.append("  set {};".format(data_in))
+        lines.append("  amount = amount * {:.2f};".format(rng.uniform(0.5, 2.0)))
+        if rng.random() < 0.3:
+            lines.append("  * rates of the previous month;")
+        for i in range(rng.randint(0, 4)):
+            lines.append("  x{0} = amount * {0};".format(i))
+        if rng.random() < 0.3:
+            lines.append("  if _n_ = 1 then call symput('nobs{}', _n_);".format(k))
+        lines.append("run;")
+        self.source(lines)
+        observations = rng.randrange(100000)
+        self.message("\nNOTE: There were {} observations read from the data set {}.\n".format(
+            observations, data_in.upper()) + (where or ""))
+        self.message("NOTE: The data set {} has {} observations and {} variables.\n".format(
+            data_out.upper(), observations, rng.randint(1, 40)))
+        self.step_used("DATA statement")
+
+    def proc_sql(self):
+        rng, k = self.rng, self.nb_blocks
+        data_out = "work.joined{}".format(k)
+        self.source(["proc sql;",
+                     "  create table {} as".format(data_out),
+                     "  select a.*, b.rate",
+                     "  from work.step{} a".format(rng.randrange(max(k, 1))),
+                     "  left outer join {} b".format(self.table()),
+                     "  on a.id = b.id;",
+                     "quit;"])
+        if rng.random() < 0.2:
+            self.message("WARNING: Variable rate already exists on file {}.\n".format(data_out.upper()))
+        self.message("NOTE: Table {} created, with {} rows and {} columns.\n\n".format(
+            data_out.upper(), rng.randrange(100000), rng.randint(2, 40)))
+        self.step_used("PROCEDURE SQL")
+
+    def proc_sort(self):
+        rng, k = self.rng, self.nb_blocks
+        data_in = "work.step{}".format(rng.randrange(max(k, 1)))
+        data_out = "work.sorted{}".format(k)
+        self.source(["proc sort data={} out={};".format(data_in, data_out), "  by id;", "run;"])
+        observations = rng.randrange(100000)
+        self.message("\nNOTE: There were {} observations read from the data set {}.\n".format(observations, data_in.upper()))
+        self.message("NOTE: The data set {} has {} observations and 5 variables.\n".format(data_out.upper(), observations))
+        self.step_used("PROCEDURE SORT")
+
+    def proc_import(self):
+        rng, k = self.rng, self.nb_blocks
+        data_out = "work.imported{}".format(k)
+        path = "C:\\data\\in{}.csv".format(k)
+        self.source(['proc import datafile="{}" out={}'.format(path, data_out), "  dbms=csv replace;", "run;"])
+        records = rng.randrange(100000)
+        self.message("\nNOTE: The infile '{}' is:\n      Filename={},\n      RECFM=V,LRECL=32767\n".format(path, path))
+        self.message("NOTE: {} records were read from the infile '{}'.\n".format(records, path))
+        self.message("NOTE: {} has {} observations and 8 variables.\n".format(data_out.upper(), records))
+        self.step_used("PROCEDURE IMPORT")
+
+    def proc_export(self):
+        rng, k = self.rng, self.nb_blocks
+        data_in = "work.step{}".format(rng.randrange(max(k, 1)))
+        path = "C:\\data\\out{}.csv".format(k)
+        self.source(["proc export data={} outfile=\"{}\"".format(data_in, path), "  dbms=csv replace;", "run;"])
+        observations = rng.randrange(100000)
+        self.message("\nNOTE: {} records were written to the file '{}'.\n".format(observations + 1, path))
+        self.message("NOTE: There were {} observations read from the data set {}.\n".format(observations, data_in.upper()))
+        self.step_used("PROCEDURE EXPORT")
+
+    def macro_call(self):
+        k = self.nb_blocks
+        self.source(["%libname(lib{});".format(k % 7)])
+        self.message("MACROGEN(EXTRACT):   libname lib{} 'C:\\data\\lib{}';\n".format(k % 7, k % 7))
+        self.message("NOTE: Libref LIB{} was successfully assigned as follows: \n"
+                     "      Engine:        V9 \n      Physical Name: C:\\data\\lib{}\n".format(k % 7, k % 7))
+
+    # Blocks and their weights, close to the mix of the production programs
+    BLOCKS = (("comment_block", 2), ("let", 1), ("data_step", 5), ("proc_sql", 2), ("proc_sort", 2),
+              ("proc_import", 1), ("proc_export", 1), ("macro_call", 1))
+
+    def add_block(self):
+        names, weights = zip(*self.BLOCKS)
+        getattr(self, self.rng.choices(names, weights)[0])()
+        self.nb_blocks += 1
+        if self.rng.random() < 0.5:
+            self.source([""])
+
+
+def generate_job(nb_lines, seed=0, fullstimer=0.5):
+    """Program of about nb_lines lines and the log of its run.
+    INPUT:  number of program lines, seed, FULLSTIMER share of the steps
+    OUTPUT: (program text, log text)
+    """
+    job = SyntheticJob(random.Random(seed), fullstimer)
+    while job.nb_lines < nb_lines:
+        job.add_block()
+    job.message("NOTE: SAS Institute Inc., SAS Campus Drive, Cary, NC USA 27513-2414\n"
+                "NOTE: The SAS System used:\n      real time           2.00 seconds\n"
+                "      cpu time            1.00 seconds\n      \n")
+    return "".join(job.program), "".join(job.log)
+
+
+def write_job(folder, name, nb_lines, seed=0, fullstimer=0.5):
+    """Write name.sas and name.log to folder. Returns their paths."""
+    program, log = generate_job(nb_lines, seed, fullstimer)
+    paths = []
+    for extension, text in ((".sas", program), (".log", log)):
+        path = os.path.join(folder, name + extension)
+        with open(path, "w", newline="\n") as outfile:
+            outfile.write(text)
+        paths.append(path)
+    return tuple(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder", help="folder to write the jobs to")
+    parser.add_argument("--lines", type=int, default=10000, help="lines per program")
+    parser.add_argument("--jobs", type=int, default=1, help="number of jobs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.folder, exist_ok=True)
+    for i in range(args.jobs):
+        for path in write_job(args.folder, "job{}".format(i), args.lines, args.seed + i):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Batch driver parsing SAS logs and programs over a process pool
+
+.. pseudocode::
+
+    - List the .log and .sas files of the input folders
+    - Parse each file in a worker process, one file per task
+    - Skip the parsing of files whose content is already in the parse cache
+    - Collect the mapping rows and lineage edges of each file
+    - Aggregate the observations moved along each edge over the logs
+    - Merge them in the parent, ordered by file path so that the output does not depend on
+      the order in which workers finish
+    - Report the files that failed without stopping the run
+    - Stop the parse of a file running over its time budget, and scan it again with the degraded
+      parse of its kind, flagging it as partially parsed
+    - Replace the edges of the files parsed in the corpus wide lineage graph
+    - Keep the output files of each parse in memory in its worker, and write them in the parent
+      through one sink for the whole batch: the output folder, an archive or a JSON Lines file
+    - Optionally time the stages of each parse, merged over the batch and written for Prometheus
+"""
+import os
+import io
+import argparse
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from sas_log_parser import get_list_log, iter_log_procedures, log_mapping_row, log_lineage_edges, \
+    write_log_mapping, log_stats_row, write_log_stats, rank_step_stats, scan_log, log_output_name, \
+    STATS_REAL_TIME
+from sas_program_mapper import get_list, SASProgram, scan_program, summary_text
+from sas_output import MappingTable, MAPPING_COLUMNS, MACRO_COLUMNS, STEP_STATS_COLUMNS, VOLUME_COLUMNS, file_stem, \
+    MemorySink, open_sink, output_sink
+from sas_cache import ParseCache, content_key, DEFAULT_MAX_BYTES
+from sas_lineage import LineageGraph, lineage_edge, aggregate_edge_volumes, write_flow_dot
+from sas_stats import StageStats, merge_stats, write_file_stats
+from sas_budget import TimeBudget, ParseBudgetExceeded
+
+BATCH_MAPPING_COLUMNS = ["File", "Kind"] + MAPPING_COLUMNS
+BATCH_MACRO_COLUMNS = ["File", "Kind"] + MACRO_COLUMNS
+BATCH_LINEAGE_COLUMNS = ["File", "Kind", "Input", "Output", "Procedure Type", "Observations"]
+BATCH_FAILURE_COLUMNS = ["File", "Kind", "Error"]
+BATCH_PARTIAL_COLUMNS = ["File", "Kind", "Reason"]
+BATCH_STATS_COLUMNS = ["Rank", "File"] + STEP_STATS_COLUMNS[1:]
+
+
+class BatchFileResult:
+    """Outcome of parsing one file in a worker.
+    INPUT:  file path, kind ("log" or "program")
+    OUTPUT: extracted records (SAS procedures or program components), mapping rows,
+            lineage edges (input, output, procedure type, observations of logs), macro variable rows,
+            step statistics rows (logs), cache status (None when no cache is used), error message if failed, StageStats of the parse,
+            reason of the degraded parse if the file was only partially parsed,
+            output files (name, text) of the parse until run_batch writes them to its sink
+    """
+    def __init__(self, path, kind, stage_stats=None):
+        self.path = path
+        self.kind = kind
+        self.components = []
+        self.mapping = []
+        self.edges = []
+        self.macros = []
+        self.stats = []
+        self.residuals = ""
+        self.report = ""
+        self.cached = None
+        self.error = None
+        self.partial = None
+        self.stage_stats = stage_stats if stage_stats is not None else StageStats(enabled=False)
+        self.outputs = []
+
+    def load(self, record):
+        self.components = record["components"]
+        self.mapping = record["mapping"]
+        self.edges = record["edges"]
+        self.macros = record["macros"]
+        self.stats = record["stats"]
+        self.residuals = record["residuals"]
+        self.report = record["report"]
+
+
+def data_name_pairs(data_names):
+    return [[str(x[0]), str(x[1])] for x in data_names]
+
+
+def parse_log_file(path, note_mode="short", stage_stats=None, sink=None):
+    stage_stats = stage_stats if stage_stats is not None else StageStats(enabled=False)
+    record = {"components": [], "mapping": [], "edges": [], "macros": [], "stats": [], "residuals": "",
+              "report": ""}
+    for i, sasproc in enumerate(iter_log_procedures(path, note_mode, stats=stage_stats)):
+        record["components"].append([sasproc.start_line, sasproc.end_line, sasproc.ProcType,
+                                     sasproc.data_in, sasproc.data_out, sasproc.resources, sasproc.stats,
+                                     sasproc.data_in_obs, sasproc.data_out_obs, sasproc.data_out_vars])
+        row = log_mapping_row(i, sasproc)
+        if row is not None:
+            record["mapping"].append(row)
+        row = log_stats_row(i, sasproc)
+        if row is not None:
+            record["stats"].append(row)
+        record["edges"].extend(log_lineage_edges(sasproc))
+    with stage_stats.stage("write_outputs"):
+        write_log_mapping(path, record["mapping"], sink)
+        write_log_stats(path, record["stats"], sink)
+    return record
+
+
+def parse_program_file(path, stage_stats=None, sink=None):
+    # SASProgram prints its extraction summary, which would interleave between workers
+    with contextlib.redirect_stdout(io.StringIO()):
+        sas = SASProgram(path, stats=stage_stats, sink=sink)
+    components = []
+    for comp in sas.components:
+        components.append([type(comp).__name__, comp.start, comp.end, getattr(comp, "name", ""),
+                           data_name_pairs(getattr(comp, "data_in", [])),
+                           data_name_pairs(getattr(comp, "data_out", []))])
+    return {"components": components,
+            "mapping": list(sas.mapping_rows()),
+            "edges": list(sas.lineage_edges()),
+            "macros": list(sas.macro_rows()),
+            "stats": [],
+            "residuals": sas.residuals_text(),
+            # Without the residuals file name, the record being shared by the programs of the same content
+            "report": sas.extraction_report()}
+
+
+def scan_file(path, kind, reason, sink=None):
+    """Record of the degraded parse of a file (scan_log, scan_program), whose mapping and summary
+    are written to sink (output/ by default), the summary flagging the parse as partial."""
+    record = {"components": [], "mapping": [], "edges": [], "macros": [], "stats": [], "residuals": "",
+              "report": ""}
+    steps = scan_log(path) if kind == "log" else scan_program(path)
+    for i, (name, start, end, data_in, data_out) in enumerate(steps):
+        if kind == "log":
+            record["components"].append([start, end, name, data_in, data_out, [], {}, [None] * len(data_in),
+                                         [None] * len(data_out), [None] * len(data_out)])
+            edges = [(x, y, name, None) for x in data_in for y in data_out]
+        else:
+            record["components"].append([name, start, end, name, data_name_pairs(data_in),
+                                         data_name_pairs(data_out)])
+            data_in = [".".join(x) for x in data_in]
+            data_out = [".".join(x) for x in data_out]
+            edges = [(x, y, name) for x in data_in for y in data_out]
+        record["mapping"].append([str(i), str(start), str(end), name.upper(), "|".join(data_in), "|".join(data_out),
+                                  "", "", ""])
+        record["edges"].extend(edges)
+    sink = output_sink(sink)
+    if kind == "log":
+        write_log_mapping(path, record["mapping"], sink)
+    else:
+        output_map = MappingTable(MAPPING_COLUMNS)
+        output_map.extend(record["mapping"])
+        output_map.write_to(sink, "mapping_{}.csv".format(file_stem(path)))
+    scanned = "notes of the data sets read and written" if kind == "log" else \
+        "DATA, SET, CREATE TABLE, FROM and JOIN keywords"
+    summary_name = log_output_name("summary", path, "txt") if kind == "log" else \
+        "summary_{}.txt".format(file_stem(path))
+    sink.write(summary_name,
+               "Partial parse: \n"
+               "\t {} \n".format(reason) +
+               "Only the {} were scanned. \n".format(scanned) +
+               "Number of steps found: \n"
+               "\t {} \n".format(len(steps)))
+    return record
+
+
+def restore_outputs(result, sink=None):
+    # The per-file outputs of a cache hit are rewritten from the cached rows and texts
+    sink = output_sink(sink)
+    if result.kind == "log":
+        write_log_mapping(result.path, result.mapping, sink)
+        write_log_stats(result.path, result.stats, sink)
+    else:
+        filename = file_stem(result.path)
+        output_map = MappingTable(MAPPING_COLUMNS)
+        output_map.extend(result.mapping)
+        output_map.write_to(sink, "mapping_{}.csv".format(filename))
+        output_macro = MappingTable(MACRO_COLUMNS)
+        output_macro.extend(result.macros)
+        output_macro.write_to(sink, "macros_{}.csv".format(filename))
+        sink.write("residuals_{}.txt".format(filename), result.residuals)
+        sink.write("summary_{}.txt".format(filename), summary_text(result.report, result.path))
+
+
+def parse_file(task):
+    path, kind, cache_dir, instrument, budget, budget_cpu = task
+    stage_stats = StageStats(enabled=instrument)
+    result = BatchFileResult(path, kind, stage_stats)
+    # The output files are sent back with the result, the parent writing those of the whole batch
+    sink = MemorySink()
+    try:
+        record = None
+        if cache_dir is not None:
+            cache = ParseCache(cache_dir)
+            with stage_stats.stage("cache_get"):
+                key = content_key(path, kind)
+                record = cache.get(key)
+            result.cached = record is not None
+        if record is None:
+            try:
+                with TimeBudget(budget, budget_cpu):
+                    if kind == "log":
+                        record = parse_log_file(path, stage_stats=stage_stats, sink=sink)
+                    else:
+                        record = parse_program_file(path, stage_stats, sink)
+            except ParseBudgetExceeded as e:
+                result.partial = str(e)
+                with stage_stats.stage("degraded_parse"):
+                    record = scan_file(path, kind, result.partial, sink)
+            # A partial record is not cached, the file is parsed again by the next batch
+            if cache_dir is not None and result.partial is None:
+                with stage_stats.stage("cache_put"):
+                    cache.put(key, record)
+            result.load(record)
+        else:
+            result.load(record)
+            with stage_stats.stage("restore_outputs"):
+                restore_outputs(result, sink)
+        with stage_stats.stage("write_flow_dot"):
+            flow_name = log_output_name("flow", path, "dot") if kind == "log" else \
+                "flow_{}.dot".format(file_stem(path))
+            write_flow_dot(result.edges, sink, flow_name)
+        result.outputs = list(sink.files.items())
+    except Exception as e:
+        result = BatchFileResult(path, kind, stage_stats)
+        result.error = "".join(traceback.format_exception_only(type(e), e)).strip()
+    return result
+
+
+class BatchReport:
+    """Per-file results of a batch merged in a deterministic order."""
+    def __init__(self, results):
+        self.results = sorted(results, key=lambda result: (result.kind, result.path))
+        self.failures = [result for result in self.results if result.error is not None]
+        self.partials = [result for result in self.results if result.partial is not None]
+        self.cache_hits = len([result for result in self.results if result.cached == True])
+        self.cache_misses = len([result for result in self.results if result.cached == False])
+
+    def mapping_rows(self):
+        for result in self.results:
+            for row in result.mapping:
+                yield [result.path, result.kind] + list(row)
+
+    def macro_rows(self):
+        for result in self.results:
+            for row in result.macros:
+                yield [result.path, result.kind] + list(row)
+
+    def stats_rows(self):
+        """Step statistics of all the logs, ranked from the most expensive step."""
+        rows = [[result.path] + list(row) for result in self.results for row in result.stats]
+        ranked = rank_step_stats(rows, key=lambda row: row[1 + STATS_REAL_TIME])
+        return [[rank] + row for rank, row in enumerate(ranked, 1)]
+
+    def lineage_edges(self):
+        for result in self.results:
+            for edge in result.edges:
+                yield [result.path, result.kind] + lineage_edge(edge)
+
+    def volume_rows(self):
+        """Observations moved along each edge, aggregated over the logs."""
+        return aggregate_edge_volumes([result.path] + lineage_edge(edge) for result in self.results
+                                      if result.kind == "log" for edge in result.edges)
+
+    def file_stats(self):
+        """(file, kind, StageStats) of each file."""
+        return [(result.path, result.kind, result.stage_stats) for result in self.results]
+
+    def stage_stats(self):
+        """StageStats of the batch, by kind of file."""
+        return merge_stats(self.file_stats())
+
+    def update_lineage(self, lineage):
+        """Replace the edges of the files parsed in lineage. Failed files keep their previous edges.
+        Returns the number of files whose edges changed."""
+        nb_updated = 0
+        for result in self.results:
+            if result.error is None:
+                if lineage.replace_file(os.path.abspath(result.path), result.kind, result.edges):
+                    nb_updated += 1
+        return nb_updated
+
+    def write(self, sink):
+        for filename, columns, rows in (
+                ("batch_mapping.csv", BATCH_MAPPING_COLUMNS, self.mapping_rows()),
+                ("batch_macros.csv", BATCH_MACRO_COLUMNS, self.macro_rows()),
+                ("batch_lineage.csv", BATCH_LINEAGE_COLUMNS, self.lineage_edges()),
+                ("batch_stats.csv", BATCH_STATS_COLUMNS, self.stats_rows()),
+                ("batch_volumes.csv", VOLUME_COLUMNS, self.volume_rows()),
+                ("batch_failures.csv", BATCH_FAILURE_COLUMNS,
+                 ([result.path, result.kind, result.error] for result in self.failures)),
+                ("batch_partial.csv", BATCH_PARTIAL_COLUMNS,
+                 ([result.path, result.kind, result.partial] for result in self.partials))):
+            sink.write_csv(filename, columns, rows)
+
+
+def run_batch(log_files=(), program_files=(), workers=None, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+              instrument=False, budget=None, budget_cpu=False, sink=None):
+    """Parse logs and programs over a pool of workers processes.
+    workers defaults to the number of CPUs. Failures are recorded in the report, never raised.
+    With a cache_dir, files whose content was already parsed are restored from the parse cache,
+    which is then trimmed to cache_max_bytes.
+    With instrument, the stages of each parse are timed (BatchReport.stage_stats).
+    With a budget, in seconds of wall clock time (of CPU time with budget_cpu), the parse of a file
+    running over it is stopped and replaced by a degraded parse (BatchReport.partials).
+    The output files of each file are written to sink, an OutputSink, in the order of the files, as
+    their parses end; to output/ by default. The sink is left open.
+    """
+    tasks = [(path, "log", cache_dir, instrument, budget, budget_cpu) for path in log_files] + \
+            [(path, "program", cache_dir, instrument, budget, budget_cpu) for path in program_files]
+    if not tasks:
+        return BatchReport([])
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (workers * 4))
+    sink = output_sink(sink)
+    results = []
+    # File each output file was written for: two files of the same name in different folders
+    # would write the same outputs, the second one is failed rather than overwriting the first one
+    written = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(parse_file, tasks, chunksize=chunksize):
+            collisions = [name for name, text in result.outputs if written.get(name, result.path) != result.path]
+            if collisions:
+                failed = BatchFileResult(result.path, result.kind, result.stage_stats)
+                failed.error = "{} already written for {}".format(collisions[0], written[collisions[0]])
+                result = failed
+            for name, text in result.outputs:
+                written[name] = result.path
+                sink.write(name, text)
+            result.outputs = []
+            results.append(result)
+    if cache_dir is not None:
+        ParseCache(cache_dir, cache_max_bytes).evict()
+    return BatchReport(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse SAS logs and programs over a process pool.")
+    parser.add_argument("--logs", action="append", default=[], help="folder of .log files")
+    parser.add_argument("--programs", action="append", default=[], help="folder of .sas files")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--cache", default=None, help="parse cache directory")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="size bound of the parse cache in MB")
+    parser.add_argument("--lineage", default=None, help="JSON file of the corpus wide lineage graph, updated in place")
+    parser.add_argument("--metrics", default=None, help="Prometheus text file to write the time of each parsing stage to")
+    parser.add_argument("--metrics-per-file", action="store_true", help="also write the stage times of each file")
+    parser.add_argument("--budget", type=float, default=None, metavar="SECONDS",
+                        help="time budget of the parse of a file, after which it is only partially parsed")
+    parser.add_argument("--budget-cpu", action="store_true", help="count the CPU time of the parse in the budget")
+    parser.add_argument("--output", default=None,
+                        help="folder, .zip/.tar/.tar.gz archive or .jsonl file the outputs are written to "
+                             "(default: output)")
+    args = parser.parse_args(argv)
+
+    log_files = sorted(path for folder in args.logs for path in get_list_log(folder))
+    program_files = sorted(path for folder in args.programs for path in get_list(folder))
+    with open_sink(args.output) as sink:
+        report = run_batch(log_files, program_files, args.workers, args.cache, args.cache_max_mb * 1024 * 1024,
+                           args.metrics is not None, args.budget, args.budget_cpu, sink)
+        report.write(sink)
+        if args.lineage is not None:
+            lineage = LineageGraph.load(args.lineage)
+            nb_updated = report.update_lineage(lineage)
+            lineage.save(args.lineage)
+            lineage.write_dot(sink)
+
+    print("Files processed: \n"
+          "\t {} \n".format(len(report.results)))
+    print("Files failed: \n"
+          "\t {} \n".format(len(report.failures)))
+    for result in report.failures:
+        print("\t {}: {}".format(result.path, result.error))
+    if report.partials:
+        print("Files partially parsed: \n"
+              "\t {} \n".format(len(report.partials)))
+        for result in report.partials:
+            print("\t {}: {}".format(result.path, result.partial))
+        print("")
+    stats_rows = report.stats_rows()
+    if stats_rows:
+        print("Most expensive steps (real time): ")
+        for row in stats_rows[:5]:
+            print("\t {:.2f}s {} lines {}-{} of {}".format(row[BATCH_STATS_COLUMNS.index("Real Time")],
+                                                          row[BATCH_STATS_COLUMNS.index("Procedure Type")],
+                                                          row[BATCH_STATS_COLUMNS.index("Start Line Number")],
+                                                          row[BATCH_STATS_COLUMNS.index("End Line Number")],
+                                                          row[BATCH_STATS_COLUMNS.index("File")]))
+        print("")
+    volume_rows = [row for row in report.volume_rows() if row[VOLUME_COLUMNS.index("Max Observations")] is not None]
+    if volume_rows:
+        print("Heaviest flows (max observations): ")
+        for row in volume_rows[:5]:
+            print("\t {} {} -> {} over {} logs".format(row[VOLUME_COLUMNS.index("Max Observations")],
+                                                      row[VOLUME_COLUMNS.index("Input")],
+                                                      row[VOLUME_COLUMNS.index("Output")],
+                                                      row[VOLUME_COLUMNS.index("Logs")]))
+        print("")
+    if args.lineage is not None:
+        print("Lineage graph: \n"
+              "\t files: {} \n"
+              "\t updated: {} \n"
+              "\t tables: {} \n".format(len(lineage), nb_updated, lineage.graph.number_of_nodes()))
+    if args.metrics is not None:
+        write_file_stats(args.metrics, report.file_stats(), args.metrics_per_file)
+        for kind, stats in sorted(report.stage_stats().items()):
+            print("Slowest stages ({}s): ".format(kind))
+            for name, calls, seconds, items in stats.rows()[:5]:
+                print("\t {:.2f}s {} ({} items)".format(seconds, name, items))
+            print("")
+    if args.cache is not None:
+        print("Parse cache: \n"
+              "\t hits: {} \n"
+              "\t misses: {} \n".format(report.cache_hits, report.cache_misses))
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
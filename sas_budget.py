@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Time budget of the parse of one file
+
+.. pseudocode::
+
+    - Arm an interval timer when the parse of a file starts, in wall clock or CPU time
+    - When the timer fires, raise ParseBudgetExceeded in the parse, wherever it is, regular
+      expression matching included
+    - Disarm the timer and restore the former signal handler when the parse ends
+
+.. warning::
+
+    The budget relies on signal.setitimer: it is only enforced on Unix, in the main thread of a
+    process, such as a worker of the batch process pool. Elsewhere the parse runs without budget.
+    A signal is only handled between Python bytecodes and regular expression steps, so a single
+    long call into C code that never checks for signals overruns the budget.
+"""
+import signal
+import threading
+
+
+class ParseBudgetExceeded(Exception):
+    """Raised in a parse running over its time budget."""
+
+
+class TimeBudget:
+    """Context manager raising ParseBudgetExceeded in its block after seconds of time.
+    INPUT:  seconds of the budget (None for no budget), cpu: count the CPU time of the process
+            instead of the wall clock time
+    """
+    def __init__(self, seconds, cpu=False):
+        self.seconds = seconds
+        self.cpu = cpu
+        self.armed = False
+        self.former_handler = None
+
+    @staticmethod
+    def enforceable():
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    @property
+    def timer(self):
+        return (signal.ITIMER_PROF, signal.SIGPROF) if self.cpu else (signal.ITIMER_REAL, signal.SIGALRM)
+
+    def expire(self, signum, frame):
+        raise ParseBudgetExceeded("parse ran over its budget of {}s of {} time".format(
+            self.seconds, "CPU" if self.cpu else "wall clock"))
+
+    def __enter__(self):
+        if self.seconds is None or not self.enforceable():
+            return self
+        timer, signum = self.timer
+        self.former_handler = signal.signal(signum, self.expire)
+        signal.setitimer(timer, self.seconds)
+        self.armed = True
+        return self
+
+    def __exit__(self, *exc):
+        if self.armed:
+            timer, signum = self.timer
+            self.armed = False
+            try:
+                signal.setitimer(timer, 0)
+            finally:
+                # Restored even when the timer fires as the block ends
+                signal.signal(signum, self.former_handler)
+        return False
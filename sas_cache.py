@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of parse results for SAS logs and programs
+
+.. pseudocode::
+
+    - Hash the content of the file together with its kind and the parser version
+    - Look the hash up in the cache directory, a hit skips parsing entirely
+    - Store the extracted records of a miss as zlib-compressed JSON
+    - Evict the least recently used entries once the cache is over its size bound
+
+.. warning::
+
+    Bump PARSER_VERSION whenever a change in the parsers changes their output, so that entries
+    written by the previous version are no longer hit.
+"""
+import os
+import json
+import zlib
+import hashlib
+import tempfile
+
+PARSER_VERSION = "10"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def content_key(path, kind, parser_version=PARSER_VERSION):
+    digest = hashlib.sha256()
+    digest.update("{}\0{}\0".format(kind, parser_version).encode("utf-8"))
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """On-disk cache of parse records.
+    Entries live in directory/<key[:2]>/<key>.json.z. A hit refreshes the modification time of the
+    entry, which evict() uses as the LRU order.
+    INPUT:  cache directory, size bound in bytes
+    OUTPUT: records (dict) of previously parsed contents, hit/miss counters
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json.z")
+
+    def get(self, key):
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, "rb") as infile:
+                record = json.loads(zlib.decompress(infile.read()).decode("utf-8"))
+            os.utime(entry_path)
+        except (OSError, ValueError, zlib.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def put(self, key, record):
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        data = zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        # Written aside then renamed, so that concurrent workers never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(data)
+        os.replace(tmp_path, entry_path)
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                if file.endswith(".json.z"):
+                    entry_path = os.path.join(root, file)
+                    stat = os.stat(entry_path)
+                    yield stat.st_mtime, stat.st_size, entry_path
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes. Returns the number removed."""
+        entries = sorted(self.entries())
+        total_size = sum(size for _, size, _ in entries)
+        nb_removed = 0
+        for _, size, entry_path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            total_size -= size
+            nb_removed += 1
+        return nb_removed
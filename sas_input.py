@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Input layer for SAS logs and programs, plain or compressed
+
+.. pseudocode::
+
+    - List the .log/.sas files of a folder, with their .gz and .zst archives
+    - Tell the compression of a file from its first bytes, whatever its name
+    - Decompress while reading, without writing the decompressed file anywhere
+
+.. warning::
+
+    Reading .zst files needs the zstandard package, imported only when such a file is opened.
+"""
+import io
+import os
+import gzip
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSED_EXTENSIONS = (".gz", ".zst")
+CHUNK_SIZE = 1024 * 1024
+
+
+def list_input_files(sp_path, extension):
+    """Files of sp_path and its subfolders named *<extension>, plain or compressed."""
+    extensions = (extension,) + tuple(extension + compressed for compressed in COMPRESSED_EXTENSIONS)
+    script_list = list()
+    for root, dirs, files in os.walk(sp_path):
+        for file in files:
+            if file.lower().endswith(extensions):
+                script_list.append(os.path.join(root, file))
+    return script_list
+
+
+def strip_compressed_extension(filename):
+    for compressed in COMPRESSED_EXTENSIONS:
+        if filename.lower().endswith(compressed):
+            return filename[:-len(compressed)]
+    return filename
+
+
+def compression(path):
+    """"gzip", "zstd" or None for a plain file, from the magic bytes of the file."""
+    with open(path, "rb") as infile:
+        magic = infile.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def open_input(path):
+    """Binary file object of the decompressed contents of path, decompressed while it is read."""
+    kind = compression(path)
+    if kind == "gzip":
+        return gzip.open(path, "rb")
+    if kind == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("the zstandard package is needed to read {}".format(path)) from None
+        # Files written by parallel compressors are made of many frames
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True,
+                                                             closefd=True)
+        return io.BufferedReader(reader, CHUNK_SIZE)
+    return open(path, "rb")
+
+
+def open_input_text(path):
+    """Text file object of path, read as open(path, "r") would read the decompressed file."""
+    return io.TextIOWrapper(open_input(path))
+
@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Single-pass lexer of SAS programs
+
+.. pseudocode::
+
+    - Walk the source once, jumping from one ; quote or comment mark to the next
+    - Skip quoted strings, so that the ; and comment marks they contain are text
+    - Cut comments: /* ... */ anywhere, * ...; and %* ...; where a statement would start
+    - Cut statements at their ;, wherever their lines break
+    - Group the statements into blocks: a DATA or PROC step runs from its DATA or PROC statement
+      to its RUN; or QUIT; (PROC SQL to its QUIT;) or to the start of the next step, any other
+      statement or comment is a block of its own
+
+Tokens are streamed, so that a program is never held as a list of tokens.
+
+Tokens and blocks are offsets into the source, with the lines they start and end on (the first
+line of the source is 0, the end line is excluded), as SASScriptComponent counts them.
+"""
+import re
+
+_NON_SPACE = re.compile(r"\S")
+_STATEMENT_MARK = re.compile(r"/\*|['\";]")
+_KEYWORD = re.compile(r"%?[a-zA-Z_][a-zA-Z0-9_]*")
+_PROC_NAME = re.compile(r"(?i)proc\s+([a-zA-Z_][a-zA-Z0-9_]*)")
+
+
+class SASToken:
+    """Comment or statement of a SAS program.
+    INPUT:  kind ("comment_block", "comment" or "statement"), begin and stop offsets in the source,
+            start and end lines, lowercase first word of a statement
+    """
+    __slots__ = ("kind", "begin", "stop", "start", "end", "keyword")
+
+    def __init__(self, kind, begin, stop, start, end, keyword=None):
+        self.kind = kind
+        self.begin = begin
+        self.stop = stop
+        self.start = start
+        self.end = end
+        self.keyword = keyword
+
+    def __repr__(self):
+        return "SASToken({!r}, {}, {}, {}, {}, {!r})".format(self.kind, self.begin, self.stop, self.start,
+                                                             self.end, self.keyword)
+
+
+class SASBlock:
+    """DATA step, PROC step, statement outside of the steps or comment of a SAS program.
+    INPUT:  kind ("data", "proc", "statement", "comment_block" or "comment"), its statements (SASToken),
+            or the comment, lowercase name of the procedure of a PROC step
+    """
+    __slots__ = ("kind", "statements", "name")
+
+    def __init__(self, kind, statements, name=None):
+        self.kind = kind
+        self.statements = statements
+        self.name = name
+
+    @property
+    def begin(self):
+        return self.statements[0].begin
+
+    @property
+    def stop(self):
+        return self.statements[-1].stop
+
+    @property
+    def start(self):
+        return self.statements[0].start
+
+    @property
+    def end(self):
+        return self.statements[-1].end
+
+
+class LineCounter:
+    """Line of offsets asked for in increasing order, counting the line breaks once."""
+    __slots__ = ("source", "offset", "line")
+
+    def __init__(self, source):
+        self.source = source
+        self.offset = 0
+        self.line = 0
+
+    def __call__(self, offset):
+        self.line += self.source.count("\n", self.offset, offset)
+        self.offset = offset
+        return self.line
+
+
+def quote_stop(source, begin, quote):
+    # A quote is escaped by doubling it: 'it''s'
+    position = begin + 1
+    while True:
+        stop = source.find(quote, position)
+        if stop < 0:
+            return len(source)
+        if source.startswith(quote, stop + 1):
+            position = stop + 2
+        else:
+            return stop + 1
+
+
+def mark_stop(source, begin, mark):
+    stop = source.find(mark, begin)
+    return len(source) if stop < 0 else stop + len(mark)
+
+
+def lex_program(source):
+    """Comments and statements of a SAS program in one pass.
+    INPUT:  source of the program
+    OUTPUT: SASToken of each comment and statement, as they end. A comment inside a statement is
+            also part of the statement, and comes before it.
+    """
+    line_of = LineCounter(source)
+    position = 0
+    statement = None
+    while True:
+        if statement is None:
+            match = _NON_SPACE.search(source, position)
+            if match is None:
+                break
+            begin = match.start()
+            if source.startswith("/*", begin):
+                kind, stop = "comment_block", mark_stop(source, begin + 2, "*/")
+            elif source.startswith("*", begin) or source.startswith("%*", begin):
+                kind, stop = "comment", mark_stop(source, begin, ";")
+            else:
+                keyword = _KEYWORD.match(source, begin)
+                statement = SASToken("statement", begin, None, line_of(begin), None,
+                                     keyword.group().lower() if keyword else "")
+                position = begin
+                continue
+            yield SASToken(kind, begin, stop, line_of(begin), line_of(stop - 1) + 1)
+            position = stop
+            continue
+        match = _STATEMENT_MARK.search(source, position)
+        if match is None:
+            # The last statement of the source has no ;
+            stop = len(source.rstrip())
+        else:
+            mark = match.group()
+            if mark == "/*":
+                stop = mark_stop(source, match.end(), "*/")
+                yield SASToken("comment_block", match.start(), stop, line_of(match.start()),
+                               line_of(stop - 1) + 1)
+                position = stop
+                continue
+            if mark != ";":
+                position = quote_stop(source, match.start(), mark)
+                continue
+            stop = match.end()
+        statement.stop = stop
+        statement.end = line_of(stop - 1) + 1
+        yield statement
+        statement = None
+        position = stop
+        if match is None:
+            break
+
+
+def step_end(step_keyword, keyword):
+    # PROC SQL runs each statement as it is read, RUN; does not end it
+    if step_keyword == "sql":
+        return keyword == "quit"
+    return keyword in ("run", "quit")
+
+
+def group_blocks(source, tokens):
+    """DATA steps, PROC steps, statements outside of the steps and comments.
+    INPUT:  source, SASToken of the program (lex_program)
+    OUTPUT: SASBlock of each step and statement in source order, of each comment as it ends, PROC
+            steps being named after their procedure
+    """
+    step = None
+    step_keyword = None
+    for token in tokens:
+        if token.kind != "statement":
+            yield SASBlock(token.kind, [token])
+            continue
+        keyword = token.keyword
+        if keyword in ("data", "proc"):
+            if step is not None:
+                yield step
+            # The procedure name tells how the step ends
+            name = _PROC_NAME.match(source, token.begin) if keyword == "proc" else None
+            step = SASBlock(keyword, [token], name.group(1).lower() if name else None)
+            step_keyword = step.name or keyword
+        elif step is not None:
+            step.statements.append(token)
+            if step_end(step_keyword, keyword):
+                yield step
+                step = None
+        else:
+            yield SASBlock("statement", [token])
+    if step is not None:
+        yield step
+
+
+def first_statement(source, keyword):
+    """Text of the first statement of source starting with keyword, None when there is none."""
+    for token in lex_program(source):
+        if token.kind == "statement" and token.keyword == keyword:
+            return source[token.begin:token.stop]
+    return None
+
+
+_PARENTHESIS_MARK = re.compile(r"[()'\"]")
+
+
+def strip_parentheses(text):
+    """text without its parenthesized parts, however nested, in one pass. Parentheses in quotes do not
+    count, and an unclosed parenthesis is kept with the rest of the text."""
+    parts = []
+    depth = 0
+    position = 0
+    opening = None
+    match = _PARENTHESIS_MARK.search(text)
+    while match is not None:
+        mark = match.group()
+        next_position = match.end()
+        if mark == "(":
+            if depth == 0:
+                parts.append(text[position:match.start()])
+                opening = match.start()
+            depth += 1
+        elif mark == ")":
+            if depth > 0:
+                depth -= 1
+                if depth == 0:
+                    position = match.end()
+        else:
+            next_position = quote_stop(text, match.start(), mark)
+        match = _PARENTHESIS_MARK.search(text, next_position)
+    parts.append(text[opening if depth > 0 else position:])
+    return "".join(parts)
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Lineage graph spanning every SAS log and program parsed
+
+.. pseudocode::
+
+    - Collect the (input, output, procedure type) edges extracted from each file
+    - Name the nodes by library and table, so that LIB.Y written by one program and read by another
+      is one node
+    - Keep WORK tables in the namespace of their file, WORK being cleared at the end of each session
+    - Weight the edges extracted from logs by the observations they move
+    - When a file is parsed again, replace only the edges it contributed
+    - Save the edges of each file to a JSON file, from which the graph is rebuilt
+    - Aggregate the observations of each edge over the logs of the runs of a job
+"""
+import os
+import json
+import statistics
+import tempfile
+# networkx is imported by the functions using it, importing the parsers does not load it
+
+LINEAGE_VERSION = 1
+
+
+def qualify_data_name(data_name, file):
+    """Node name of a data set referenced in file.
+    SAS names are case insensitive, so library.table names are lower cased. WORK tables are
+    prefixed by the file referencing them.
+    """
+    library, separator, table = data_name.partition(".")
+    if separator == "":
+        return data_name
+    if library.lower() == "work":
+        return "{}::work.{}".format(file, table.lower())
+    return "{}.{}".format(library.lower(), table.lower())
+
+
+def lineage_edge(edge):
+    """[input, output, procedure type, observations] of an edge, observations being None for the
+    (input, output, procedure type) edges of programs."""
+    data_in, data_out, label = edge[:3]
+    observations = edge[3] if len(edge) > 3 else None
+    return [str(data_in), str(data_out), str(label), None if observations is None else int(observations)]
+
+
+def aggregate_edge_volumes(file_edges):
+    """Observations moved along each edge, across many logs.
+    Edges are matched on their raw input/output names, so that WORK tables of the runs of one job are
+    the same edge.
+    INPUT:  (file, input, output, procedure type, observations) of the edges of the logs
+    OUTPUT: rows of VOLUME_COLUMNS, from the edge with the largest maximum volume
+    """
+    volumes = {}
+    for file, data_in, data_out, label, observations in file_edges:
+        edge = volumes.setdefault((data_in.upper(), data_out.upper(), label), [set(), []])
+        edge[0].add(file)
+        if observations is not None:
+            edge[1].append(int(observations))
+    rows = []
+    for (data_in, data_out, label), (files, counts) in volumes.items():
+        if counts:
+            rows.append([data_in, data_out, label, len(files), min(counts), statistics.median(counts), max(counts)])
+        else:
+            rows.append([data_in, data_out, label, len(files), None, None, None])
+    # Edges without any count go last
+    rows.sort(key=lambda row: (row[6] is not None, row[6] or 0), reverse=True)
+    return rows
+
+
+def flow_graph(edges):
+    """Data flow of one file.
+    INPUT:  lineage edges of the file
+    OUTPUT: networkx MultiDiGraph, each edge labelled by its procedure type
+    """
+    import networkx as nx
+    G = nx.MultiDiGraph()
+    for edge in edges:
+        data_name_in, data_name_out, label = edge[:3]
+        G.add_edge(data_name_in, data_name_out, label = label)
+    return G
+
+
+def dot_text(graph):
+    # Text nx_pydot.write_dot writes, the file being written by a sink
+    import networkx as nx
+    return nx.drawing.nx_pydot.to_pydot(graph).to_string()
+
+
+def write_flow_dot(edges, sink, name):
+    """Write the data flow of one file, as a dot file name, to an OutputSink."""
+    DG = flow_graph(edges)
+    DG.graph['graph'] = {'rankdir': 'LR', 'splines': 'line'}
+    sink.write(name, dot_text(DG))
+
+
+class LineageGraph:
+    """Corpus wide lineage graph.
+    INPUT:  lineage edges of each file, as returned by SASProgram.lineage_edges and log_lineage_edges
+    OUTPUT: networkx MultiDiGraph, each edge labelled by its procedure type and file, and weighted by
+            its observations when known, JSON file
+    """
+    def __init__(self):
+        import networkx as nx
+        self.graph = nx.MultiDiGraph()
+        self.files = {}
+        self.file_edges = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def replace_file(self, file, kind, edges):
+        """Replace the edges contributed by file. Returns False if they were unchanged."""
+        edges = [lineage_edge(edge) for edge in edges]
+        if file in self.files and self.files[file]["edges"] == edges:
+            return False
+        self.remove_file(file)
+        self.files[file] = {"kind": kind, "edges": edges}
+        keys = []
+        for data_in, data_out, label, observations in edges:
+            node_in = qualify_data_name(data_in, file)
+            node_out = qualify_data_name(data_out, file)
+            if observations is None:
+                key = self.graph.add_edge(node_in, node_out, label=label, file=file, kind=kind)
+            else:
+                key = self.graph.add_edge(node_in, node_out, label=label, file=file, kind=kind,
+                                          weight=observations)
+            keys.append((node_in, node_out, key))
+        self.file_edges[file] = keys
+        return True
+
+    def remove_file(self, file):
+        if file not in self.files:
+            return
+        del self.files[file]
+        nodes = set()
+        for node_in, node_out, key in self.file_edges.pop(file):
+            self.graph.remove_edge(node_in, node_out, key)
+            nodes.update((node_in, node_out))
+        # Nodes only referenced by the removed edges go with them
+        self.graph.remove_nodes_from([node for node in nodes if self.graph.degree(node) == 0])
+
+    def volumes(self):
+        """Observations of each edge aggregated over the logs of the graph, see aggregate_edge_volumes."""
+        return aggregate_edge_volumes((file, *edge) for file, contribution in sorted(self.files.items())
+                                      if contribution["kind"] == "log" for edge in contribution["edges"])
+
+    def upstream(self, node):
+        import networkx as nx
+        return nx.ancestors(self.graph, node)
+
+    def downstream(self, node):
+        import networkx as nx
+        return nx.descendants(self.graph, node)
+
+    def save(self, path):
+        data = json.dumps({"version": LINEAGE_VERSION, "files": self.files}, indent=1, sort_keys=True)
+        directory = os.path.dirname(os.path.abspath(path))
+        # output/lineage.json by default, the output files possibly going elsewhere (--output)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as outfile:
+            outfile.write(data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Rebuild the graph saved to path. A missing file gives an empty graph."""
+        lineage = cls()
+        if not os.path.isfile(path):
+            return lineage
+        with open(path, "r") as infile:
+            data = json.load(infile)
+        if data.get("version") != LINEAGE_VERSION:
+            return lineage
+        for file, contribution in sorted(data["files"].items()):
+            lineage.replace_file(file, contribution["kind"], contribution["edges"])
+        return lineage
+
+    def write_dot(self, sink, name="lineage.dot"):
+        """Write the graph, as a dot file name, to an OutputSink."""
+        import networkx as nx
+        # Node names are quoted, the ":" of the WORK namespaces and of Windows paths being read as
+        # ports by dot
+        def quote(name):
+            return '"{}"'.format(name.replace("\\", "/").replace('"', "'"))
+        graph = nx.relabel_nodes(self.graph, {node: quote(node) for node in self.graph.nodes()})
+        for _, _, attributes in graph.edges(data=True):
+            attributes["file"] = quote(attributes["file"])
+        graph.graph['graph'] = {'rankdir': 'LR', 'splines': 'line'}
+        sink.write(name, dot_text(graph))
@@ -2,27 +2,204 @@
 # -*- coding: utf-8 -*-
 
 import os
+import io
+import sys
 import shutil
 import re
-import pandas 
-import networkx as nx
-from pandas.util.testing import equalContents
-from fileinput import filename
+import time
+import functools
+import itertools
+import mmap
+import bisect
+import argparse
+from array import array
+from sas_output import MappingTable, MAPPING_COLUMNS, STEP_STATS_COLUMNS, VOLUME_COLUMNS, file_stem, open_sink, \
+    output_sink
+from sas_lineage import LineageGraph, aggregate_edge_volumes, write_flow_dot
+from sas_stats import StageStats, instrumented, write_file_stats
+from sas_input import list_input_files, compression, open_input, CHUNK_SIZE
 
 def get_list_log(sp_path):
-    script_list = list()
-    for root, dirs, files in os.walk(sp_path):
-        for file in files:
-            if file.lower().endswith(".log"):
-                 script_list.append(os.path.join(root, file))
-    return script_list
+    # .log.gz and .log.zst archives are listed with the plain logs
+    return list_input_files(sp_path, ".log")
+
+
+def decode_log_bytes(data, encoding=None):
+    """Decode bytes of a SAS log as reading it in text mode would.
+    Without encoding, UTF-8 is tried first and cp1252, written by SAS on Windows, is the fallback.
+    Undecodable bytes are replaced rather than failing the whole log.
+    data is bytes or any bytes-like object, such as a memory mapping, which is decoded without copying it.
+    """
+    if encoding is None:
+        try:
+            text = str(data, "utf-8")
+        except UnicodeDecodeError:
+            text = str(data, "cp1252", errors="replace")
+    else:
+        text = str(data, encoding, errors="replace")
+    return text.replace("\r\n", "\n")
+
+
+class SASLogMappedBuffer:
+    """Memory-mapped bytes of a whole plain SAS log, shared by the messages of the log.
+    The byte offset of each message is recorded by segment_log_bytes, and the bytes of a message
+    are only decoded when its contents is read.
+    A gzip or zstd compressed log cannot be mapped: it is streamed by segment_log_stream instead.
+    INPUT:  path of the plain log, encoding (optional, see decode_log_bytes)
+    OUTPUT: decoded text of a message, of the whole log
+    """
+    __slots__ = ("data", "encoding", "message_lines", "message_offsets")
+
+    def __init__(self, path, encoding=None):
+        self.data = self.map(path)
+        self.encoding = encoding
+        self.message_lines = array("q")
+        self.message_offsets = array("q")
+
+    @staticmethod
+    def map(path):
+        with open(path, "rb") as infile:
+            if os.fstat(infile.fileno()).st_size == 0:
+                # An empty file cannot be mapped
+                return b""
+            return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def add_message(self, start_line, offset):
+        self.message_lines.append(start_line)
+        self.message_offsets.append(offset)
+
+    def lines(self, start_line, end_line):
+        # Messages are always sliced whole, from their own start to the start of the next message
+        i = bisect.bisect_left(self.message_lines, start_line)
+        begin = self.message_offsets[i]
+        stop = self.message_offsets[i + 1] if i + 1 < len(self.message_offsets) else len(self.data)
+        return decode_log_bytes(self.data[begin:stop], self.encoding)
+
+    def text(self):
+        return decode_log_bytes(self.data, self.encoding)
+
+
+class SASLogMessageBytes:
+    """Offsets of one message in a SASLogMappedBuffer, for the messages of a streamed log: the buffer
+    keeps no index of them, so the memory held does not grow with the log.
+    INPUT:  SASLogMappedBuffer of the log, offsets of the first byte of the message and past its last
+    OUTPUT: decoded text of the message
+    """
+    __slots__ = ("log_buffer", "begin", "stop")
+
+    def __init__(self, log_buffer, begin, stop):
+        self.log_buffer = log_buffer
+        self.begin = begin
+        self.stop = stop
+
+    def lines(self, start_line, end_line):
+        return decode_log_bytes(self.log_buffer.data[self.begin:self.stop], self.log_buffer.encoding)
 
 
 class SASLogComponent():
+    """Message of a SAS log.
+    contents is either the text of the message, the SASLogMappedBuffer of the whole log or the
+    SASLogMessageBytes of the message, in which case the text is only sliced from the lines start_line
+    to end_line when contents is read.
+    """
+    __slots__ = ("start_line", "end_line", "buffer")
+
     def __init__(self,start_line, end_line, contents):
         self.start_line = start_line
         self.end_line = end_line
-        self.contents = contents
+        self.buffer = contents
+
+    @property
+    def contents(self):
+        if isinstance(self.buffer, (SASLogMappedBuffer, SASLogMessageBytes)):
+            return self.buffer.lines(self.start_line, self.end_line)
+        return self.buffer
+
+_DATA_NAME = r"[a-zA-Z_&][a-zA-Z0-9_&]{0,31}"
+_DATASET_NAME = _DATA_NAME + r"\." + _DATA_NAME
+_NOTE_HEAD = re.compile(r"(?i)NOTE:\s+(\S+)")
+
+# NOTE families used for data table level lineage, compiled once per process.
+# Each entry: (family, leading keywords, contained keyword, note type, pattern)
+# A family is only tried when the first word after "NOTE:" is one of its leading keywords, or when
+# its keyword is contained in the note, both being necessary for its pattern to match.
+# Families are listed by precedence: a later match overrides the Type/data_name of an earlier one,
+# while End_Proc is raised by any family ending a procedure.
+NOTE_FAMILIES = (
+    ("read", None, "observations", "INPUT",
+     re.compile(r"(?i)NOTE:.*observations\s+read\s+from\s+the\s+data\s+set\s+(?P<data_name>" + _DATASET_NAME + ")")),
+    ("empty", ("NO",), None, "INPUT",
+     re.compile(r"(?i)NOTE:\s+No\s+observations\s+in\s+data\s+set\s+(?P<data_name>" + _DATASET_NAME + ")")),
+    ("write", ("THE",), None, "OUTPUT",
+     re.compile(r"(?i)NOTE:\s+The\s+data\s+set\s+(?P<data_name>" + _DATASET_NAME + r")\s+has")),
+    ("step", ("DATA", "PROCEDURE"), None, None,
+     re.compile(r"(?i)NOTE:\s+(?:DATA\s+statement|PROCEDURE\s+(?P<proc>[a-zA-Z]+))\s+used\s+")),
+    ("infile", None, "infile", "INPUT",
+     re.compile(r"(?i)NOTE:.*\s+read\s+from\s+the\s+infile\s+(?P<data_name>" + _DATA_NAME + ")")),
+    ("libref", None, "libref", "LIBREFDEASSIGN",
+     re.compile(r"(?i)NOTE:.*\s+Libref\s+(?P<data_name>" + _DATA_NAME + r")\shas\s+been\s+deassigned")),
+    ("libref", None, "libref", "LIBREFASSIGN",
+     re.compile(r"(?i)NOTE:.*\s+Libref\s+(?P<data_name>" + _DATA_NAME + r")\s+was\s+successfully\s+assigned\s+as\s+follows:")),
+    ("include", None, "%include", None,
+     re.compile(r"(?i)NOTE:.*%INCLUDE\s+")),
+)
+
+def classify_note(contents):
+    """Classify a NOTE for data table level lineage.
+    INPUT:  note contents
+    OUTPUT: (Type, data_name, End_Proc)
+    """
+    note_type = ""
+    data_name = ""
+    end_proc = False
+    head = _NOTE_HEAD.match(contents)
+    head = head.group(1).upper() if head is not None else ""
+    lowered = contents.lower()
+    for family, leading, keyword, family_type, reg_exp in NOTE_FAMILIES:
+        if leading is not None and head not in leading:
+            continue
+        if keyword is not None and keyword not in lowered:
+            continue
+        match = reg_exp.match(contents)
+        if match is None:
+            continue
+        if family == "step":
+            note_type = "DATASTEP" if match.group("proc") is None else "PROC " + match.group("proc")
+            data_name = ""
+            end_proc = True
+        elif family == "libref":
+            note_type = family_type
+            data_name = match.group("data_name")
+            end_proc = True
+        elif family == "include":
+            end_proc = True
+        else:
+            note_type = family_type
+            data_name = match.group("data_name")
+    return note_type, data_name, end_proc
+
+# Observation counts of the notes reading or writing a data set, the records read from an infile
+# being counted as observations. "No observations" notes are 0 observations.
+_NOTE_COUNTS = (
+    re.compile(r"(?i)\s(?P<observations>\d+)\s+observations\s+read\s"),
+    re.compile(r"(?i)\shas\s+(?P<observations>\d+)\s+observations\s+and\s+(?P<variables>\d+)\s+variables"),
+    re.compile(r"(?i)\s(?P<observations>\d+)\s+records\s+were\s+read\s"),
+    re.compile(r"(?i)NOTE:\s+No\s+observations\s"),
+)
+
+def note_counts(contents):
+    """Row volume of an INPUT/OUTPUT note.
+    INPUT:  note contents
+    OUTPUT: (observations, variables), None when the note does not give it
+    """
+    for regex in _NOTE_COUNTS:
+        m = regex.search(contents)
+        if m is not None:
+            counts = m.groupdict()
+            observations = int(counts.get("observations") or 0)
+            variables = int(counts["variables"]) if counts.get("variables") else None
+            return observations, variables
+    return None, None
 
 class Note(SASLogComponent):
     """Note class
@@ -34,311 +211,203 @@ class Note(SASLogComponent):
             DATA_NAME:  Dataset/data table name
             RESNAME:    Resource name
             END_PROC:   Flag to indicate whether current note ends a SAS procedure/data step.
+            OBSERVATIONS, VARIABLES: Row volume read or written by INPUT/OUTPUT notes, None otherwise
     """
+    __slots__ = ("Type", "data_name", "End_Proc", "ResName", "observations", "variables")
+
     def __init__(self,start_line, end_line, contents):
         super().__init__(start_line, end_line, contents)
-        self.Type = ""
-        self.data_name = ""
-        #self.data_out = ""
+        Type, data_name, self.End_Proc = classify_note(self.contents)
+        # Names are interned, so that a data set named by many notes is stored once
+        self.Type = sys.intern(Type)
+        self.data_name = sys.intern(data_name)
         self.ResName = ""
-        self.End_Proc = False
-        
-        #Input type
-        reg_exp = re.compile(r"(?i)(?:^NOTE:.*observations\s+read\s+from\s+the\s+data\s+set\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}\.[a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "INPUT"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-            
-        #Input type
-        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+No\s+observations\s+in\s+data\s+set\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}\.[a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "INPUT"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-            
-        #Output type
-        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+The\s+data\s+set\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}\.[a-zA-Z_&][a-zA-Z0-9_&]{0,31}))\s+has")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "OUTPUT"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-            
-    
-        #Data step
-        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+DATA\s+statement\s+used\s+)")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "DATASTEP"
-            self.data_name = ""
-            self.ResName =""
-            self.End_Proc = True
-            
-        #Data step
-        reg_exp = re.compile(r"(?i)(?:^NOTE:\s+PROCEDURE\s+([a-zA-Z]+)\s+used\s+)")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "PROC " + re.search(reg_exp, self.contents).group(1)
-            self.data_name =  ""
-            self.ResName =""
-            self.End_Proc = True
-            
-        #Infile 1
-        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+read\s+from\s+the\s+infile\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "INPUT"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-            
-            
-        #libref deassign
-        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+Libref\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))\shas\s+been\s+deassigned")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "LIBREFDEASSIGN"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-            self.End_Proc = True
-            
-        #libref assign
-        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+Libref\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))\s+was\s+successfully\s+assigned\s+as\s+follows:")
-        if re.search(reg_exp, self.contents) != None:
-            self.Type = "LIBREFASSIGN"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-            self.End_Proc = True
-            
-        #Infile 2
-        """
-        reg_exp = re.compile(r"(?i)(?:^NOTE:.*\s+read\s+from\s+the\s+infile\s+([a-zA-Z_&][a-zA-Z0-9_&]{0,31}))")
-        if re.search(reg_exp, self.contents) != None:
-            self.type = "INPUT"
-            self.data_name = re.search(reg_exp, self.contents).group(1)
-            self.ResName =""
-        """    
-        if re.search(r"(?i)(?:^NOTE:.*%INCLUDE\s+)", self.contents) !=None:
-            self.End_Proc = True
+        self.observations = None
+        self.variables = None
+        if Type in ("INPUT", "OUTPUT"):
+            self.observations, self.variables = note_counts(self.contents)
             
+
+### Define REGEX for each type of note - except MISC:
+
+## NOTE: PROCEDURE SORT used (Total process time):
+## NOTE: DATA statement used (Total process time):
+_stat_re = re.compile(r"^NOTE:\s(PROCEDURE\s[A-Z]*|DATA\sstatement)\sused\s.*:")
+
+## NOTE: Libref LIBRARY was successfully assigned as follows:  
+_libref_re = re.compile(r"^NOTE:\sLibref\s([a-zA-Z0-9_\.]{0,8})\swas\ssuccessfully\sassigned\sas\sfollows:\s*Engine:.*\s*Physical\sName:\s(.*)\s")
+
+## NOTE: The infile FLT is:\n Filename=\\tork188\e$\Prod\SG_CCA\Ndsu_Data\JAMAICA\Jun2018X\FPM320,
+_fileref_re = re.compile(r"^(NOTE:\sThe\sinfile\s([a-zA-Z0-9_\.]{0,8})\sis:)\s*(Filename=.*),")
+
+## NOTE: There were 1 observations read from the data set XREF.ALMDTLIM.WHERE UPCASE(subdir)='JAMAICA';
+## NOTE: No observations were selected from data set WORK.ERR7.
+## NOTE: 48079 records were read from the infile FLT.
+_read_not_empty_sas_re = re.compile(r"^NOTE:\sThere\swere\s[0-9]*\sobservations\sread\sfrom\sthe\sdata\sset\s([a-zA-Z0-9_\.]{0,7}[a-zA-Z0-9_\.]{0,31})\.")
+_read_empty_sas_re = re.compile(r"^NOTE:\sNo\sobservations\swere\sselected\sfrom\sdata\sset\s([a-zA-Z0-9_\.]{0,8}[a-zA-Z0-9_\.]{0,32})\.")
+_read_file_re = re.compile(r"^NOTE:\s[0-9]*\srecords\swere\sread\sfrom\sthe\sinfile\s([a-zA-Z0-9_\.]{0,7})\.")
+
+## NOTE: The data set WORK.TRNS has 217 observations and 1 variables.
+## NOTE: No observations in data set WORK.ERR6.
+_write_not_empty_sas_re = re.compile(r"^NOTE:\sThe\sdata\sset\s([a-zA-Z0-9_\.]{0,8}[a-zA-Z0-9_\.]{0,32})\shas\s[0-9]*\sobservations\sand\s[0-9]*\svariables\.")
+_write_empty_sas_re = re.compile(r"^NOTE:\sNo\sobservations\sin\sdata\sset\s([a-zA-Z0-9_\.]{0,8}[a-zA-Z0-9_\.]{0,32})\.")
+
+# Define fixed list of the Note Types that need to be parsed for input, output and resource
+# STATS: identifies a procedure or data statement statistics
+# LIBREF: Refers to succesfully assigned library.
+# FILEREF: Refers to flat file read. 
+# READ: Refers to a dataset or other file read.
+# WRITE: Refers to a dataset orother file produced. 
+# Each rule: (note type, regex, group of data_in, group of data_out, group of resource)
+# Rules are tried in order and only the groups of the first matching rule are extracted.
+NOTE_FULLVER_RULES = (
+    ("STATS", _stat_re, None, None, 1),
+    ("LIBREF", _libref_re, None, 1, 2),
+    ("FILEREF", _fileref_re, None, 2, 3),
+    ("READ", _read_not_empty_sas_re, 1, None, None),
+    ("READ", _read_empty_sas_re, 1, None, None),
+    ("READ", _read_file_re, 1, None, None),
+    ("WRITE", _write_not_empty_sas_re, None, 1, None),
+    ("WRITE", _write_empty_sas_re, None, 1, None),
+)
+
 class Note_fullver(SASLogComponent):
     """Note Class 
-    This is the full version written by Agnieszka. Currently it is not used by the main program.
+    This is the full version written by Agnieszka. It is used by SASLog when note_mode="full".
     INPUT: starting line number, endding line number, contents
     OUTPUT: Note Type, Input Data, Output data, additional resource name
+            Type, data_name, ResName and End_Proc are also set as in the Note class, so that notes
+            of both versions can be grouped into SAS procedures the same way.
     """
       
+    __slots__ = ("note_type", "data_input", "data_output", "resource", "Type", "data_name", "ResName", "End_Proc",
+                 "observations", "variables")
+
     def __init__(self,start_line, end_line, contents):
         super().__init__(start_line, end_line, contents)
         parsed_data = self.parse_contents()
         self.note_type = parsed_data['note_type']
-        self.data_input = parsed_data['data_input']
-        self.data_output = parsed_data['data_output']
-        self.resource = parsed_data['resource']
-
-    ## Getting file location and it's refname:    
-    def get_fileref_resource(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(3)
-        except:
-            pass
-        return resource
-    
-    def get_fileref_data_out(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(2)
-        except:
-            pass
-        return resource
-    
-    ## Getting library reference and library libref:
-    def get_libref_resource(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(2)
-        except:
-            pass
-        return resource
-    
-    def get_libref_data_out(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    ## Getting data input for non-empty sas datasets:
-    def get_read_data_in_non_empty(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    def get_read_data_in_empty(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    def get_stat_name(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    def get_file_name(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    def get_write_not_empty(self,  regex):
-        resource = ""
-        try:    
-            print (re.search(regex,self.contents).group(1))
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    def get_write_empty(self,  regex):
-        resource = ""
-        try:    
-            resource = re.search(regex,self.contents).group(1)
-        except:
-            pass
-        return resource
-    
-    def parse_contents(self):
-
-        ### Define REGEX for each type of note - except MISC:
-        
-        ## NOTE: PROCEDURE SORT used (Total process time):
-        ## NOTE: DATA statement used (Total process time):
-        stat_re = re.compile("^NOTE:\s(PROCEDURE\s[A-Z]*|DATA\sstatement)\sused\s.*:")
-        
-        
-        ## NOTE: Libref LIBRARY was successfully assigned as follows:  
-        libref_re = re.compile("^NOTE:\sLibref\s([a-zA-Z0-9_\.]{0,8})\swas\ssuccessfully\sassigned\sas\sfollows:\s*Engine:.*\s*Physical\sName:\s(.*)\s")
-        
-        ## NOTE: The infile FLT is:\n Filename=\\tork188\e$\Prod\SG_CCA\Ndsu_Data\JAMAICA\Jun2018X\FPM320,
-        fileref_re = re.compile("^(NOTE:\sThe\sinfile\s([a-zA-Z0-9_\.]{0,8})\sis:)\s*(Filename=.*),")
-        
-        ## NOTE: There were 1 observations read from the data set XREF.ALMDTLIM.WHERE UPCASE(subdir)='JAMAICA';
-        ## NOTE: No observations were selected from data set WORK.ERR7.
-        ## NOTE: 48079 records were read from the infile FLT.
-        read_not_empty_sas_re = re.compile("^NOTE:\sThere\swere\s[0-9]*\sobservations\sread\sfrom\sthe\sdata\sset\s([a-zA-Z0-9_\.]{0,7}[a-zA-Z0-9_\.]{0,31})\.")
-        read_empty_sas_re = re.compile("^NOTE:\sNo\sobservations\swere\sselected\sfrom\sdata\sset\s([a-zA-Z0-9_\.]{0,8}[a-zA-Z0-9_\.]{0,32})\.")
-        read_file_re = re.compile("^NOTE:\s[0-9]*\srecords\swere\sread\sfrom\sthe\sinfile\s([a-zA-Z0-9_\.]{0,7})\.")
+        self.data_input = sys.intern(parsed_data['data_input'])
+        self.data_output = sys.intern(parsed_data['data_output'])
+        self.resource = sys.intern(parsed_data['resource'])
         
-        ## NOTE: The data set WORK.TRNS has 217 observations and 1 variables.
-        ## NOTE: No observations in data set WORK.ERR6.
-        write_not_empty_sas_re = re.compile("^NOTE:\sThe\sdata\sset\s([a-zA-Z0-9_\.]{0,8}[a-zA-Z0-9_\.]{0,32})\shas\s[0-9]*\sobservations\sand\s[0-9]*\svariables\.")
-        write_empty_sas_re = re.compile("^NOTE:\sNo\sobservations\sin\sdata\sset\s([a-zA-Z0-9_\.]{0,8}[a-zA-Z0-9_\.]{0,32})\.")
-        
-            
-        # Define fixed list of the Note Types that need to be parsed for input, output and resource
-        # STATS: identifies a procedure or data statement statistics
-        # LIBREF: Refers to succesfully assigned library.
-        # FILEREF: Refers to flat file read. 
-        # READ: Refers to a dataset or other file read.
-        # WRITE: Refers to a dataset orother file produced. 
-              
-        regex_array = ({
-          "re": stat_re,
-          "type": "STATS",
-          "data_in": '',
-          "data_out": '',
-          "resource": self.get_stat_name(stat_re)
-        }, {
-          "re": libref_re,
-          "type": "LIBREF",
-          "data_in": '',
-          "data_out": self.get_libref_data_out(libref_re),
-          "resource": self.get_libref_resource(libref_re)
-        }, {
-          "re": fileref_re,
-          "type": "FILEREF",
-          "data_in": "",
-          "data_out": self.get_fileref_data_out(fileref_re),
-          "resource": self.get_fileref_resource(fileref_re)
-        }, {
-          "re": read_not_empty_sas_re,
-          "type": "READ",
-          "data_in": self.get_read_data_in_non_empty(read_not_empty_sas_re),
-          "data_out": '',
-          "resource": ''
-        }, {
-          "re": read_empty_sas_re,
-          "type": "READ",
-          "data_in": self.get_read_data_in_empty(read_empty_sas_re),
-          "data_out": '',
-          "resource": ''
-        }, {
-          "re": read_file_re,
-          "type": "READ",
-          "data_in": self.get_file_name(read_file_re),
-          "data_out": '',
-          "resource": ''
-        }, {
-          "re": write_not_empty_sas_re,
-          "type": "WRITE",
-          "data_in": '',
-          "data_out": self.get_write_not_empty(write_not_empty_sas_re),
-          "resource": ''
-        }, {
-          "re": write_empty_sas_re,
-          "type": "WRITE",
-          "data_in": '',
-          "data_out": self.get_write_empty(write_empty_sas_re),
-          "resource": ''
-        })
-        
-        for regex_item in regex_array:
-            regex_method = regex_item["re"]
-            regex_output = re.match(regex_method, self.contents)
+        self.Type = ""
+        self.data_name = ""
+        self.ResName = ""
+        self.End_Proc = False
+        self.observations = None
+        self.variables = None
+        if self.note_type == "STATS":
+            self.Type = "DATASTEP" if self.resource == "DATA statement" else sys.intern("PROC " + self.resource[len("PROCEDURE "):])
+            self.End_Proc = True
+        elif self.note_type == "LIBREF":
+            self.Type = "LIBREFASSIGN"
+            self.data_name = self.data_output
+            self.ResName = self.resource
+            self.End_Proc = True
+        elif self.note_type == "FILEREF":
+            self.Type = "FILEREF"
+            self.data_name = self.data_output
+            self.ResName = self.resource
+        elif self.note_type == "READ":
+            self.Type = "INPUT"
+            self.data_name = self.data_input
+        elif self.note_type == "WRITE":
+            self.Type = "OUTPUT"
+            self.data_name = self.data_output
+        if self.note_type in ("READ", "WRITE"):
+            self.observations, self.variables = note_counts(self.contents)
+
+    def parse_contents(self):
+        contents = self.contents
+        for note_type, regex, data_in_group, data_out_group, resource_group in NOTE_FULLVER_RULES:
+            regex_output = regex.match(contents)
             if regex_output:
-                note_type = regex_item["type"]
-                data_input = regex_item["data_in"]
-                data_output = regex_item["data_out"]
-                resource = regex_item["resource"]
-                break
-            else:
-                note_type ="MISC"
-                data_input = ""
-                data_output = ""
-                resource = ""
+                return {
+                  "note_type": note_type,
+                  "data_input": regex_output.group(data_in_group) if data_in_group else "",
+                  "data_output": regex_output.group(data_out_group) if data_out_group else "",
+                  "resource": regex_output.group(resource_group) if resource_group else ""
+                }
         return {
-          "note_type": note_type,
-          "data_input": data_input,
-          "data_output": data_output,
-          "resource": resource
+          "note_type": "MISC",
+          "data_input": "",
+          "data_output": "",
+          "resource": ""
         }
                    
 class MacroGen(SASLogComponent):
+    __slots__ = ()
+
     def __init__(self,start_line, end_line, contents):
         super().__init__(start_line, end_line, contents)
 
 
 class Warning(SASLogComponent):
+    __slots__ = ()
+
     def __init__(self,start_line, end_line, contents):
         super().__init__(start_line, end_line, contents)
 
 class ScriptLine(SASLogComponent):
+    __slots__ = ()
+
     def __init__(self,start_line, end_line, contents):
         super().__init__(start_line, end_line, contents)
 
 class Misc(SASLogComponent):
+    __slots__ = ()
+
     def __init__(self,start_line, end_line, contents):
         super().__init__(start_line, end_line, contents)
 
+# Statistics printed under "NOTE: DATA statement used" and "NOTE: PROCEDURE x used". STIMER prints the
+# real time and cpu time, FULLSTIMER splits the cpu time into user/system and adds memory and timestamp.
+_STEP_STAT_RE = re.compile(r"(?im)^\s+(real time|user cpu time|system cpu time|cpu time|memory|OS Memory|Timestamp)\s+(\S.*?)\s*$")
+_STEP_MEMORY_RE = re.compile(r"([0-9.]+)\s*([kmg])?", re.I)
+STEP_STATS = {"real time": "real_time", "user cpu time": "user_cpu_time", "system cpu time": "system_cpu_time",
+              "cpu time": "cpu_time", "memory": "memory", "os memory": "os_memory", "timestamp": "timestamp"}
+
+def parse_step_duration(value):
+    # "0.01 seconds", "1:02.03" or "1:02:03.04"
+    seconds = 0.0
+    for part in value.split()[0].split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def parse_step_memory(value):
+    # "1024.53k", in KB
+    m = _STEP_MEMORY_RE.match(value)
+    if m is None:
+        raise ValueError(value)
+    return float(m.group(1)) * {"": 1, "k": 1, "m": 1024, "g": 1024 * 1024}[(m.group(2) or "").lower()]
+
+def parse_step_stats(contents):
+    """Statistics of a SAS procedure/data step.
+    INPUT:  contents of the note ending the step
+    OUTPUT: dict of the statistics found: real_time, cpu_time, user_cpu_time, system_cpu_time
+            (seconds), memory, os_memory (KB), timestamp
+    """
+    stats = {}
+    for m in _STEP_STAT_RE.finditer(contents):
+        name = STEP_STATS[m.group(1).lower()]
+        try:
+            if name == "timestamp":
+                stats[name] = m.group(2)
+            elif name in ("memory", "os_memory"):
+                stats[name] = parse_step_memory(m.group(2))
+            else:
+                stats[name] = parse_step_duration(m.group(2))
+        except ValueError:
+            continue
+    if "cpu_time" not in stats and "user_cpu_time" in stats and "system_cpu_time" in stats:
+        stats["cpu_time"] = stats["user_cpu_time"] + stats["system_cpu_time"]
+    return stats
+
+
 class SASLogProc(SASLogComponent):
+    __slots__ = ("ProcType", "data_in", "data_out", "resources", "stats", "data_in_obs", "data_out_obs", "data_out_vars")
+
     def __init__(self,start_line, end_line, contents, Type ):
         super().__init__(start_line, end_line, contents)
         #self.start_line = start_line
@@ -347,157 +416,587 @@ class SASLogProc(SASLogComponent):
         self.ProcType = Type
         self.data_in = []
         self.data_out = []
+        self.resources = []
+        # Observations read from each input, observations and variables written to each output
+        self.data_in_obs = []
+        self.data_out_obs = []
+        self.data_out_vars = []
         
         for note in contents:
             if note.Type.upper() == "INPUT": 
                 self.data_in.append(note.data_name)
+                self.data_in_obs.append(note.observations)
             elif note.Type.upper() == "OUTPUT":
                 self.data_out.append(note.data_name)
+                self.data_out_obs.append(note.observations)
+                self.data_out_vars.append(note.variables)
+            if note.ResName != "":
+                self.resources.append(note.ResName)
+
+        # Timings and memory of the step, printed in the note ending it
+        self.stats = {}
+        if self.ProcType == "DATASTEP" or self.ProcType.startswith("PROC "):
+            self.stats = parse_step_stats(contents[-1].contents)
             
     
         
+    
+        
+class SASLogSegmenter:
+    """Incremental segmentation of a SAS log into messages.
+    Lines are fed one at a time, as bytes. A message is only complete once the line starting the next
+    message arrives, so at any time only the lines of the message being built are held in memory.
+    Each message is decoded as a whole by decode_log_bytes, as the messages of a mapped log are.
+    INPUT:  log lines (bytes, with their line terminators), encoding (optional, see decode_log_bytes)
+    OUTPUT: SASLogComponent for each finished message
+    """
+    def __init__(self, encoding=None):
+        self.encoding = encoding
+        self.line_number = 0
+        self.current_script_line = 0
+        self.start_line = None
+        self.lines = []
+
+    def is_message_start(self, line):
+        if line.startswith((b"NOTE: ", b"MACROGEN(EXTRACT):", b"WARNING: ")):
+            return True
+        script_line = re.match(rb"\d+\s+", line)
+        if script_line != None and int(script_line.group(0)) >= self.current_script_line + 1:
+            self.current_script_line = int(script_line.group(0))
+            return True
+        return False
+
+    def message(self, end_line):
+        return SASLogComponent(self.start_line, end_line, decode_log_bytes(b"".join(self.lines), self.encoding))
+
+    def feed(self, line):
+        self.line_number += 1
+        log_message = None
+        if self.is_message_start(line):
+            if self.start_line is not None:
+                log_message = self.message(self.line_number - 1)
+            self.start_line = self.line_number
+            self.lines = [line]
+        elif self.start_line is not None:
+            self.lines.append(line)
+        return log_message
+
+    def close(self):
+        # The last message of the log runs to the end of the file
+        log_message = None
+        if self.start_line is not None:
+            log_message = self.message(999999)
+        self.start_line = None
+        self.lines = []
+        return log_message
+
+
+class SASLogProcGrouper:
+    """Incremental grouping of notes into SAS procedures/data steps.
+    A SASLogProc is returned as soon as a note flagged with End_Proc is fed.
+    """
+    def __init__(self):
+        self.notes = []
+
+    def feed(self, note_message):
+        self.notes.append(note_message)
+        if note_message.End_Proc == True:
+            SAS_procedure = SASLogProc(self.notes[0].start_line, self.notes[-1].end_line, self.notes, self.notes[-1].Type)
+            self.notes = []
+            return SAS_procedure
+        return None
+
+
+# Note classes selectable by note_mode
+#   short: Note, essential elements for data table level lineage
+#   full:  Note_fullver, also LIBREF/FILEREF resources
+NOTE_CLASSES = {"short": Note, "full": Note_fullver}
+
+def classify_log_message(log_message, note_mode="short"):
+    contents = log_message.contents
+    if contents.startswith("NOTE: "):
+        cls = NOTE_CLASSES[note_mode]
+    elif contents.startswith("MACROGEN(EXTRACT):"):
+        cls = MacroGen
+    elif contents.startswith("WARNING: "):
+        cls = Warning
+    elif re.match(r"\d+\s+", contents) != None:
+        cls = ScriptLine
+    else:
+        cls = Misc
+    # The component shares the buffer of the message instead of copying its contents
+    return cls(log_message.start_line, log_message.end_line, log_message.buffer)
+
+
+def group_log_procedures(log_components):
+    grouper = SASLogProcGrouper()
+    for log_component in log_components:
+        if isinstance(log_component, (Note, Note_fullver)):
+            SAS_procedure = grouper.feed(log_component)
+            if SAS_procedure is not None:
+                yield SAS_procedure
+
+
+# Start of a message, matched on the raw bytes of a log. Groups: NOTE, MACROGEN, WARNING, script line number
+_MESSAGE_START = re.compile(rb"(?:(NOTE: )|(MACROGEN\(EXTRACT\):)|(WARNING: )|(\d+)\s)")
+# Searching for the line break first is several times faster than a multiline "^"
+_NEXT_MESSAGE_START = re.compile(rb"\n(?=[NMW0-9])" + _MESSAGE_START.pattern)
+
+def iter_message_starts(data):
+    """Offsets of the lines of data that may start a message, with their match."""
+    match = _MESSAGE_START.match(data)
+    if match is not None:
+        yield 0, match
+    for match in _NEXT_MESSAGE_START.finditer(data):
+        yield match.start() + 1, match
+
+
+def segment_log_bytes(log_buffer, note_mode="short", index=True):
+    """Segment and classify the messages of a memory-mapped SAS log.
+    Message starts are searched directly in the bytes of the log, so the lines inside a message are
+    neither decoded nor iterated over in Python. The class of a message is known from its first
+    bytes: only notes are decoded, to be classified. Line breaks are "\n" and "\r\n".
+    With index, the offset of each message is recorded in the buffer, which the messages point to, as
+    a SASLog keeping them all does. Without it, as when the messages are streamed, each message points
+    to its own SASLogMessageBytes.
+    INPUT:  SASLogMappedBuffer of the log, note_mode, index
+    OUTPUT: classified SASLogComponent for each message, pointing into the buffer
+    """
+    data = log_buffer.data
+    message_classes = (NOTE_CLASSES[note_mode], MacroGen, Warning, ScriptLine)
+    current_script_line = 0
+    line_number = 1
+    position = 0
+    message_class = None
+    start_line = None
+    for offset, match in iter_message_starts(data):
+        script_line = match.group(4)
+        if script_line is not None:
+            if int(script_line) < current_script_line + 1:
+                continue
+            current_script_line = int(script_line)
+        line_number += data[position:offset].count(b"\n")
+        if index:
+            # The offset of the next message bounds the bytes of the previous one, so it is recorded first
+            log_buffer.add_message(line_number, offset)
+        if message_class is not None:
+            message_buffer = log_buffer if index else SASLogMessageBytes(log_buffer, position, offset)
+            yield message_class(start_line, line_number - 1, message_buffer)
+        position = offset
+        message_class = message_classes[match.lastindex - 1]
+        start_line = line_number
+    if message_class is not None:
+        # The last message of the log runs to the end of the file
+        message_buffer = log_buffer if index else SASLogMessageBytes(log_buffer, position, len(data))
+        yield message_class(start_line, 999999, message_buffer)
+
+
+def segment_log_stream(log_lines, segmenter, note_mode="short"):
+    """Segment and classify the messages of a log read line by line, for compressed logs, which
+    cannot be mapped. Each message holds its own decoded text, only the lines of the message being
+    built are held.
+    INPUT:  byte lines of the log, SASLogSegmenter (counting the lines fed), note_mode
+    OUTPUT: classified SASLogComponent for each message
+    """
+    for line in log_lines:
+        log_message = segmenter.feed(line)
+        if log_message is not None:
+            yield classify_log_message(log_message, note_mode)
+    log_message = segmenter.close()
+    if log_message is not None:
+        yield classify_log_message(log_message, note_mode)
+
+
+def iter_stream_components(path, note_mode="short", encoding=None):
+    # The file is open as long as the components are iterated
+    with open_input(path) as infile:
+        yield from segment_log_stream(infile, SASLogSegmenter(encoding), note_mode)
+
+
+def count_log_lines(data):
+    # Counted a chunk at a time, so that a mapped log is never copied whole
+    nb_lines = sum(data[start:start + CHUNK_SIZE].count(b"\n") for start in range(0, len(data), CHUNK_SIZE))
+    if len(data) > 0 and data[-1:] != b"\n":
+        nb_lines += 1
+    return nb_lines
+
+
+def iter_log_components(path, note_mode="short", encoding=None, stats=None):
+    """Stream the classified components (Note, Warning, ScriptLine, ...) of a SAS log.
+    A plain log is memory-mapped and segmented at the bytes level (segment_log_bytes); components point
+    into the mapping instead of holding their text. A compressed log is decompressed and segmented line
+    by line (segment_log_stream).
+    With a StageStats, the segmentation is recorded as its segment_classify stage.
+    """
+    if compression(path) is not None:
+        log_components = iter_stream_components(path, note_mode, encoding)
+    else:
+        log_components = segment_log_bytes(SASLogMappedBuffer(path, encoding), note_mode, index=False)
+    if stats is not None:
+        return stats.timed_iter("segment_classify", log_components)
+    return log_components
+
+
+def iter_log_procedures(path, note_mode="short", encoding=None, stats=None):
+    """Stream the SASLogProc procedures of a SAS log, each one yielded as soon as it ends.
+    With a StageStats, the grouping is recorded as its group stage."""
+    SAS_procedures = group_log_procedures(iter_log_components(path, note_mode, encoding, stats))
+    if stats is not None:
+        return stats.timed_iter("group", SAS_procedures)
+    return SAS_procedures
+
+
+class SASLogFollower:
+    """Follow a SAS log while the job writing it is still running.
+    Each poll reads only the bytes appended since the previous poll, in chunks, and feeds the complete lines
+    to a segmenter and a procedure grouper kept between polls, so the cost per appended line is
+    constant. A SASLogProc is emitted as soon as the NOTE ending it is complete, that is when the
+    next message of the log starts (or when the follower is closed).
+    INPUT:  log path, note mode, encoding of the log (optional, see decode_log_bytes)
+    OUTPUT: list of SASLogProc finished since the previous poll
+    """
+    def __init__(self, path, note_mode="short", encoding=None):
+        self.path = path
+        self.note_mode = note_mode
+        self.encoding = encoding
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.partial_line = b""
+        self.segmenter = SASLogSegmenter(self.encoding)
+        self.grouper = SASLogProcGrouper()
+
+    def feed_message(self, log_message, SAS_procedures):
+        log_component = classify_log_message(log_message, self.note_mode)
+        if isinstance(log_component, (Note, Note_fullver)):
+            SAS_procedure = self.grouper.feed(log_component)
+            if SAS_procedure is not None:
+                SAS_procedures.append(SAS_procedure)
+
+    def feed_line(self, line, SAS_procedures):
+        # line keeps its line break, "\r\n" line breaks being made "\n" when the message is decoded
+        log_message = self.segmenter.feed(line)
+        if log_message is not None:
+            self.feed_message(log_message, SAS_procedures)
+
+    def poll(self):
+        SAS_procedures = []
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            # The log was truncated or replaced by a new run
+            self.reset()
+        with open(self.path, "rb") as infile:
+            infile.seek(self.offset)
+            # The bytes appended up to the size seen now are read a chunk at a time, so attaching to a
+            # long log or polling after a pause holds one chunk and its lines, not the whole backlog
+            while self.offset < size:
+                data = infile.read(min(CHUNK_SIZE, size - self.offset))
+                if not data:
+                    break
+                self.offset += len(data)
+                lines = (self.partial_line + data).split(b"\n")
+                self.partial_line = lines.pop()
+                for line in lines:
+                    self.feed_line(line + b"\n", SAS_procedures)
+        return SAS_procedures
+
+    def close(self):
+        SAS_procedures = self.poll()
+        if self.partial_line:
+            # The last line of a log without a final line break is flushed as it is
+            self.feed_line(self.partial_line, SAS_procedures)
+            self.partial_line = b""
+        log_message = self.segmenter.close()
+        if log_message is not None:
+            self.feed_message(log_message, SAS_procedures)
+        return SAS_procedures
+
+
+def follow_log(path, interval=1.0, note_mode="short", encoding=None):
+    """Yield the SASLogProc procedures of a growing SAS log as they finish, polling every interval seconds.
+    Runs until the consumer stops iterating.
+    """
+    follower = SASLogFollower(path, note_mode, encoding)
+    while True:
+        for SAS_procedure in follower.poll():
+            yield SAS_procedure
+        time.sleep(interval)
+
+
+def join_counts(counts):
+    return "|".join("" if count is None else str(count) for count in counts)
+
+
+def log_mapping_row(i, sasproc):
+    if sasproc.ProcType.upper() not in ("LIBREFASSIGN", "LIBREFDEASSIGN") and sasproc.ProcType.upper() !="" :
+        data_in_name = sasproc.data_in
+        data_out_name = sasproc.data_out
+        return [str(i), str(sasproc.start_line) ,  str(sasproc.end_line) , sasproc.ProcType.upper(), "|".join(data_in_name), "|".join(data_out_name),
+                join_counts(sasproc.data_in_obs), join_counts(sasproc.data_out_obs), join_counts(sasproc.data_out_vars)]
+    return None
+
+
+def log_lineage_edges(sasproc):
+    """Lineage edges of a SAS procedure/data step.
+    INPUT:  SASLogProc
+    OUTPUT: (input, output, procedure type, observations) for each input/output pair. The observations
+            are the rows read from the input, or written to the output when the log does not tell
+            how many rows were read; None when neither is known.
+    """
+    edges = []
+    for data_in, observations_in in zip(sasproc.data_in, sasproc.data_in_obs):
+        for data_out, observations_out in zip(sasproc.data_out, sasproc.data_out_obs):
+            observations = observations_in if observations_in is not None else observations_out
+            edges.append((data_in, data_out, sasproc.ProcType.upper(), observations))
+    return edges
+
+
+# Notes of the degraded parse: the data sets read and written, up to the note ending their step.
+# Matched on the bytes of the log, a note possibly spanning several lines.
+SCAN_NOTES = re.compile(
+    rb"(?i)NOTE:\s+(?:There\s+(?:were|was)\s+\d+\s+observations?\s+read\s+from\s+the\s+data\s+set\s+"
+    rb"(?P<read>" + _DATASET_NAME.encode() + rb")|The\s+data\s+set\s+(?P<write>" + _DATASET_NAME.encode() +
+    rb")\s+has\s|(?:DATA\s+statement|PROCEDURE\s+(?P<proc>[a-zA-Z]+))\s+used\s)")
+
+
+def iter_scan_notes(path):
+    """Matches of SCAN_NOTES in a log, with the line they start on. The log is scanned a chunk at a
+    time, the end of a chunk from its last "NOTE:" on being carried over to the next one, so that a
+    note split between two chunks is matched whole.
+    """
+    line, tail = 1, b""
+    with open_input(path) as infile:
+        for chunk in itertools.chain(iter(lambda: infile.read(CHUNK_SIZE), b""), [None]):
+            data = tail + chunk if chunk is not None else tail
+            if chunk is None:
+                cut = len(data)
+            else:
+                cut = data.rfind(b"NOTE:")
+                # No note is that long: past a chunk, what follows the last "NOTE:" is scanned as it is
+                if cut < 0 or len(data) - cut > CHUNK_SIZE:
+                    cut = max(len(data) - len(b"NOTE:"), 0)
+            position = 0
+            for match in SCAN_NOTES.finditer(data, 0, cut):
+                line += data.count(b"\n", position, match.start())
+                position = match.start()
+                yield line, match
+            line += data.count(b"\n", position, cut)
+            tail = data[cut:]
+
+
+def scan_log(path):
+    """Degraded parse of a log, for logs the full parse takes too long on: only the notes of
+    SCAN_NOTES are scanned, without classifying the messages of the log. The log is read as it is
+    scanned, a chunk at a time, compressed or not.
+    INPUT:  path of the .log file
+    OUTPUT: [procedure type, start line, end line, data_in, data_out] of each step reading or writing
+            a data set
+    """
+    steps = []
+    data_in, data_out = [], []
+    start_line = None
+    for line, match in iter_scan_notes(path):
+        if start_line is None:
+            start_line = line
+        if match.group("read") is not None:
+            data_in.append(match.group("read").decode("ascii"))
+        elif match.group("write") is not None:
+            data_out.append(match.group("write").decode("ascii"))
+        else:
+            if data_in or data_out:
+                proc = match.group("proc")
+                proc_type = "DATASTEP" if proc is None else "PROC " + proc.decode("ascii")
+                steps.append([proc_type.upper(), start_line, line + 1, data_in, data_out])
+            data_in, data_out = [], []
+            start_line = None
+    return steps
+
+
+def log_output_name(prefix, path, extension):
+    # job.log and job.sas write their outputs side by side: those of the log are named apart
+    return "{}_log_{}.{}".format(prefix, file_stem(path), extension)
+
+
+def write_log_mapping(path, mapping_rows, sink=None):
+    output_map = MappingTable(MAPPING_COLUMNS)
+    output_map.extend(mapping_rows)
+    output_map.write_to(output_sink(sink), log_output_name("mapping", path, "csv"))
+
+
+def log_stats_row(i, sasproc):
+    """Statistics row of a SAS procedure/data step, without its rank. None when the log has no
+    timing for it."""
+    stats = sasproc.stats
+    if "real_time" not in stats:
+        return None
+    return [str(i), str(sasproc.start_line), str(sasproc.end_line), sasproc.ProcType.upper(),
+            "|".join(sasproc.data_in), "|".join(sasproc.data_out),
+            stats.get("real_time"), stats.get("cpu_time"), stats.get("user_cpu_time"), stats.get("system_cpu_time"),
+            stats.get("memory"), stats.get("os_memory"), stats.get("timestamp", "")]
+
+
+# Rows of log_stats_row do not hold the rank yet
+STATS_REAL_TIME = STEP_STATS_COLUMNS.index("Real Time") - 1
+
+def rank_step_stats(stats_rows, key=lambda row: row[STATS_REAL_TIME]):
+    """Order statistics rows from the most to the least expensive step, by real time."""
+    return sorted(stats_rows, key=key, reverse=True)
+
+
+def write_log_stats(path, stats_rows, sink=None):
+    output_stats = MappingTable(STEP_STATS_COLUMNS)
+    output_stats.extend([rank] + list(row) for rank, row in enumerate(rank_step_stats(stats_rows), 1))
+    output_stats.write_to(output_sink(sink), "stats_{}.csv".format(file_stem(path)))
+
+        
 class SASLog:
-    def __init__(self, path):
+    """Materialized view of a SAS log.
+    Keeps every message and procedure of the log in memory. Use iter_log_components and
+    iter_log_procedures to process large logs in constant memory.
+    note_mode selects the note classification: "short" (Note) or "full" (Note_fullver).
+    encoding is the encoding of the log, UTF-8 with a cp1252 fallback by default.
+    write_outputs writes the mapping and statistics csv files of the log to output/, or to sink, an
+    OutputSink (optional).
+    stats is a StageStats recording the time of each stage (optional).
+    """
+    def __init__(self, path, note_mode="short", encoding=None, write_outputs=True, stats=None, sink=None):
         self.path = path
-        with open(self.path, "r") as infile:
-            self.log_lines = infile.readlines()
-            self.log_length = len(self.log_lines)
-            # Optional preprocess to merge message having multiple lines into one line
-        self.log_messages = []
-        self.component_index = []
-        line_step = 0
-        current_script_line = 0
-        for line in self.log_lines:
-            if re.match("NOTE: ",line) != None \
-                or re.match("MACROGEN\(EXTRACT\):",line) != None\
-                or re.match("WARNING: ", line) != None:
-                self.component_index.append(line_step+ 1)
-            elif re.match("\d+\s+", line) != None and int(re.match("\d+\s+", line).group(0)) >= current_script_line + 1:
-                self.component_index.append(line_step+1)
-                current_script_line = int(re.match("\d+\s+", line).group(0))
-
-            line_step += 1
-
-        for i in range(len(self.component_index)):
-            if i != len(self.component_index) - 1:
-                log_message = SASLogComponent(self.component_index[i]\
-                                              ,self.component_index[i + 1] - 1\
-                                              ,"".join(self.log_lines[self.component_index[i] - 1:self.component_index[i + 1] - 1]))
-                self.log_messages.append(log_message)
-            elif i == len(self.component_index) -1:
-                log_message = SASLogComponent(self.component_index[i] \
-                                              , 999999
-                                              , "".join(
-                        self.log_lines[self.component_index[i] - 1:]))
-                self.log_messages.append(log_message)
+        self.sink = sink
+        self.note_mode = note_mode
+        self.encoding = encoding
+        self.stats = stats if stats is not None else StageStats(enabled=False)
+        if compression(self.path) is None:
+            # The log is memory-mapped and segmented at the bytes level: messages point into log_buffer
+            # and only notes are decoded. log_lines decodes the whole log when first asked for.
+            self.log_buffer = SASLogMappedBuffer(self.path, encoding)
+            with self.stats.stage("count_lines") as stage:
+                self.log_length = count_log_lines(self.log_buffer.data)
+                stage.items = self.log_length
+            # Messages are classified as they are segmented, both are one stage
+            self.log_messages = list(self.stats.timed_iter("segment_classify",
+                                                           segment_log_bytes(self.log_buffer, self.note_mode)))
+        else:
+            # A compressed log is decompressed as it is segmented, each message holding its text
+            self.log_buffer = None
+            segmenter = SASLogSegmenter(encoding)
+            with open_input(self.path) as infile:
+                self.log_messages = list(self.stats.timed_iter("segment_classify",
+                                                               segment_log_stream(infile, segmenter, self.note_mode)))
+            self.log_length = segmenter.line_number
+        self.component_index = [log_message.start_line for log_message in self.log_messages]
+        
         self.note_messages = []
         self.macro_gens = []
         self.warning_messages = []
         self.script_lines = []
         self.misc_messages = []
-        for log_message in self.log_messages:
-            if re.match("NOTE: ",log_message.contents) != None:
-                note_message = Note(log_message.start_line, log_message.end_line, log_message.contents)
-                self.note_messages.append(note_message)
-            elif re.match("MACROGEN(EXTRACT):",log_message.contents) != None:
-                macro_gen = MacroGen(log_message.start_line, log_message.end_line, log_message.contents)
-                self.macro_gens.append(macro_gen)
-            elif re.match("WARNING: ", log_message.contents) != None:
-                warning_message = Warning(log_message.start_line, log_message.end_line, log_message.contents)
-                self.warning_messages.append(warning_message)
-            elif re.match("\d+\s+", log_message.contents) != None:
-                script_line = ScriptLine(log_message.start_line, log_message.end_line, log_message.contents)
-                self.script_lines.append(script_line)
+        for log_component in self.log_messages:
+            if isinstance(log_component, (Note, Note_fullver)):
+                self.note_messages.append(log_component)
+            elif isinstance(log_component, MacroGen):
+                self.macro_gens.append(log_component)
+            elif isinstance(log_component, Warning):
+                self.warning_messages.append(log_component)
+            elif isinstance(log_component, ScriptLine):
+                self.script_lines.append(log_component)
             else:
-                misc_message = Misc(log_message.start_line, log_message.end_line, log_message.contents)
-                self.misc_messages.append(misc_message)
+                self.misc_messages.append(log_component)
 
-        
-        this_procedure_notes = []
-        self.SAS_procedures = []
-        for note_message in self.note_messages:
-            this_procedure_notes.append(note_message)
-            if note_message.End_Proc == True:
-                procedure_start_line = this_procedure_notes[0].start_line
-                procedure_end_line = this_procedure_notes[-1].end_line
-                SAS_procedure = SASLogProc(procedure_start_line,procedure_end_line, this_procedure_notes, this_procedure_notes[-1].Type)
-                self.SAS_procedures.append(SAS_procedure)
-
-                this_procedure_notes = []
-    
-            
-    #def ExportToCSV(self, OutputPath, filename):
-        pd_output_map = pandas.DataFrame(columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs"])
-        
-        #
-        for i, sasproc in enumerate(self.SAS_procedures):
-
-            if sasproc.ProcType.upper() not in ("LIBREFASSIGN", "LIBREFDEASSIGN") and sasproc.ProcType.upper() !="" :
-                data_in_name = list()
-                data_out_name = list()
-                
-                data_in_name = sasproc.data_in
-                data_out_name = sasproc.data_out
-                
-                df = pandas.DataFrame(data=[[str(i), str(sasproc.start_line) ,  str(sasproc.end_line) , sasproc.ProcType.upper(), "|".join(data_in_name), "|".join(data_out_name) ]], \
-                                          columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs"])
-                pd_output_map = pd_output_map.append(df)
-                
-        filename = os.path.splitext(os.path.basename(self.path))[0].replace(" ", "_")
-        filename_mapping_csv = "mapping_{}.csv".format(filename)
-        pd_output_map.reset_index(drop = True, inplace = True)
-        #pd_output_map.to_csv(os.path.join(OutputPath, filename_mapping_csv), index=False)
-        pd_output_map.to_csv(os.path.join(os.getcwd(), "output", filename_mapping_csv), index=False)
-
-input_path = r"C:\work\IDR\ScotiaGlobe\saslogs"
-#sas_logs = get_list_log( os.path.join(os.getcwd(), "source"))
-sas_logs = get_list_log(input_path)
-for file in sas_logs:
-    
-    SAS_log = SASLog(file)
-    
-    #creating graph
-    G = nx.MultiDiGraph()
-    
-    for comp in SAS_log.SAS_procedures:
-        try:
-            for data_in in comp.data_in:
-                #data_name_in = ".".join(data_in)
-                data_name_in = data_in
-                for data_out in comp.data_out:
-                    #data_name_out = ".".join(data_out)
-                    data_name_out = data_out
-                    G.add_edge(data_name_in, data_name_out, label = comp.ProcType.upper())
-            # print(comp.data_out)
-        except Exception:
-            pass
-    
-    # print("EDGES")
-    # for edge in sorted(G.edges()):
-    #     print(edge)
-    #
-    # print("NODES")
-    # for node in sorted(G.nodes()):
-    #     print(node)
-    
-    #convert to directed graph
-    DG = G.to_directed()
-    DG.graph['graph'] = {'rankdir': 'LR', 'splines': 'line'}
-    fname = os.path.splitext(os.path.basename(file))[0].replace(" ", "_")
-    nx.drawing.nx_pydot.write_dot(DG, os.path.join("output", 'flow_{}.dot'.format(fname)))
-    
-    if True:
-        print("SAS log processed: "
-              "\t {} \n". format(file))
-
-    if False:    
-        for note_message in SAS_log.note_messages:
-            print ("---------------------\n" + note_message.contents)
-        #for macro_gen in SAS_log.macro_gens:
-            #print("---------------------\n" + macro_gen.contents)
-        #for warning_message in SAS_log.warning_messages:
-            #print ("---------------------\n" + warning_message.contents)
-        #for script_line in SAS_log.script_lines:
-            #print ("---------------------\n" + script_line.contents)
-        #for misc_message in SAS_log.misc_messages:
-            #print ("---------------------\n" + misc_message.contents)
+        for kind, messages in (("Note", self.note_messages), ("MacroGen", self.macro_gens),
+                               ("Warning", self.warning_messages), ("ScriptLine", self.script_lines),
+                               ("Misc", self.misc_messages)):
+            self.stats.count("messages:" + kind, len(messages))
+
+        self.SAS_procedures = list(self.stats.timed_iter("group", group_log_procedures(self.note_messages)))
+        if write_outputs:
+            self.write_outputs()
+
+    @instrumented("write_outputs")
+    def write_outputs(self):
+        mapping_rows = [log_mapping_row(i, sasproc) for i, sasproc in enumerate(self.SAS_procedures)]
+        write_log_mapping(self.path, [row for row in mapping_rows if row is not None], self.sink)
+        stats_rows = [log_stats_row(i, sasproc) for i, sasproc in enumerate(self.SAS_procedures)]
+        write_log_stats(self.path, [row for row in stats_rows if row is not None], self.sink)
+
+    @functools.cached_property
+    def log_lines(self):
+        if self.log_buffer is None:
+            with open_input(self.path) as infile:
+                return [decode_log_bytes(line, self.encoding) for line in infile]
+        return list(io.StringIO(self.log_buffer.text()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map the data flow of SAS logs.")
+    parser.add_argument("paths", nargs="+", help=".log files or folders of .log files")
+    parser.add_argument("--note-mode", choices=sorted(NOTE_CLASSES), default="short",
+                        help="note classification, short (lineage) or full (also LIBREF/FILEREF resources)")
+    parser.add_argument("--encoding", default=None, help="encoding of the logs (default: UTF-8, cp1252 fallback)")
+    parser.add_argument("--lineage", default=os.path.join("output", "lineage.json"),
+                        help="JSON file of the corpus wide lineage graph, updated in place")
+    parser.add_argument("--metrics", default=None, help="Prometheus text file to write the time of each parsing stage to")
+    parser.add_argument("--metrics-per-file", action="store_true", help="also write the stage times of each log")
+    parser.add_argument("--output", default=None,
+                        help="folder, .zip/.tar/.tar.gz archive or .jsonl file the outputs are written to "
+                             "(default: output)")
+    args = parser.parse_args(argv)
+
+    sas_logs = []
+    for path in args.paths:
+        sas_logs.extend(get_list_log(path) if os.path.isdir(path) else [path])
+
+    # Lineage across all the logs, only the edges of the logs processed are replaced
+    lineage = LineageGraph.load(args.lineage)
+    corpus_stats_rows = []
+    corpus_edges = []
+    file_stats = []
+    with open_sink(args.output) as sink:
+        for file in sas_logs:
+            mapping_rows = []
+            stats_rows = []
+            edges = []
+            stats = StageStats(enabled=args.metrics is not None)
+            file_stats.append((file, "log", stats))
+
+            # Procedures are streamed so that multi-GB logs are never loaded in memory
+            for i, comp in enumerate(iter_log_procedures(file, args.note_mode, args.encoding, stats)):
+                for data_name_in, data_name_out, label, observations in log_lineage_edges(comp):
+                    edges.append((data_name_in, data_name_out, label, observations))
+                    corpus_edges.append((file, data_name_in, data_name_out, label, observations))
+                row = log_mapping_row(i, comp)
+                if row is not None:
+                    mapping_rows.append(row)
+                row = log_stats_row(i, comp)
+                if row is not None:
+                    stats_rows.append(row)
+                    corpus_stats_rows.append([file] + row)
+            with stats.stage("write_outputs"):
+                write_log_mapping(file, mapping_rows, sink)
+                write_log_stats(file, stats_rows, sink)
+            lineage.replace_file(os.path.abspath(file), "log", edges)
+            with stats.stage("write_flow_dot"):
+                write_flow_dot(edges, sink, log_output_name("flow", file, "dot"))
+
+            print("SAS log processed: "
+                  "\t {} \n". format(file))
+
+        lineage.save(args.lineage)
+        lineage.write_dot(sink)
+
+        # Most expensive steps across all the logs
+        output_stats = MappingTable(["Rank", "File"] + STEP_STATS_COLUMNS[1:])
+        ranked = rank_step_stats(corpus_stats_rows, key=lambda row: row[1 + STATS_REAL_TIME])
+        output_stats.extend([rank] + row for rank, row in enumerate(ranked, 1))
+        output_stats.write_to(sink, "stats_corpus.csv")
+
+        # Row volume of each flow across all the logs, the heaviest first
+        output_volumes = MappingTable(VOLUME_COLUMNS)
+        output_volumes.extend(aggregate_edge_volumes(corpus_edges))
+        output_volumes.write_to(sink, "volumes_corpus.csv")
+    if args.metrics is not None:
+        write_file_stats(args.metrics, file_stats, args.metrics_per_file)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
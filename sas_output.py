@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Output layer for the mappings extracted from SAS logs and programs
+
+.. pseudocode::
+
+    - Collect the rows of a mapping in one buffer per column
+    - Flush the whole table once per file through csv.writer
+    - Build a pandas DataFrame only when one is asked for
+    - Hand the text of each output file to a sink, which buffers it and writes it out in batches:
+      to the output folder, to one zip or tar archive, to one JSON Lines file, or to memory
+"""
+import os
+import io
+import csv
+import json
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from sas_input import strip_compressed_extension
+
+# Observation counts are "|" separated, in the order of the Inputs/Outputs they belong to
+MAPPING_COLUMNS = ["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs",
+                   "Input Observations", "Output Observations", "Output Variables"]
+MACRO_COLUMNS = ["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs","Values"]
+# Times in seconds, memory in KB
+STEP_STATS_COLUMNS = ["Rank", "Sequence", "Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs",
+                      "Real Time", "CPU Time", "User CPU Time", "System CPU Time", "Memory", "OS Memory", "Timestamp"]
+
+# Observations moved along a lineage edge, across the logs in which it appears
+VOLUME_COLUMNS = ["Input", "Output", "Procedure Type", "Logs", "Min Observations", "Median Observations",
+                  "Max Observations"]
+
+
+def file_stem(path):
+    # job.log.gz is named after job, as job.log is
+    filename = strip_compressed_extension(os.path.basename(path))
+    return os.path.splitext(filename)[0].replace(" ", "_")
+
+
+def write_csv_rows(outfile, columns, rows, lineterminator=os.linesep):
+    # Same layout as DataFrame.to_csv(index=False): header line, minimal quoting, os.linesep
+    writer = csv.writer(outfile, lineterminator=lineterminator)
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
+def write_csv(path, columns, rows):
+    with open(path, "w", newline="") as outfile:
+        write_csv_rows(outfile, columns, rows)
+
+
+def csv_text(columns, rows):
+    # Lines end with \n, as in the other texts handed to sinks: DirectorySink writes them as os.linesep
+    outfile = io.StringIO(newline="")
+    write_csv_rows(outfile, columns, rows, lineterminator="\n")
+    return outfile.getvalue()
+
+
+# Bytes of output held by a sink before they are written out
+DEFAULT_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+class OutputSink(ABC):
+    """Destination of the output files of the parsers, write_files being defined by each kind of sink.
+    The files are buffered and written out in batches, once buffer_bytes of them are held, when the
+    sink is flushed and when it is closed. A file written again while buffered replaces the buffered
+    one, as it would replace it in a folder. A sink is a context manager closing it.
+    INPUT:  text of each output file, named as in the output folder
+    OUTPUT: the files written out by write_files, in the order they were written
+    """
+    def __init__(self, buffer_bytes=DEFAULT_BUFFER_BYTES):
+        self.buffer_bytes = buffer_bytes
+        self.pending = {}
+        self.pending_bytes = 0
+
+    def write(self, name, text):
+        self.pending_bytes += len(text) - len(self.pending.get(name, ""))
+        self.pending[name] = text
+        if self.pending_bytes >= self.buffer_bytes:
+            self.flush()
+
+    def write_csv(self, name, columns, rows):
+        self.write(name, csv_text(columns, rows))
+
+    def flush(self):
+        if self.pending:
+            self.write_files(list(self.pending.items()))
+        self.pending = {}
+        self.pending_bytes = 0
+
+    @abstractmethod
+    def write_files(self, files):
+        """Write out the (name, text) of files."""
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DirectorySink(OutputSink):
+    """Output files written to a folder, created on the first write. The default sink of the parsers
+    writes each file through to the output folder of the working directory."""
+    def __init__(self, path, buffer_bytes=DEFAULT_BUFFER_BYTES):
+        super().__init__(buffer_bytes)
+        self.path = path
+
+    def write_files(self, files):
+        os.makedirs(self.path, exist_ok=True)
+        for name, text in files:
+            with open(os.path.join(self.path, name), "w") as outfile:
+                outfile.write(text)
+
+
+class ArchiveSink(OutputSink):
+    """Output files written as the members of one zip (.zip) or tar (.tar, .tar.gz, .tgz) archive.
+    The archive is complete once the sink is closed. A file written again after a flush is a second
+    member of the archive, the last one being the one extracted."""
+    def __init__(self, path, buffer_bytes=DEFAULT_BUFFER_BYTES):
+        super().__init__(buffer_bytes)
+        self.path = path
+        if path.endswith(".zip"):
+            self.archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        else:
+            self.archive = tarfile.open(path, "w:gz" if path.endswith((".gz", ".tgz")) else "w")
+
+    def write_files(self, files):
+        for name, text in files:
+            data = text.encode("utf-8")
+            if isinstance(self.archive, zipfile.ZipFile):
+                self.archive.writestr(name, data)
+            else:
+                member = tarfile.TarInfo(name)
+                member.size = len(data)
+                member.mtime = time.time()
+                self.archive.addfile(member, io.BytesIO(data))
+
+    def close(self):
+        super().close()
+        self.archive.close()
+
+
+class JSONLinesSink(OutputSink):
+    """Output files written to one JSON Lines file, a {"name": ..., "text": ...} object per file."""
+    def __init__(self, path, buffer_bytes=DEFAULT_BUFFER_BYTES):
+        super().__init__(buffer_bytes)
+        self.path = path
+        self.outfile = open(path, "w", encoding="utf-8")
+
+    def write_files(self, files):
+        self.outfile.write("".join(json.dumps({"name": name, "text": text}) + "\n" for name, text in files))
+
+    def close(self):
+        super().close()
+        self.outfile.close()
+
+
+class MemorySink(OutputSink):
+    """Output files kept in memory, by name, for embedding the parsers. Nothing is buffered."""
+    def __init__(self):
+        super().__init__(buffer_bytes=0)
+        self.files = {}
+
+    def write_files(self, files):
+        self.files.update(files)
+
+
+def open_sink(path=None, buffer_bytes=DEFAULT_BUFFER_BYTES):
+    """Sink of the output files, by the extension of path: a .zip, .tar, .tar.gz or .tgz archive,
+    a .jsonl file, else a folder. The output folder of the working directory when path is None."""
+    if path is None:
+        path = os.path.join(os.getcwd(), "output")
+    if path.endswith((".zip", ".tar", ".tar.gz", ".tgz")):
+        return ArchiveSink(path, buffer_bytes)
+    if path.endswith(".jsonl"):
+        return JSONLinesSink(path, buffer_bytes)
+    return DirectorySink(path, buffer_bytes)
+
+
+def output_sink(sink=None):
+    # Without a sink, each file is written through to the output folder, as soon as it is written
+    return sink if sink is not None else open_sink(buffer_bytes=0)
+
+
+class MappingTable:
+    """Columnar table of mapping rows.
+    Appending a row is O(1), so a table of n rows is built in linear time.
+    INPUT:  column names
+    OUTPUT: csv file, rows, pandas DataFrame
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.data = [[] for _ in self.columns]
+
+    def __len__(self):
+        return len(self.data[0])
+
+    def append(self, row):
+        assert len(row) == len(self.columns), \
+            "Expected {} values, got {}".format(len(self.columns), len(row))
+        for values, value in zip(self.data, row):
+            values.append(value)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def rows(self):
+        return zip(*self.data)
+
+    def write_csv(self, path):
+        write_csv(path, self.columns, self.rows())
+
+    def write_to(self, sink, name):
+        sink.write_csv(name, self.columns, self.rows())
+
+    def to_dataframe(self):
+        import pandas
+        return pandas.DataFrame(dict(zip(self.columns, self.data)), columns=self.columns)
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Library API of the SAS log and program parsers
+
+.. pseudocode::
+
+    - parse_log and parse_program parse one file in memory, nothing is written to output/
+    - parse_logs and parse_programs parse the files of folders one at a time
+    - parse_batch parses folders of logs and programs over a process pool, a file running over the
+      time budget of its parse being only partially parsed
+    - main is the command line entry point, dispatching to the log, program and batch commands
+    - With instrument=True, the time of each parsing stage is recorded in the stats of the result
+
+Importing the parsers does not load pandas, networkx or matplotlib, which are only imported by the
+exporters using them (MappingTable.to_dataframe, the lineage graph and the drawings).
+"""
+import os
+import argparse
+
+from sas_log_parser import SASLog, get_list_log
+from sas_program_mapper import SASProgram, get_list
+from sas_stats import StageStats
+
+
+def list_files(paths, list_folder):
+    files = []
+    for path in paths:
+        files.extend(sorted(list_folder(path)) if os.path.isdir(path) else [path])
+    return files
+
+
+def parse_log(path, note_mode="short", encoding=None, instrument=False):
+    """Parse a SAS log.
+    INPUT:  path of the .log file, note_mode ("short" or "full"), encoding of the log, instrument: time
+            the stages of the parse
+    OUTPUT: SASLog, its stats holding the time of each stage
+    """
+    return SASLog(path, note_mode, encoding, write_outputs=False, stats=StageStats(enabled=instrument))
+
+
+def parse_program(path, instrument=False):
+    """Parse a SAS program.
+    INPUT:  path of the .sas file, instrument: time the stages of the parse
+    OUTPUT: SASProgram, its components being found as they are read,
+            its stats holding the time of each stage
+    """
+    return SASProgram(path, write_outputs=False, stats=StageStats(enabled=instrument))
+
+
+def parse_logs(paths, note_mode="short", encoding=None, instrument=False):
+    """Parse .log files and the .log files of folders, yielding one SASLog at a time."""
+    for path in list_files(paths, get_list_log):
+        yield parse_log(path, note_mode, encoding, instrument)
+
+
+def parse_programs(paths, instrument=False):
+    """Parse .sas files and the .sas files of folders, yielding one SASProgram at a time."""
+    for path in list_files(paths, get_list):
+        yield parse_program(path, instrument)
+
+
+def parse_batch(log_paths=(), program_paths=(), workers=None, cache_dir=None, instrument=False, budget=None,
+                budget_cpu=False, sink=None):
+    """Parse logs and programs over a pool of worker processes, see sas_batch.run_batch.
+    INPUT:  files or folders of logs and programs, number of workers, parse cache directory,
+            instrument: time the stages of each parse,
+            budget: seconds after which the parse of a file is stopped and replaced by a degraded parse,
+            budget_cpu: count the CPU time of the parse in the budget instead of the wall clock time,
+            sink: OutputSink the output files of each file are written to (default: output/)
+    OUTPUT: BatchReport, the partially parsed files being in BatchReport.partials
+    """
+    from sas_batch import run_batch
+    return run_batch(list_files(log_paths, get_list_log), list_files(program_paths, get_list),
+                     workers, cache_dir, instrument=instrument, budget=budget, budget_cpu=budget_cpu, sink=sink)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map the data flow of SAS logs and programs.")
+    parser.add_argument("command", choices=["log", "program", "batch"],
+                        help="log: map SAS logs, program: map SAS programs, batch: parse folders over a process pool")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="arguments of the command, see <command> --help")
+    args = parser.parse_args(argv)
+    if args.command == "log":
+        from sas_log_parser import main as command
+    elif args.command == "program":
+        from sas_program_mapper import main as command
+    else:
+        from sas_batch import main as command
+    return command(args.arguments)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -19,233 +19,485 @@ SAS Program Parser to Display the Data Workflow Implied
 
 .. DONE:: adjust consistency among extracted components
 .. DONE:: identify Macro variable input and output. 
-.. todo:: identify PROCs/DATA STEPs run thru multiple lines
+.. DONE:: identify PROCs/DATA STEPs run thru multiple lines
 .. todo:: identify data flows when macro calls involved.
 
 .. Bugs::
 .. Data step output pickup extra data step statements
 """
 import os
-import shutil
-import glob
+import sys
 import re
+import argparse
 import operator
-import warnings
-import networkx as nx
-import matplotlib.pyplot as plt
-import pandas
-from tkinter.tix import COLUMN
-from networkx import graph
+import functools
+import itertools
+import collections
+# networkx and matplotlib are only imported by the drawing functions, so that importing the parser
+# stays fast and works on hosts without a display
+from sas_output import MappingTable, MAPPING_COLUMNS, MACRO_COLUMNS, file_stem, open_sink, output_sink
+from sas_lineage import LineageGraph, flow_graph, write_flow_dot
+from sas_stats import StageStats, instrumented, write_file_stats
+from sas_input import list_input_files, open_input_text
+from sas_lexer import lex_program, group_blocks, first_statement, strip_parentheses, LineCounter
+from sas_sql import sql_statement_tables, split_data_name
 
 def get_list(sp_path):
-    script_list = list()
-    for root, dirs, files in os.walk(sp_path):
-        for file in files:
-            if file.lower().endswith(".sas"):
-                 script_list.append(os.path.join(root, file))
-    return script_list
+    # .sas.gz and .sas.zst archives are listed with the plain programs
+    return list_input_files(sp_path, ".sas")
+
+def intern_data_name(data_name, data_names):
+    # A data set named by many components is stored once: its (library, table) tuple is looked up in
+    # data_names, the table of the data names already seen in the program
+    if isinstance(data_name, tuple):
+        data_name = tuple(sys.intern(x) if isinstance(x, str) else x for x in data_name)
+        return data_names.setdefault(data_name, data_name)
+    return data_name
+
+
+# Handlers of the PROC steps reading and writing data sets, by procedure name. A PROC step is handed to
+# the handler of its name as the lexer groups it, so that adding a procedure adds no pass over the program.
+PROC_HANDLERS = {}
+
+
+def proc_handler(*names):
+    """Register a component class as the handler of the procedures names. Its step_pattern is matched
+    at the start of the PROC steps of these procedures, which are not components when it does not match."""
+    def register(cls):
+        for name in names:
+            PROC_HANDLERS[name] = cls
+        return cls
+    return register
+
+
+# One or two level data set name, without the dots the older patterns let into names
+DATA_SET_NAME = r"(?:([a-zA-Z_&][a-zA-Z0-9_&]{0,31})\.)?([a-zA-Z_&][a-zA-Z0-9_&]{0,31})"
+
+
+def data_set_option(option):
+    """Precompiled pattern of the data set named by the option (option=name) of a statement."""
+    return re.compile(r"(?i)\b(?:" + option + r")\s*=\s*" + DATA_SET_NAME)
+
+
+def file_option(option):
+    """Precompiled pattern of the external file named by the option, quoted path or fileref."""
+    return re.compile(r"(?i)\b(?:" + option + r")\s*=\s*('[^']*'|\"[^\"]*\"|[^\s;]+)")
+
+
+def data_set(match, library="work"):
+    # One level names are in library
+    return (match.group(1) or library, match.group(2))
+
 
 class SASScriptComponent:
+    """Component of a SAS program.
+    content is kept as offsets (begin, stop) into a buffer, sliced when it is read. The buffer is the
+    component's own text until compact() points it to the source of the whole program.
+    INPUT:  starting line, ending line, content
+    OUTPUT: content
+    """
+    __slots__ = ("start", "end", "buffer", "begin", "stop")
+    regex_sas_data_name = r"(?:([a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})\.)?" \
+                          r"([a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})"
+
     def __init__(self, start, end, content):
         self.start = start
         self.end = end
-        self.content = content.strip()
-        self.regex_sas_data_name = r"(?:([a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})\.)?" \
-                                   r"([a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})"
+        self.buffer = content.strip()
+        self.begin = 0
+        self.stop = len(self.buffer)
+
+    @property
+    def content(self):
+        if self.begin == 0 and self.stop == len(self.buffer):
+            return self.buffer
+        return self.buffer[self.begin:self.stop]
+
+    def compact(self, source, begin, stop, data_names):
+        """Drop the private copy of the content when it is found in source[begin:stop], and intern
+        the data names in data_names."""
+        content = self.content
+        position = source.find(content, begin, stop)
+        if position >= 0:
+            self.buffer = source
+            self.begin = position
+            self.stop = position + len(content)
+        for attribute in ("data_in", "data_out"):
+            component_data_names = getattr(self, attribute, None)
+            if component_data_names is not None:
+                setattr(self, attribute, [intern_data_name(data_name, data_names)
+                                          for data_name in component_data_names])
+
+    @staticmethod
+    def statements(content):
+        """(lowercase keyword, begin, stop) of the statements of the content."""
+        for token in lex_program(content):
+            if token.kind == "statement":
+                yield token.keyword, token.begin, token.stop
+
+
+def summary_text(report, path):
+    """Text of the summary_*.txt of the program at path, from its extraction_report."""
+    return report + ("See the following file for more details on the ignored content: \n"
+                     " residuals_{}.txt".format(file_stem(path)))
 
 
 class Comment(SASScriptComponent):
+    __slots__ = ()
+
     def __init__(self, start, end, content):
         super(Comment, self).__init__(start, end, content)
 
 
 class CommentBlock(Comment):
+    __slots__ = ()
+
     def __init__(self, start, end, content):
         super(CommentBlock, self).__init__(start, end, content.group(1))
 
 
 class CommentInline(Comment):
+    __slots__ = ()
+
     def __init__(self, start, end, content):
         super(CommentInline, self).__init__(start, end, content.group(0))
         
         
 class DataStep(SASScriptComponent):
-    def __init__(self, start, end, content):
+    """DATA step, its data sets being read from its statements in one pass.
+    Outputs: the data sets of the DATA statement and of the OUTPUT statements, the master data set of
+    MODIFY, the data sets hash objects write (h.output(dataset: "...")).
+    Inputs: the data sets of each SET, MERGE, UPDATE and MODIFY statement, those following IF ... THEN
+    and ELSE included, and the data sets hash objects are loaded from (dataset: "...").
+    Data set options in parentheses are dropped by strip_parentheses, in linear time, and so are the
+    options of the statements (end=, nobs=, key=...) and those following the / of a statement.
+    INPUT:  starting line, ending line, match of DATA_STEP, SASToken of the statements of the step in
+            the string of the match (lexed from the content when not given)
+    OUTPUT: data sets read (data_in) and written (data_out), as (library, table)
+    """
+    __slots__ = ("name", "data_out", "data_in")
+    # Names keep the dots of macro variables, &lib..table being split by split_data_name
+    regex_data_set = re.compile(r"[a-zA-Z_&][a-zA-Z0-9_&.]*")
+    regex_statement_option = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*\s*=\s*(?:'[^']*'|\"[^\"]*\"|[^\s;]*)")
+    # A statement following IF ... THEN or ELSE, in the same statement as far as the lexer goes
+    regex_then_statement = re.compile(r"(?i)\b(?:then|else)\s+(set|merge|update|modify|output)\b")
+    regex_hash_data_set = re.compile(r"(?i)(\.output\s*\(\s*)?\bdataset\s*:\s*(?:'([^']*)'|\"([^\"]*)\")")
+    input_keywords = ("set", "merge", "update", "modify")
+
+    def __init__(self, start, end, content, statements=None):
         super(DataStep, self).__init__(start, end, content.group(1))
         self.name = "DataStep"
-        regex_data = re.compile(r"((?:(?i)^[\s]*data)(?:[\s]+(?:(?:[a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})\.)?"
-                                r"(?:[a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})(?:[\s]*\(.*.*?\))?)+;)",
-                                re.DOTALL)
-        self.data_out = []
-        self.data = re.search(regex_data, self.content).group(1)
-        regex_data_clean = re.compile(r"(?:(?i)^[\s]*data[\s]+)|"
-                                      r"(?:\(.*?(?:\(.*?\).*?)*\))|"
-                                      r";", re.DOTALL)
-        data_clean = re.sub(regex_data_clean, "", self.data)
-        regex_out = re.compile(r"(?:([a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})\.)?"
-                               r"([a-zA-Z_&][a-zA-Z0-9_&\.]{0,31})", re.DOTALL)
-        for m in re.findall(regex_out, data_clean):
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1])
-            self.data_out.append(m)
-
-        self.data_in = []
-        regex_set = re.compile(r"((?:(?i)[\s]*set)(?:[\s]+" +
-                               self.regex_sas_data_name +
-                               r"(?:[\s]*\(.*?(?:\(.*?\).*?)*\))?)+;)", re.DOTALL)
-        try:
-            self.set = re.search(regex_set, self.content).group(0)
-        except AttributeError:
-            self.set = None
+        data_in = {}
+        data_out = {}
+        if statements is None:
+            content = self.content
+            statements = self.statements(content)
         else:
-            regex_set_clean = re.compile(r"(?:(?i)^[\s]*set[\s]+)|"
-                                         r"(?:\(.*?(?:\(.*?\).*?)*\))|"
-                                         r";", re.DOTALL)
-            set_clean = re.sub(regex_set_clean, "", self.set)
-            regex_in = re.compile(self.regex_sas_data_name, re.DOTALL)
-            
-            m = re.match(regex_in, set_clean)
-            if m != None:
-                if m[0] == "" or m[0] is None:
-                    m = ("work", m[1])
-                self.data_in.append(m)
-            
-            """    
-            for m in re.findall(regex_in, set_clean):
-                if m[0] == "" or m[0] is None:
-                    m = ("work", m[1])
-                self.data_in.append(m)
-                break
-            """
+            content = content.string
+            statements = ((token.keyword, token.begin, token.stop) for token in statements)
+        first = True
+        for keyword, begin, stop in statements:
+            if keyword in ("if", "else"):
+                then = self.regex_then_statement.search(content, begin, stop)
+                if then is not None:
+                    keyword, begin = then.group(1).lower(), then.start(1)
+            if keyword == "data" and first:
+                data_out.update(dict.fromkeys(self.data_set_list(content, keyword, begin, stop)))
+            elif keyword in self.input_keywords:
+                data_sets = self.data_set_list(content, keyword, begin, stop)
+                data_in.update(dict.fromkeys(data_sets))
+                # MODIFY writes its master data set in place
+                if keyword == "modify" and data_sets:
+                    data_out[data_sets[0]] = None
+            elif keyword == "output":
+                data_out.update(dict.fromkeys(self.data_set_list(content, keyword, begin, stop)))
+            first = False
+            if content.find(":", begin, stop) >= 0:
+                for m in self.regex_hash_data_set.finditer(content, begin, stop):
+                    name = self.regex_data_set.match(strip_parentheses(m.group(2) or m.group(3) or "").strip())
+                    if name is not None:
+                        (data_out if m.group(1) else data_in)[split_data_name(name.group())] = None
+        self.data_in = list(data_in)
+        self.data_out = list(data_out)
 
+    def data_set_list(self, content, keyword, begin, stop):
+        """Data sets named by the statement starting with keyword at begin, without their options."""
+        # The options of every statement listing data sets follow a / (data ... / view=, set ... / unique)
+        text = strip_parentheses(content[begin + len(keyword):stop].rstrip(";")).split("/", 1)[0]
+        text = self.regex_statement_option.sub(" ", text)
+        return [split_data_name(name) for name in self.regex_data_set.findall(text)]
+
+    # The DATA and SET statements are lexed from the content when asked instead of being stored
+    @property
+    def data(self):
+        return first_statement(self.content, "data")
+
+    @property
+    def set(self):
+        return first_statement(self.content, "set")
+
+@proc_handler("sql")
 class ProcSQL(SASScriptComponent):
+    """PROC SQL step, its tables being read statement by statement (sas_sql).
+    INPUT:  starting line, ending line, match of step_pattern
+    OUTPUT: tables read (data_in) and written (data_out) by the statements, as (library, table),
+            statement_bounds: numbers of inputs and outputs at the end of each statement
+    """
+    __slots__ = ("name", "data_out", "data_in", "statement_bounds")
+    step_pattern = re.compile(r"(?is)(proc\s+sql\b.*)")
+
     def __init__(self, start, end, content):
         super(ProcSQL, self).__init__(start, end, content.group(1))
         self.name = "ProcSQL"
-        self.data_out = []
-        regex_out = re.compile(r"(?:(?i)create[\s]+(?:table|view)[\s]+)" +
-                               self.regex_sas_data_name +
-                               r"(?:(?i)[\s]+as[\s]+)", re.DOTALL)
-        #Added if condition by Michael Shi
-        if re.search(regex_out, self.content) != None:
-            m = re.search(regex_out, self.content).groups()
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1])
-            self.data_out.append(m)
-        
-        #insert into
-        regex_out = re.compile(r"(?:(?i)insert[\s]+(?:into)[\s]+)" +
-                               self.regex_sas_data_name +
-                               r"(?:.|\s)*?", re.DOTALL)
-        
-        if re.search(regex_out, self.content) != None:
-            m = re.search(regex_out, self.content).groups()
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1])
-            self.data_out.append(m)
-        
-        #update
-        regex_out = re.compile(r"(?:(?i)update[\s]+)" +
-                               self.regex_sas_data_name +
-                               r"(?:.|\s)*?", re.DOTALL)
-        
-        if re.search(regex_out, self.content) != None:
-            m = re.search(regex_out, self.content).groups()
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1])
-            self.data_out.append(m)
-            
         self.data_in = []
-        regex_in_main = re.compile(r"(?:(?i)from[\s]+)" +
-                                   self.regex_sas_data_name, re.DOTALL)
-        if re.search(regex_in_main, self.content) !=None:
-            m = re.search(regex_in_main, self.content).groups()
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1])
-            self.data_in.append(m)
-
-        regex_in_sub = re.compile(r"(?:(?i)(?:inner|(?:left|right|full)?outer)?[\s]+join[\s]+)" +
-                                  self.regex_sas_data_name, re.DOTALL)
-        for m in re.findall(regex_in_sub, self.content):
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1])
-            self.data_in.append(m)
+        self.data_out = []
+        self.statement_bounds = []
+        for inputs, outputs in sql_statement_tables(self.content):
+            self.data_in.extend(inputs)
+            self.data_out.extend(outputs)
+            self.statement_bounds.append((len(self.data_in), len(self.data_out)))
+
+    def data_flows(self):
+        """(input, output) pairs of the step, the inputs of a statement flowing to its outputs only."""
+        begin_in = begin_out = 0
+        for stop_in, stop_out in self.statement_bounds:
+            for flow in itertools.product(self.data_in[begin_in:stop_in], self.data_out[begin_out:stop_out]):
+                yield flow
+            begin_in, begin_out = stop_in, stop_out
 
 
 class ProcStandard(SASScriptComponent):
+    """PROC step reading and writing data sets, the base class of the handlers of PROC_HANDLERS.
+    step_pattern is matched at the start of the step, group 1 being the content and group 2 the
+    procedure name: steps it does not match are not components.
+    INPUT:  starting line, ending line, match of step_pattern
+    OUTPUT: data sets read (data_in) and written (data_out), as (library, table)
+    """
+    __slots__ = ("name", "data_in", "data_out")
+    step_pattern = None
+
     def __init__(self, start, end, content):
         super(ProcStandard, self).__init__(start, end, content.group(1))
         self.name = content.group(2).lower()
         self.data_in = []
         self.data_out = []
-        
-        if self.name in ["sort"]:
-            #Revised by Michael Shi                         
-            regex_in_out = re.compile(r"^[\s]*(?:(?i)proc[\s]+sort[\s]+data[\s]*=[\s]*)" +
-                                      self.regex_sas_data_name + r"(?:.|\s)*?"
-                                      r"(?:(?:(?i)out[\s]*=[\s]*)" +
-                                      self.regex_sas_data_name + r"\s+.*)?;",
-                                      re.DOTALL)
-            m = re.search(regex_in_out, self.content).groups()
-            if m[0] == "" or m[0] is None:
-                m = ("work", m[1], m[2], m[3])
-            if m[2] == "" or m[2] is None:
-                m = (m[0], m[1], "work", m[3])
-            if m[3] is None:
-                m = ("work", m[1], m[2], m[1])
-            self.data_in.append((m[0], m[1]))
-            self.data_out.append((m[2], m[3]))
-            
-        elif self.name in ["import"]:
-            #Revised by Michael Shi                         
-            reg_str = r"^[\s]*(?:(?i)proc[\s]+import[\s]+(?:datafile|datatable)[\s]*=[\s]*)" + \
-                r"([a-zA-Z_&'\"][a-zA-Z0-9_&'\"\.:\\\/\-]*)" + r"(?:[^out]+)"    \
-                r"(?:(?:(?i)out[\s]*=[\s]*)" +    \
-                self.regex_sas_data_name + r")?"
-                
-            regex_in_out = re.compile(r"^[\s]*(?:(?i)proc[\s]+import[\s]+(?:datafile|datatable)[\s]*=[\s]*)" +
-                                      r"([a-zA-Z_&'\"][a-zA-Z0-9_&'\"\.:\\\/\-]*)" + r"(?:[^out]+)"
-                                      r"(?:(?:(?i)out[\s]*=[\s]*)" +
-                                      self.regex_sas_data_name + r")?",                                  #+ r"\s+.*)?;"
-                                      re.DOTALL)
-            
-            if re.search(regex_in_out, self.content) != None:
-                m = re.search(regex_in_out, self.content).groups()
-                
-                if m[1] == "" or m[1] is None:
-                    m = (m[0],  "work", m[2])
-                if m[2] is None:
-                    m = (m[0], m[1], "none")
+        self.read_data_sets(self.content)
+
+    def read_data_sets(self, content):
+        pass
+
+    def data_flows(self):
+        """(input, output) pairs of the step, each input flowing to each output."""
+        return itertools.product(self.data_in, self.data_out)
+
+
+class ProcOptions(ProcStandard):
+    """PROC step whose data sets are named by options of its statements, in any order.
+    options: (statement keywords, data_set_option pattern, "data_in" or "data_out") of each option,
+    the PROC statement being "proc".
+    file_options: the same for the options naming an external file, file_option patterns, the files
+    being ("none", file name).
+    """
+    __slots__ = ()
+    options = ()
+    file_options = ()
+
+    def read_data_sets(self, content):
+        for keyword, begin, stop in self.statements(content):
+            for keywords, pattern, attribute in self.options:
+                if keyword in keywords:
+                    getattr(self, attribute).extend(data_set(m) for m in pattern.finditer(content, begin, stop))
+            for keywords, pattern, attribute in self.file_options:
+                if keyword in keywords:
+                    getattr(self, attribute).extend(("none", m.group(1))
+                                                    for m in pattern.finditer(content, begin, stop))
+
+
+@proc_handler("import")
+class ProcImport(ProcOptions):
+    """PROC IMPORT, reading the file datafile= (or the DBMS table datatable=) into out=."""
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(import)\b.*)")
+    options = ((("proc",), data_set_option("out"), "data_out"),)
+    file_options = ((("proc",), file_option("datafile|datatable"), "data_in"),)
+
+
+@proc_handler("export")
+class ProcExport(ProcOptions):
+    """PROC EXPORT, writing data= to the file outfile= (or the DBMS table outtable=)."""
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(export)\b.*)")
+    options = ((("proc",), data_set_option("data"), "data_in"),)
+    file_options = ((("proc",), file_option("outfile|outtable"), "data_out"),)
+
+
+@proc_handler("sort")
+class ProcSort(ProcOptions):
+    """PROC SORT, sorting data= into out=, or in place without out=."""
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(sort)\b.*)")
+    options = ((("proc",), data_set_option("data"), "data_in"),
+               (("proc",), data_set_option("out"), "data_out"))
+
+    def read_data_sets(self, content):
+        super(ProcSort, self).read_data_sets(content)
+        if not self.data_out:
+            self.data_out = list(self.data_in)
+
+
+@proc_handler("append")
+class ProcAppend(ProcOptions):
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(append)\b.*)")
+    options = ((("proc",), data_set_option("data|new"), "data_in"),
+               (("proc",), data_set_option("base|out"), "data_out"))
+
+
+@proc_handler("transpose")
+class ProcTranspose(ProcOptions):
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(transpose)\b.*)")
+    options = ((("proc",), data_set_option("data"), "data_in"),
+               (("proc",), data_set_option("out"), "data_out"))
+
+
+@proc_handler("means", "summary")
+class ProcMeans(ProcOptions):
+    __slots__ = ()
+    # Only the steps writing statistics out are data flows
+    step_pattern = re.compile(r"(?is)(proc\s+(means|summary)\b(?=.*?\bout\s*=).*)")
+    options = ((("proc",), data_set_option("data"), "data_in"),
+               (("output",), data_set_option("out"), "data_out"))
+
+
+@proc_handler("freq")
+class ProcFreq(ProcOptions):
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(freq)\b(?=.*?\bout\s*=).*)")
+    options = ((("proc",), data_set_option("data"), "data_in"),
+               (("tables", "table", "output"), data_set_option("out"), "data_out"))
+
+
+@proc_handler("format")
+class ProcFormat(ProcOptions):
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(format)\b(?=.*?\bcntl(?:in|out)\s*=).*)")
+    options = ((("proc",), data_set_option("cntlin"), "data_in"),
+               (("proc",), data_set_option("cntlout"), "data_out"))
+    regex_library = data_set_option("lib|library")
+
+    def read_data_sets(self, content):
+        # CNTLIN= writes the format catalog of lib= (work.formats by default), CNTLOUT= reads it
+        super(ProcFormat, self).read_data_sets(content)
+        m = self.regex_library.search(content)
+        if m is None:
+            catalog = ("work", "formats")
+        else:
+            catalog = (m.group(1), m.group(2)) if m.group(1) else (m.group(2), "formats")
+        cntlin, cntlout = bool(self.data_in), bool(self.data_out)
+        if cntlin:
+            self.data_out.append(catalog)
+        if cntlout:
+            self.data_in.append(catalog)
+
+
+class ProcLibraries(ProcStandard):
+    """PROC step copying members from a library to another, the members being listed by SELECT
+    statements (all of them, "_all_", when there is none). The nth input flows to the nth output only."""
+    __slots__ = ()
+    regex_in = re.compile(r"(?i)\bin\s*=\s*([a-zA-Z_&][a-zA-Z0-9_&]{0,31})")
+    regex_out = re.compile(r"(?i)\bout\s*=\s*([a-zA-Z_&][a-zA-Z0-9_&]{0,31})")
+    regex_member = re.compile(r"[a-zA-Z_&][a-zA-Z0-9_&]{0,31}")
+
+    def data_flows(self):
+        return zip(self.data_in, self.data_out)
+
+    def copy_members(self, library_in, library_out, members):
+        for member in members or ["_all_"]:
+            self.data_in.append((library_in, member))
+            self.data_out.append((library_out, member))
+
+    @staticmethod
+    def statement_list(content, keyword, begin, stop):
+        # Text of the statement after its keyword, without its options after /
+        return content[begin + len(keyword):stop].split("/")[0].rstrip(";")
+
+    def selected_members(self, content, begin, stop):
+        return self.regex_member.findall(self.statement_list(content, "select", begin, stop))
+
+
+@proc_handler("copy")
+class ProcCopy(ProcLibraries):
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(copy)\b.*)")
+
+    def read_data_sets(self, content):
+        library_in = library_out = None
+        members = []
+        for keyword, begin, stop in self.statements(content):
+            if keyword == "proc":
+                library_in = self.regex_in.search(content, begin, stop)
+                library_out = self.regex_out.search(content, begin, stop)
+            elif keyword == "select":
+                members.extend(self.selected_members(content, begin, stop))
+        if library_in is not None and library_out is not None:
+            self.copy_members(library_in.group(1), library_out.group(1), members)
+
+
+@proc_handler("datasets")
+class ProcDatasets(ProcLibraries):
+    """PROC DATASETS: APPEND, CHANGE (renames) and COPY statements, one level names being in the
+    library of lib= (work by default)."""
+    __slots__ = ()
+    step_pattern = re.compile(r"(?is)(proc\s+(datasets)\b(?=.*?\b(?:append|change|copy)\b).*)")
+    regex_library = re.compile(r"(?i)\b(?:lib|library|dd|ddname)\s*=\s*([a-zA-Z_&][a-zA-Z0-9_&]{0,31})")
+    regex_append_in = data_set_option("data|new")
+    regex_append_out = data_set_option("base|out")
+    regex_rename = re.compile(r"([a-zA-Z_&][a-zA-Z0-9_&]{0,31})\s*=\s*([a-zA-Z_&][a-zA-Z0-9_&]{0,31})")
+
+    def read_data_sets(self, content):
+        library = "work"
+        copy = None
+        for keyword, begin, stop in self.statements(content):
+            # A COPY statement copies the members of the SELECT statements following it
+            if copy is not None and keyword not in ("select", "exclude"):
+                self.copy_members(*copy)
+                copy = None
+            if keyword == "proc":
+                m = self.regex_library.search(content, begin, stop)
+                library = m.group(1) if m else library
+            elif keyword == "append":
+                data_in = self.regex_append_in.search(content, begin, stop)
+                data_out = self.regex_append_out.search(content, begin, stop)
+                if data_in is not None and data_out is not None:
+                    self.data_in.append(data_set(data_in, library))
+                    self.data_out.append(data_set(data_out, library))
+            elif keyword == "change":
+                for old, new in self.regex_rename.findall(self.statement_list(content, "change", begin, stop)):
+                    self.data_in.append((library, old))
+                    self.data_out.append((library, new))
+            elif keyword == "copy":
+                library_in = self.regex_in.search(content, begin, stop)
+                library_out = self.regex_out.search(content, begin, stop)
+                if library_out is not None:
+                    copy = [library_in.group(1) if library_in else library, library_out.group(1), []]
+            elif keyword == "select" and copy is not None:
+                copy[2].extend(self.selected_members(content, begin, stop))
+        if copy is not None:
+            self.copy_members(*copy)
 
-                self.data_in.append(("none", m[0]))
-                self.data_out.append((m[1], m[2]))
-            
-        elif self.name in ["export"]:
-            #Revised by Michael Shi                         
-            reg_str = r"^[\s]*(?:proc[\s]+export[\s]+data[\s]*=[\s]*)" + \
-                self.regex_sas_data_name + r"(?:[^out]+)" + \
-                r"(?:(?:outfile|outtable)[\s]*=[\s]*)([a-zA-Z_&'\"][a-zA-Z0-9_&\-'\"\.:\\\/]*)\s+.*?"
-                
-            regex_in_out = re.compile(reg_str, re.DOTALL)
-            
-            if re.search(regex_in_out, self.content) != None:
-                m = re.search(regex_in_out, self.content).groups()
-                
-                if m[0] == "" or m[0] is None:
-                    m =  ( "work", m[1], m[2])
-                if m[1] is None:
-                    m = (m[0], "none", m[2])
 
-                self.data_in.append(( m[0], m[1]))
-                self.data_out.append(("none", m[2]))
-                
 class MacroCall(SASScriptComponent):
+    __slots__ = ("name", "type")
+
     def __init__(self, start, end, content):
         super(MacroCall, self).__init__(start, end, content.group(1))
         self.name = content.group(2).lower()
 
 
 class MacroCallUserDef(MacroCall):
+    __slots__ = ()
+
     def __init__(self, start, end, content):
         super(MacroCallUserDef, self).__init__(start, end, content)
         self.type = "user_defined"
@@ -253,6 +505,8 @@ class MacroCallUserDef(MacroCall):
 
 
 class MacroCallSAS(MacroCall):
+    __slots__ = ()
+
     def __init__(self, start, end, content):
         super(MacroCallSAS, self).__init__(start, end, content.group(1))
         self.type = "sas_defined"
@@ -260,6 +514,8 @@ class MacroCallSAS(MacroCall):
 
 
 class MacroVarLetSAS(SASScriptComponent):
+    __slots__ = ("type", "name", "data_out")
+
     def __init__(self, start, end, content):
         super(MacroVarLetSAS, self).__init__(start, end, content.group(1))
         self.type = "MacroVarLetSAS"
@@ -275,6 +531,8 @@ class MacroVarLetSAS(SASScriptComponent):
                 self.data_out.append(m)
         
 class MacroInputVarSAS(SASScriptComponent):
+    __slots__ = ("type", "name", "data_in")
+
     def __init__(self, start, end, content):
         super(MacroInputVarSAS, self).__init__(start, end, content.group(1))
         self.type = "MacroInputVarSAS"
@@ -303,6 +561,8 @@ class MacroInputVarSAS(SASScriptComponent):
         """
         
 class MacroVarSymputSAS(SASScriptComponent):
+    __slots__ = ("type", "name", "data_out")
+
     def __init__(self, start, end, content):
         super(MacroVarSymputSAS, self).__init__(start, end, content.group(1))
         self.type = "MacroVarSymputSAS"
@@ -317,168 +577,177 @@ class MacroVarSymputSAS(SASScriptComponent):
                 m = re.search(regex_out, self.content).groups()
                 self.data_out.append(m)           
                 
+# Components of the blocks and statements of the lexer (sas_lexer). A pattern is matched at the start of
+# a block or statement, its groups being the ones the component class reads.
+WHOLE_TEXT = re.compile(r"(?s)(.*)")
+# PROC steps are handed to the handler of their procedure (PROC_HANDLERS).
+DATA_STEP = re.compile(r"(?is)(data\b.*)")
+STATEMENT_PATTERNS = (
+    (MacroVarLetSAS, re.compile(r"(?is)(%(let)\b.*)")),
+    (MacroCallUserDef, re.compile(r"(?is)(%(libname|exist_file)\(.*)")),
+    (MacroVarSymputSAS, re.compile(r"(?is).*?\b(call\s+(symput)\s*\(.*)")),
+)
+MACRO_VARIABLE = re.compile(r"&[a-zA-Z_]")
+# Families of components, by the pass of the lexer building them: a pass builds all of its families
+COMPONENT_PASSES = {
+    "comment_block": "comments", "comment_inline": "comments",
+    "data_step": "steps", "proc_sql": "steps", "proc_std": "steps",
+    "macro_var_let_sas": "statements", "macro_call_user_def": "statements",
+    "macro_var_symput_sas": "statements", "macro_invar_sas": "statements",
+}
+
+
 class SASProgram:
-    
-    def __init__(self, path):
+    """Components extracted from a SAS program.
+    The program is read when the SASProgram is created, and parsed as its results are asked for: each
+    family of components is built the first time it is read, along with the other families of its pass
+    (COMPONENT_PASSES), and the residuals when script or prop_extracted is read. The lineage of a program
+    only takes the pass of the steps.
+    INPUT:  path of the .sas file, write_outputs: parse the whole program and write the residuals,
+            mapping, macros and summary files to output/ (see write_outputs), StageStats recording the
+            time of each stage (optional), OutputSink the files are written to instead of output/ (optional)
+    OUTPUT: components by kind, mapping rows, macro rows, lineage edges, stats
+    """
+    def __init__(self, path, write_outputs=True, stats=None, sink=None):
         self.path = path
-        with open(self.path, "r") as infile:
-            self.script = infile.readlines()
-            
-            """
-            # Merge one SAS statement into the same line, LF by ";" Michael Shi
-            raw_script = list()
-            for line in self.script:
-                raw_script.append(line.replace(";",";line_seperator" ).replace("\n", " "))
-                raw_script_lines = "".join(raw_script)
-            
-            self.script = raw_script_lines.split("line_seperator")
-            """
-            self.script_length = len(self.script)
-            
-        self.components = []
-        regex_comment_block_total = r"^.*(\/\*.*?\*\/).*$"
-        regex_comment_block_beg = r"^.*\/\*.*$"
-        regex_comment_block_end = r"^.*\*\/.*$"
-        self.comment_block = self.find_component(CommentBlock,
-                                                 regex_comment_block_total,
-                                                 regex_comment_block_beg,
-                                                 regex_comment_block_end)
-        self.extract(self.comment_block)
-        
-        """
-        Macro Variables
+        self.stats = stats if stats is not None else StageStats(enabled=False)
+        self.sink = sink
+        lines = self.read_script()
         """
-        regex_macro_var_sas_total = r"^(.*(&[a-zA-Z_][a-zA-Z0-9_]{0,31}).*$)"
-        regex_macro_var_sas_beg = r"(?!.*)"
-        regex_macro_var_sas_end = r"(?!.*)"
-        self.macro_invar_sas = self.find_component(MacroInputVarSAS,
-                                                  regex_macro_var_sas_total,
-                                                  regex_macro_var_sas_beg,
-                                                  regex_macro_var_sas_end)
+        # Merge one SAS statement into the same line, LF by ";" Michael Shi
+        raw_script = list()
+        for line in self.script:
+            raw_script.append(line.replace(";",";line_seperator" ).replace("\n", " "))
+            raw_script_lines = "".join(raw_script)
         
-        
-        """
-        Macro %let statement
-        """
-        regex_macro_var_sas_total = r"^[\s]*(%((?i)let).*;).*$"
-        regex_macro_var_sas_beg = r"^[\s]*%(?:(?i)let).*$"
-        regex_macro_var_sas_end = r"^.*;.*$"
-        self.macro_var_let_sas = self.find_component(MacroVarLetSAS,
-                                                  regex_macro_var_sas_total,
-                                                  regex_macro_var_sas_beg,
-                                                  regex_macro_var_sas_end)
-        self.extract(self.macro_var_let_sas)
-        
-        """
-        Macro call symput statement
-        """
-        regex_macro_var_sas_total = r"(?i)^[\s]*(call[\s]+(symput).*;).*$"
-        regex_macro_var_sas_beg = r"(?i)^[\s]*(call[\s]+(symput)).*"
-        regex_macro_var_sas_end = r"^.*;.*$"
-        self.macro_var_symput_sas = self.find_component(MacroVarSymputSAS,
-                                                  regex_macro_var_sas_total,
-                                                  regex_macro_var_sas_beg,
-                                                  regex_macro_var_sas_end)
-        self.extract(self.macro_var_symput_sas)
-        
-        """
-        Data Step
-        """
-        regex_data_step_total = r"^[ ]*((?:(?i)data)[\s]+.*?;(?:.*?;)*?[\s]*(?:(?i)run);).*$"
-        regex_data_step_beg = r"^[ ]*(?:(?i)data)[\s]+.*$"
-        regex_data_step_end = r"^[ ]*(?:(?i)run);.*$"
-        self.data_step = self.find_component(DataStep,
-                                             regex_data_step_total,
-                                             regex_data_step_beg,
-                                             regex_data_step_end)
-        self.extract(self.data_step)
-        
-        """
-        PROC SQL
-        """
-        regex_proc_sql_total = r"^[ ]*((?:(?i)proc[\s]+sql)(?:[\s]+.*?)?;" \
-                               r"(?:.*?;)*?[\s]*" \
-                               r"(?:(?i)run[\s]*;|quit[\s]*;|proc[\s]*)).*$"          #r"(?:(?i)run|quit);).*$"
-                               
-        regex_proc_sql_beg = r"^[ ]*((?i)proc[\s]+sql)(?:[\s]+.*?)?;.*$"
-        regex_proc_sql_end = r"^[ ]*((?i)run[\s]*;|quit[\s]*;|proc[\s]*).*$"       #r"^[ ]*(?:(?i)run|quit);.*$"
-        self.proc_sql = self.find_component(ProcSQL,
-                                            regex_proc_sql_total,
-                                            regex_proc_sql_beg,
-                                            regex_proc_sql_end)
-        self.extract(self.proc_sql)
-        
-        """
-        #PROC IMPORT, PROC SORT
-        """
-        regex_proc_std_total = r"^[ ]*((?:(?i)proc[\s]+(sort|import)[\s]+" \
-                               r"(?:data|datafile))[\s]*=" \
-                               r"(?:.+?);(?:.*?;)*?[\s]*(?:(?i)run);).*$"
-        regex_proc_std_beg = r"^[ ]*(?:(?i)proc[\s]+(?:sort|import)[\s]+" \
-                             r"(?:data|datafile))[\s]*=(?:.+?)$"
-        regex_proc_std_end = r"^[ ]*(?:(?i)run);.*$"
-        self.proc_std = self.find_component(ProcStandard,
-                                            regex_proc_std_total,
-                                            regex_proc_std_beg,
-                                            regex_proc_std_end)
-        self.extract(self.proc_std)
-        
-        """
-        #PROC EXPORT
-        """
-        regex_proc_std_total = r"^[ ]*((?:(?i)proc[\s]+(export)[\s]+" \
-                               r"(?:data))[\s]*=" \
-                               r"(?:.+?);(?:.*?;)*?[\s]*(?:(?i)run);).*$"
-        regex_proc_std_beg = r"^[ ]*(?:(?i)proc[\s]+(export)[\s]+" \
-                             r"(?:data))[\s]*=(?:.+?)$"
-        regex_proc_std_end = r"^[ ]*(?:(?i)run);.*$"
-        self.proc_std = self.find_component(ProcStandard,
-                                            regex_proc_std_total,
-                                            regex_proc_std_beg,
-                                            regex_proc_std_end)
-        self.extract(self.proc_std)
-        
-        """ 
-        Macro include
+        self.script = raw_script_lines.split("line_seperator")
         """
-        regex_macro_call_user_def_total = r"^[\s]*(%((?i)libname|exist_file)\(.*\);).*$"
-        regex_macro_call_user_def_beg = r"^[\s]*%(?:(?i)libname)\(.*$"
-        regex_macro_call_user_def_end = r"^.*\);.*$"
-        self.macro_call_user_def = self.find_component(MacroCallUserDef,
-                                                       regex_macro_call_user_def_total,
-                                                       regex_macro_call_user_def_beg,
-                                                       regex_macro_call_user_def_end)
-        self.extract(self.macro_call_user_def)
-        
-        
-        regex_comment_inline_total = r"^[^=]*(\*+[^;]*;).*$"
-        regex_comment_inline_beg = r"^[^=]*\*.*?$"
-        regex_comment_inline_end = r"^.*;.*$"
-        self.comment_inline = self.find_component(CommentInline,
-                                                  regex_comment_inline_total,
-                                                  regex_comment_inline_beg,
-                                                  regex_comment_inline_end)
-        self.extract(self.comment_inline)
-        
-        filename = os.path.splitext(os.path.basename(self.path))[0].replace(" ", "_")
-        filename_residuals = "residuals_{}.txt".format(filename)
-        with open(os.path.join(os.getcwd(), "output", filename_residuals), "w") as outfile:
-            nb_line_extracted = 0
-            for line in self.script:
-                if line == "" or line == "\n":
-                    line = "\n"
-                    nb_line_extracted += 1
-                outfile.write(line)
+        self.script_length = len(lines)
+            
+        # Components point into the original source instead of each holding a copy of their text.
+        # extract() keeps the number of lines, so line numbers stay valid in the source.
+        self.source = "".join(lines)
+        self.data_names = {}
+        # Families of components built, by name, and the components of each pass run, by offset
+        self.families = {}
+        self.pass_components = {}
+        if write_outputs:
+            self.write_outputs()
+
+    def family(self, name):
+        """Components of the family name, built by the pass of the family the first time they are asked for."""
+        if name not in self.families:
+            self.run_passes([COMPONENT_PASSES[name]])
+        return self.families[name]
+
+    comment_block = property(operator.methodcaller("family", "comment_block"))
+    comment_inline = property(operator.methodcaller("family", "comment_inline"))
+    data_step = property(operator.methodcaller("family", "data_step"))
+    proc_sql = property(operator.methodcaller("family", "proc_sql"))
+    proc_std = property(operator.methodcaller("family", "proc_std"))
+    macro_var_let_sas = property(operator.methodcaller("family", "macro_var_let_sas"))
+    macro_call_user_def = property(operator.methodcaller("family", "macro_call_user_def"))
+    macro_var_symput_sas = property(operator.methodcaller("family", "macro_var_symput_sas"))
+    macro_invar_sas = property(operator.methodcaller("family", "macro_invar_sas"))
+
+    def run_passes(self, passes):
+        """Run the passes not run yet, together, in one pass of the lexer."""
+        passes = [name for name in passes if name not in self.pass_components]
+        if passes:
+            # The lexer cuts the program into comments, statements and steps, whatever the lines they run
+            # through, and the components are built from these
+            self.find_components(self.stats.timed_iter("lex", lex_program(self.source)), passes)
+
+    @functools.cached_property
+    def components(self):
+        """Components of all the passes by offset, but the macro variables read."""
+        passes = ("comments", "steps", "statements")
+        self.run_passes(passes)
+        # At the same offset, a step comes before the component of its first statement
+        return sorted(itertools.chain.from_iterable(self.pass_components[name] for name in passes),
+                      key=operator.attrgetter("begin"))
+
+    @functools.cached_property
+    def script(self):
+        """Lines of the program, the lines of the components extracted being "" (the residuals)."""
+        return self.extract(self.outer_components())
+
+    @functools.cached_property
+    def prop_extracted(self):
+        nb_line_extracted = 0
+        for line in self.script:
+            if line == "" or line == "\n":
+                nb_line_extracted += 1
+        return nb_line_extracted/self.script_length
+
+    @instrumented("read", items=len)
+    def read_script(self):
+        # Compressed programs are decompressed as they are read
+        with open_input_text(self.path) as infile:
+            return infile.readlines()
+
+    def residuals_text(self):
+        """Text of residuals_*.txt: the script, the lines extracted being blanked."""
+        return "".join(line or "\n" for line in self.script)
+
+    def extraction_report(self):
+        """Extraction summary of the program, as summary_*.txt gives it, without the residuals file
+        name, which depends on the path of the program and not on its content."""
+        return "".join((
+            "Number of lines of code in the script: \n"
+            "\t {} \n". format(len(self.script)),
+            "Proportion of the script correctly extracted: \n"
+            "\t {} \n".format("%.3f" % self.prop_extracted),
+            "Code Diagnostic:",
+            "\tProportion of the comments: \n"
+            "\t\t {} \n".format("%.3f" % self.proportion_comments()),
+            self.extraction_summary()))
+
+    def summary_text(self):
+        """Text of summary_*.txt: the extraction summary of the program."""
+        return summary_text(self.extraction_report(), self.path)
+
+    @instrumented("write_outputs")
+    def write_outputs(self):
+        """Write the residuals, mapping, macros and summary of the program to the sink of the program
+        (output/ by default) and print the summary."""
+        sink = output_sink(self.sink)
+        filename = file_stem(self.path)
+        sink.write("residuals_{}.txt".format(filename), self.residuals_text())
         
         #Output mapping to csv
-        pd_output_map = pandas.DataFrame(columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs"])
+        output_map = MappingTable(MAPPING_COLUMNS)
+        output_map.extend(self.mapping_rows())
+        output_map.write_to(sink, "mapping_{}.csv".format(filename))
+        
+        #Output macro vars to csv
+        output_macro = MappingTable(MACRO_COLUMNS)
+        output_macro.extend(self.macro_rows())
+        output_macro.write_to(sink, "macros_{}.csv".format(filename))
+                        
+        sink.write("summary_{}.txt".format(filename), self.summary_text())
+        print("Number of lines of code in the script: \n"
+              "\t {} \n". format(len(self.script)))
+        print("Proportion of the script correctly extracted: \n"
+              "\t {} \n".format("%.3f" % self.prop_extracted))
+        print("Code Diagnostic:")
+        print("\tProportion of the comments: \n"
+              "\t\t {} \n".format("%.3f" % self.proportion_comments()))
+        print(self.extraction_summary())
+        print("See the following file for more details on the ignored content: \n"
+              " residuals_{}.txt".format(filename))
+        # for comp in self.components:
+        #     print(comp)
+        #     print(comp.start)
+
+    def mapping_rows(self):
         mapping = sorted(self.components, key=lambda x: x.start)
         
         for i, step in enumerate(mapping):
             if type(step) in (CommentBlock, CommentInline, Comment, MacroCall):
                 continue
             
-            if type(step) in (ProcStandard, ProcSQL, DataStep):
+            if isinstance(step, (ProcStandard, ProcSQL, DataStep)):
                 data_in_name = list()
                 data_out_name = list()
                 
@@ -488,18 +757,11 @@ class SASProgram:
                 for x in step.data_out:
                     data_out_name.append(str(x[0]) + "." + x[1])
                 
-                df = pandas.DataFrame(data=[[str(i), str(step.start) ,  str(step.end) , step.name.upper(), "|".join(data_in_name), "|".join(data_out_name) ]], \
-                                          columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs"])
-                pd_output_map = pd_output_map.append(df)
-            #else:
-                #csv_row = csv_row + "," + "," + "\n"
-             
-        filename_mapping_csv = "mapping_{}.csv".format(filename)
-        pd_output_map.reset_index(drop = True, inplace = True)
-        pd_output_map.to_csv(os.path.join(os.getcwd(), "output", filename_mapping_csv), index=False)
-        
-        #Output macro vars to csv
-        pd_output_macro = pandas.DataFrame(columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs","Values"])
+                # Observation counts are only known from the logs
+                yield [str(i), str(step.start) ,  str(step.end) , step.name.upper(), "|".join(data_in_name), "|".join(data_out_name),
+                       "", "", ""]
+
+    def macro_rows(self):
         macro_var_sas = list()
         for x in (self.macro_var_let_sas):
             macro_var_sas.append(x)
@@ -513,142 +775,130 @@ class SASProgram:
         mapping = sorted(macro_var_sas, key=lambda x: x.start)
         
         for i, step in enumerate(mapping):
-            
-            #csv_row_1 = str(i) + "," + str(step.start) + "," + str(step.end) + "," + step.name.upper() + "," #str(type(step)).split(".")[1].split("'")[0] + "," 
             if type(step) == MacroVarLetSAS:
-                
                 if step.name.upper() == "LET" and len(step.data_out) > 0:
-                    df = pandas.DataFrame(data=[[str(i), str(step.start) ,  str(step.end) , step.name.upper(), "", str(step.data_out[0][0]) , str(step.data_out[0][1])]], \
-                                          columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs","Values"])
-                    pd_output_macro = pd_output_macro.append(df)
-                    #csv_row = csv_row_1 + "," + str(step.data_out[0][0]) + "," + str(step.data_out[0][1]) + "\n" 
-                     
+                    yield [str(i), str(step.start) ,  str(step.end) , step.name.upper(), "", str(step.data_out[0][0]) , str(step.data_out[0][1])]
                 
             elif  type(step) == MacroVarSymputSAS and len(step.data_out) > 0:
                 if step.name.upper() == "SYMPUT":
-                    df = pandas.DataFrame(data=[[str(i), str(step.start) ,  str(step.end) , step.name.upper(), "", str(step.data_out[0][0]) , str(step.data_out[0][1]) ]], \
-                                          columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs","Values"])
-                    pd_output_macro = pd_output_macro.append(df)
-                    #csv_row = csv_row_1 + "," + str(step.data_out[0][0]) + "," + str(step.data_out[0][1]) + "\n" 
+                    yield [str(i), str(step.start) ,  str(step.end) , step.name.upper(), "", str(step.data_out[0][0]) , str(step.data_out[0][1]) ]
                     
             elif type(step) == MacroInputVarSAS:
                 for data_in_i in step.data_in:
-                    df = pandas.DataFrame(data=[[str(i), str(step.start) ,  str(step.end) , step.name.upper(), str(data_in_i[0]) ,"", str(data_in_i[1])]], \
-                                          columns=["Sequence","Start Line Number", "End Line Number", "Procedure Type", "Inputs", "Outputs","Values"])
-                    pd_output_macro = pd_output_macro.append(df)
-                    #csv_row = csv_row_1  + str(data_in_i[0]) + ",," + str(data_in_i[1]) + "\n" 
-                    
-        pd_output_macro.reset_index(drop = True, inplace = True)
-        filename_mapping_csv = "macros_{}.csv".format(filename)
-        pd_output_macro.to_csv(os.path.join(os.getcwd(), "output", filename_mapping_csv), index=False)
-        
-                        
-        self.prop_extracted = nb_line_extracted/self.script_length
-        filename_log = "summary_{}.txt".format(filename)
-        with open(os.path.join(os.getcwd(), "output", filename_log), "w") as outfile:
-            outfile.write("Number of lines of code in the script: \n" 
-              "\t {} \n". format(len(self.script)))
-            outfile.write("Proportion of the script correctly extracted: \n"
-              "\t {} \n".format("%.3f" % self.prop_extracted))
-            outfile.write("Code Diagnostic:")
-            outfile.write("\tProportion of the comments: \n"
-              "\t\t {} \n".format("%.3f" % self.proportion_comments()))
-            outfile.write(self.extraction_summary())
-            outfile.write("See the following file for more details on the ignored content: \n"
-                          
-              " residuals_{}.txt".format(filename))
-        print("Number of lines of code in the script: \n"
-              "\t {} \n". format(len(self.script)))
-        print("Proportion of the script correctly extracted: \n"
-              "\t {} \n".format("%.3f" % self.prop_extracted))
-        print("Code Diagnostic:")
-        print("\tProportion of the comments: \n"
-              "\t\t {} \n".format("%.3f" % self.proportion_comments()))
-        print(self.extraction_summary())
-        print("See the following file for more details on the ignored content: \n"
-              " residuals_{}.txt".format(filename))
-        # for comp in self.components:
-        #     print(comp)
-        #     print(comp.start)
+                    yield [str(i), str(step.start) ,  str(step.end) , step.name.upper(), str(data_in_i[0]) ,"", str(data_in_i[1])]
 
+    def lineage_edges(self):
+        # Only the steps read and write data sets
+        self.run_passes(["steps"])
+        for comp in self.pass_components["steps"]:
+            try:
+                if isinstance(comp, (ProcStandard, ProcSQL)):
+                    flows = comp.data_flows()
+                else:
+                    flows = itertools.product(comp.data_in, comp.data_out)
+                for data_in, data_out in flows:
+                    yield (".".join(data_in), ".".join(data_out), comp.name)
+            except Exception:
+                pass
+
+    @instrumented("extract")
     def extract(self, extracted_components):
         assert(isinstance(extracted_components, list)), \
             invalid_type_message.format("extracted_components", "list", type(extracted_components))
+        # The components are masked in the source in one pass, keeping only their line breaks, and the
+        # masked source is split into lines once: a line a component runs through keeps its text outside
+        # of the components, and is extracted ("") when nothing but spaces is left. Replacing the content
+        # in the joined lines of each component instead was quadratic when many of them share a line.
+        source = self.source
+        kept = []
+        touched = bytearray(self.script_length)
+        position = 0
         for comp in extracted_components:
-            current = self.script[comp.start:comp.end]
-            nb_line_current = len(current)
-            current = "".join(current).strip()
-            #print("CURRENT")
-            #print(current)
-            modified = current.replace(comp.content, "")
-            #print("CONTENT")
-            #print(comp.content)
-            #print("MODIFIED")
-            #print(modified)
-            nb_line_modified = len(modified.split("\n"))
-            modified = modified + "\n"*(nb_line_current-nb_line_modified)
-            #print(modified)
-            modified = modified.split("\n")
-            #print(modified)
-            self.script[comp.start:comp.end] = modified
-
-    def find_component(self, cls, regex_total, regex_beg, regex_end):
-        regex_total = re.compile(regex_total, re.DOTALL)
-        regex_beg = re.compile(regex_beg)
-        regex_end = re.compile(regex_end)
-        components = []
-        start = None
-        end = None
-        
-        line_stamp = 0
-        while line_stamp < len(self.script):
-        #for line_stamp in range(len(self.script)):
-            line = self.script[line_stamp]
-            if re.match(regex_total, line) and start is None:
-                
-                content = re.search(regex_total, line)
-                comp = cls(line_stamp, line_stamp + 1, content)
-                components.append(comp)
-                """
-                obj = re.finditer(regex_total, line)
-                
-                for m in re.finditer(regex_total, line):
-                    comp = cls(line_stamp, line_stamp + 1, m)
-                    components.append(comp)
-                """
-            else:
-                if re.match(regex_beg, line):
-                    if start is None:
-                        start = line_stamp
-                    if end is not None:
-                        if start >= end:
-                            end = None
-                if re.match(regex_end, line):
-                    if line_stamp == start:
-                        # start and end are on the same line, protentially same PROC
-                        if  re.findall(r"(?i)^[ ]*(proc[\s]*)", line) != None:
-                            m = re.findall(r"(?i)^[ ]*(proc[\s]*)", line)
-                            if len(m) > 1:
-                                end = line_stamp + 1
-                    else:
-                        end = line_stamp + 1
-                        
-                        if re.search(r"(?i)^[ ]*(proc[\s]*)", line) != None and start != None and end != None:
-                            #backtrack one line if ends by proc
-                            line_stamp = line_stamp - 1
-
-                if start is not None and end is not None:
-                    block = "".join(self.script[start:end])
-                    content = re.search(regex_total, block)
-                    comp = cls(start, end, content)
-                    components.append(comp)
-                    self.components.append(comp)
-                    start = None
-                    end = None
-                
-            line_stamp = line_stamp + 1
-            #print(line_stamp)
-        return components
+            kept.append(source[position:comp.begin])
+            kept.append("\n" * source.count("\n", comp.begin, comp.stop))
+            touched[comp.start:comp.end] = b"\x01" * (comp.end - comp.start)
+            position = comp.stop
+        kept.append(source[position:])
+        masked = "".join(kept).split("\n")
+        script = [line + "\n" for line in masked[:-1]]
+        if masked[-1]:
+            script.append(masked[-1])
+        return ["" if touch and line.isspace() else line for line, touch in zip(script, touched)]
+
+    @staticmethod
+    def family_name(cls):
+        # The PROC handlers are listed with their base class
+        if issubclass(cls, ProcStandard):
+            cls = ProcStandard
+        return {CommentBlock: "comment_block", CommentInline: "comment_inline",
+                MacroInputVarSAS: "macro_invar_sas", MacroVarLetSAS: "macro_var_let_sas",
+                MacroVarSymputSAS: "macro_var_symput_sas", DataStep: "data_step", ProcSQL: "proc_sql",
+                ProcStandard: "proc_std", MacroCallUserDef: "macro_call_user_def"}[cls]
+
+    def add_component(self, families, components, cls, token, content, *args):
+        comp = cls(token.start, token.end, content, *args)
+        comp.compact(self.source, token.begin, token.stop, self.data_names)
+        name = self.family_name(cls)
+        families[name].append(comp)
+        # Macro variables read are not code of their own, they are only listed
+        if cls is not MacroInputVarSAS:
+            components[COMPONENT_PASSES[name]].append(comp)
+
+    @instrumented("find_components", items=len)
+    def find_components(self, tokens, passes=("comments", "steps", "statements")):
+        """Components of the passes (COMPONENT_PASSES) in the steps, statements and comments of the tokens
+        (lex_program). The families of the passes are stored once all the tokens are read.
+        Returns the components found, but the macro variables read."""
+        source = self.source
+        families = {name: [] for name, pass_name in COMPONENT_PASSES.items() if pass_name in passes}
+        components = {pass_name: [] for pass_name in passes}
+        comments, steps, statements = ("comments" in passes), ("steps" in passes), ("statements" in passes)
+        for block in group_blocks(source, tokens):
+            if block.kind == "comment_block":
+                if comments:
+                    self.add_component(families, components, CommentBlock, block,
+                                       WHOLE_TEXT.match(source, block.begin, block.stop))
+                continue
+            if block.kind == "comment":
+                if comments:
+                    self.add_component(families, components, CommentInline, block,
+                                       WHOLE_TEXT.match(source, block.begin, block.stop))
+                continue
+            if steps and block.kind == "data":
+                # The statements the lexer cut are handed to the step, which does not lex its content again
+                self.add_component(families, components, DataStep, block,
+                                   DATA_STEP.match(source, block.begin, block.stop), block.statements)
+            elif steps and block.kind == "proc":
+                handler = PROC_HANDLERS.get(block.name)
+                content = handler.step_pattern.match(source, block.begin, block.stop) if handler else None
+                if content is not None:
+                    self.add_component(families, components, handler, block, content)
+            if not statements:
+                continue
+            for statement in block.statements:
+                for cls, pattern in STATEMENT_PATTERNS:
+                    content = pattern.match(source, statement.begin, statement.stop)
+                    if content is not None:
+                        self.add_component(families, components, cls, statement, content)
+                        break
+                if MACRO_VARIABLE.search(source, statement.begin, statement.stop):
+                    self.add_component(families, components, MacroInputVarSAS, statement,
+                                       WHOLE_TEXT.match(source, statement.begin, statement.stop))
+        for pass_components in components.values():
+            pass_components.sort(key=operator.attrgetter("begin"))
+        self.families.update(families)
+        self.pass_components.update(components)
+        return list(itertools.chain.from_iterable(components.values()))
+
+    def outer_components(self):
+        """Components not inside another one, which extract() removes along with the outer one."""
+        outer = []
+        stop = 0
+        for comp in self.components:
+            if comp.begin >= stop:
+                outer.append(comp)
+                stop = comp.stop
+        return outer
 
     def proportion_comments(self):
         nb_line_comments = 0
@@ -674,164 +924,134 @@ class SASProgram:
             #'put': len([x for x in self.macro_call_sas if x.name == 'put']),
             # 'user_def_macro': len(self.macro_call_user_def)
         }
-        for macro in set([x for x in self.macro_call_user_def]):
-            name = macro.name
-            extraction_dict[name] = len([x for x in self.macro_call_user_def if x.name == name])
+        extraction_dict.update(collections.Counter("proc_" + x.name for x in self.proc_std))
+        extraction_dict.update(collections.Counter(x.name for x in self.macro_call_user_def))
         text_to_print = "The extraction can be resumed as follow: \n"
         for category, qte in sorted(extraction_dict.items(), key=operator.itemgetter(1), reverse=True):
             text_to_print += "\t{}: {}\n".format(category, qte)
         return text_to_print
 
-#output path
-output_path = os.path.join(os.getcwd(), "output")
+invalid_type_message = "The argument {} must of the following type: \n\t {} \n" \
+                       "The type provided was: \n\t {}"
 
-if os.path.isdir(output_path) == False:
-    #shutil.rmtree(output_path)
-    os.mkdir(output_path)
-    
-path = os.path.join(os.getcwd())
-#print(path)
 
-#sas_files = glob.glob(os.path.join("**", "*.sas")) #, recursive=True
-sas_files = get_list( os.path.join(os.getcwd(), "source"))
-#sas_files = get_list(r"C:\work\SAS Code from Balwinder\Shamela_Production_Reports")
-#sas_files = get_list(r"C:\work\IDR\ScotiaGlobe")
-#print(sas_files)
+# Keywords of the degraded parse: the DATA and CREATE TABLE/VIEW outputs, the SET, FROM and JOIN inputs
+# following them. Names are bounded, so that the scan is a single linear pass over the source.
+SCAN_KEYWORDS = re.compile(r"(?i)\b(data|set|create\s+(?:table|view)|from|join)\s+"
+                           r"(?:([a-zA-Z_&][a-zA-Z0-9_&]{0,31})\.)?([a-zA-Z_&][a-zA-Z0-9_&]{0,31})")
 
-invalid_type_message = "The argument {} must of the following type: \n\t {} \n" \
-                       "The type provided was: \n\t {}"
 
-for file in sas_files:
-    G = nx.MultiDiGraph()
-    sas = SASProgram(file)
-    
-    for comp in sas.components:
-        try:
-            for data_in in comp.data_in:
-                data_name_in = ".".join(data_in)
-                for data_out in comp.data_out:
-                    data_name_out = ".".join(data_out)
-                    G.add_edge(data_name_in, data_name_out, label = comp.name)
-            # print(comp.data_out)
-        except Exception:
-            pass
-    
-    # print("EDGES")
-    # for edge in sorted(G.edges()):
-    #     print(edge)
-    #
-    # print("NODES")
-    # for node in sorted(G.nodes()):
-    #     print(node)
-
-    UG = G.to_undirected()
-    sub_graphs = nx.connected_component_subgraphs(UG)
-    # sub_graphs = nx.weakly_connected_components(G)
-
-    DG = G.to_directed()
-    DG.graph['graph'] = {'rankdir': 'LR', 'splines': 'line'}
-    fname = os.path.splitext(os.path.basename(file))[0].replace(" ", "_")
-    nx.drawing.nx_pydot.write_dot(DG, os.path.join("output", 'flow_{}.dot'.format(fname)))
-    
-    try:
-        pos=nx.graphviz_layout(DG, prog='dot')
-    except:
-        pos=nx.spring_layout(DG,iterations=20)
-        
-    nx.draw(DG)
-    plt.savefig("C:\work\SAS-Mapper\output\draw.png")
-    pos = nx.drawing.nx_pydot.graphviz_layout(DG, prog='dot')
-    nx.draw(DG, pos, with_labels=True, arrow=True)
-    p = nx.drawing.nx_pydot.to_pydot(DG)
-    p.write_png(os.path.join("output", 'example_{}.png'.format(i)))
-    
-    #drawing the graph
-    #H = nx.graph(G)
+def scan_program(path):
+    """Degraded parse of a program, for programs the full parse takes too long on: comments, quotes
+    and statements are not told apart, only the keywords of SCAN_KEYWORDS are scanned.
+    INPUT:  path of the .sas file
+    OUTPUT: [name, start line, end line, data_in, data_out] of each DATA step ("DataStep") and
+            CREATE TABLE ("ProcSQL"), data names being (library, table) tuples
+    """
+    with open_input_text(path) as infile:
+        source = infile.read()
+    line_of = LineCounter(source)
+    steps = []
+    for match in SCAN_KEYWORDS.finditer(source):
+        keyword = match.group(1).lower()
+        data_name = (match.group(2) or "work", match.group(3))
+        line = line_of(match.start())
+        if keyword == "data" or keyword.startswith("create"):
+            steps.append(["DataStep" if keyword == "data" else "ProcSQL", line, line + 1, [], [data_name]])
+        elif steps:
+            steps[-1][2] = line + 1
+            steps[-1][3].append(data_name)
+    return steps
+
+
+def draw_flow(G, path):
+    """Draw the data flow of G to a png file."""
+    import networkx as nx
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     H = G.to_directed()
-    edgelabels = []
-    
-    for (u,v,d) in H.edges(data=True):
-        r = d["label"]
-        edgelabels.append(r)
-    
     try:
-        pos=nx.graphviz_layout(H)
-    except:
-        pos=nx.spring_layout(H,iterations=20)
-        
-    
+        pos = nx.drawing.nx_pydot.graphviz_layout(H, prog='dot')
+    except Exception:
+        pos = nx.spring_layout(H, iterations=20)
+
+    plt.figure()
     plt.rcParams['text.usetex'] = False
-    #plt.figure(figsize=(8,8))
-    #nx.draw_networkx_edges(H,pos,alpha=0.3,width=edgewidth, edge_color='m')
-    #nodesize=[wins[v]*50 for v in H]
-    nx.draw_networkx_nodes(H,pos,alpha=0.4)
-    nx.draw_networkx_edges(H,pos,width=1, arrows=True, label= edgelabels )   
-    
-    font = {'fontname'   : 'Helvetica',
-            'color'      : 'k',
+    nx.draw_networkx_nodes(H, pos, alpha=0.4)
+    nx.draw_networkx_edges(H, pos, width=1, arrows=True)
+    nx.draw_networkx_labels(H, pos, font_size=8)
+    nx.draw_networkx_edge_labels(H, pos, edge_labels={(u, v): d["label"] for u, v, d in H.edges(data=True)},
+                                 font_size=7)
+
+    font = {'color'      : 'k',
             'fontweight' : 'bold',
             'fontsize'   : 14}
     plt.title("Data flow", font)
-
-    # change font and write text (using data coordinates)
-    font = {'fontname'   : 'Helvetica',
-    'color'      : 'r',
-    'fontweight' : 'normal',
-    'fontsize'   : 10}
-
     plt.text(0.5, 0.97, "edge label = SAS DATA STEPs or Procedures used",
              horizontalalignment='center',
              transform=plt.gca().transAxes)
     plt.text(0.5, 0.94,  "node = DATASETs or DATA Tables",
              horizontalalignment='center',
              transform=plt.gca().transAxes)
-
     plt.axis('off')
-    plt.savefig("data_flow.png",dpi=75)
-    print("Wrote data_flow.png")
-    plt.show() # display
-    
-    """
-    for i, sg in enumerate(sub_graphs):
-        # print("subgraph {} has {} nodes".format(i, sg.number_of_nodes()))
-        # print("\tNodes:", sg.nodes(data=True))
-        # print("\tEdges:", sg.edges())
-        # print(sg)
-        TG = nx.MultiDiGraph()
-        for edge in [edge for edge in G.edges()
-                     if edge[0] in sg.nodes()
-                     or edge[1] in sg.nodes()]:
-            TG.add_edge(*edge)
-        TG.graph['graph'] = {'rankdir': 'LR', 'splines': 'line'}
-        fname_i = os.path.join("output", "flow_{}.dot".format(fname) + "_{}.dot".format(i+1))
-        nx.drawing.nx_pydot.write_dot(TG, fname_i)
-        
-        nx.draw(TG)
-        plt.savefig("C:\work\SAS-Mapper\output\draw.png")
-        pos = nx.drawing.nx_pydot.graphviz_layout(TG, prog='dot')
-        nx.draw(TG, pos, with_labels=True, arrow=False)
-        p = nx.drawing.nx_pydot.to_pydot(TG)
-        p.write_png(os.path.join("output", 'example_{}.png'.format(i)))
-        """
-    # print(sas.comment_block)
-    # for cb in sas.comment_block:
-    #     print(cb.content)
-    #print(len(sas.proc_sql))
-    #  for comment in sas.comment_block:
-    #      print(comment.content)
-    #      print(comment.start)
-    #      print(comment.end)
-    #      print(sas.script[comment.start:comment.end])
-    #for data in sas.data_step:
-    #    print(data.content)
-    #for proc in sas.proc_sql:
-    #    print(proc.content)
-    #for proc in sas.proc_std:
-    #    print(proc.category)
-    # for comment in sas.comment_inline:
-    #     print(comment.content)
-    # for cb in sas.comment_block:
-    #     print(cb.content)
-    #     print(cb.end-cb.start)
-    #for element in sas.proc_sql:
-    #    print(element.content)
+    plt.savefig(path, dpi=75)
+    plt.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map the data flow of SAS programs.")
+    parser.add_argument("paths", nargs="*", default=[os.path.join(os.getcwd(), "source")],
+                        help=".sas files or folders of .sas files (default: source)")
+    parser.add_argument("--lineage", default=os.path.join("output", "lineage.json"),
+                        help="JSON file of the corpus wide lineage graph, updated in place")
+    parser.add_argument("--draw", action="store_true", help="also draw the flow of each program to a png file")
+    parser.add_argument("--metrics", default=None, help="Prometheus text file to write the time of each parsing stage to")
+    parser.add_argument("--metrics-per-file", action="store_true", help="also write the stage times of each program")
+    parser.add_argument("--lineage-only", action="store_true",
+                        help="only map the data flow: no component, macro variable or residual outputs")
+    parser.add_argument("--output", default=None,
+                        help="folder, .zip/.tar/.tar.gz archive or .jsonl file the outputs are written to "
+                             "(default: output)")
+    args = parser.parse_args(argv)
+
+    # The drawings are written as files to output/, wherever the other outputs go
+    output_path = os.path.join(os.getcwd(), "output")
+    if args.draw and os.path.isdir(output_path) == False:
+        os.mkdir(output_path)
+
+    sas_files = []
+    for path in args.paths:
+        sas_files.extend(get_list(path) if os.path.isdir(path) else [path])
+
+    # Lineage across all the programs, only the edges of the programs processed are replaced
+    lineage = LineageGraph.load(args.lineage)
+    file_stats = []
+    with open_sink(args.output) as sink:
+        try:
+            for file in sas_files:
+                stats = StageStats(enabled=args.metrics is not None)
+                sas = SASProgram(file, write_outputs=not args.lineage_only, stats=stats, sink=sink)
+                file_stats.append((file, "program", sas.stats))
+                lineage.replace_file(os.path.abspath(file), "program", sas.lineage_edges())
+
+                fname = file_stem(file)
+                with sas.stats.stage("write_flow_dot"):
+                    write_flow_dot(sas.lineage_edges(), sink, 'flow_{}.dot'.format(fname))
+                if args.draw:
+                    with sas.stats.stage("draw"):
+                        draw_flow(flow_graph(sas.lineage_edges()),
+                                  os.path.join(output_path, 'data_flow_{}.png'.format(fname)))
+                    print("Wrote data_flow_{}.png".format(fname))
+        finally:
+            # Saved once, the programs processed before a failure (a drawing may stop the run) included
+            lineage.save(args.lineage)
+        lineage.write_dot(sink)
+    if args.metrics is not None:
+        write_file_stats(args.metrics, file_stats, args.metrics_per_file)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Single-pass reader of the tables of PROC SQL steps
+
+.. pseudocode::
+
+    - Walk the text of the step once, token by token: names, numbers, quoted strings, parentheses,
+      commas and ; (comments are skipped, so are * ...; comment statements)
+    - Cut the statements at their ;
+    - Outputs: the table of CREATE TABLE/VIEW, INSERT INTO, UPDATE and DELETE FROM
+    - Inputs: the tables of each FROM clause, separated by commas or JOINs, whatever the depth of the
+      subquery, the UNION/EXCEPT/INTERSECT branch or the inline view it is in, and CREATE TABLE ... LIKE
+    - Each parenthesis keeps the state of the clause it opens in, so that the clause goes on when it
+      closes: an inline view is followed by its alias, data set options by the rest of the FROM clause
+    - Pass-through SQL (CONNECTION TO, EXECUTE) reads tables of another database and is skipped
+
+The state of a parenthesis is pushed and popped once, so a step is read in time linear in its length,
+however its subqueries nest. An unbalanced parenthesis is dropped at the ; ending its statement.
+
+Tables are (library, table), one level names being in the work library. Macro variables are kept in
+the names, &lib..table being in the library "&lib.".
+"""
+import re
+
+# Tokens: comment, quoted string, name, number, parenthesis or comma, ; with the * ...; or %* ...;
+# comment statement following it
+_SQL_TOKEN = re.compile(r"(/\*.*?(?:\*/|\Z))"
+                        r"|('[^']*(?:''[^']*)*'?|\"[^\"]*(?:\"\"[^\"]*)*\"?)"
+                        r"|([a-zA-Z_&%][a-zA-Z0-9_&.]*)"
+                        r"|(\d[a-zA-Z0-9_.]*)"
+                        r"|([(),])"
+                        r"|(;(?:\s|/\*.*?\*/)*(?:%?\*[^;]*)?)", re.DOTALL)
+
+# Keywords ending the table list of a FROM clause
+_CLAUSE_END = frozenset(("where", "group", "having", "order", "union", "except", "intersect"))
+# Keywords read outside of the clauses, any other name there being skipped at once
+_STATEMENT_KEYWORDS = frozenset(("select", "from", "table", "view", "into"))
+
+# States of a clause: reading the table of a FROM clause or JOIN, after it (its alias, data set options),
+# in a JOIN condition, before the table written by a statement, after it, in pass-through SQL
+TABLE, ALIAS, CONDITION, TARGET, AFTER_TARGET, NATIVE = range(1, 7)
+
+
+_MACRO_REFERENCE_END = re.compile(r"&[a-zA-Z0-9_]+\Z")
+
+
+def split_data_name(name):
+    # The dot following a macro variable ends its name: &lib..table is table in the library &lib.,
+    # &prefix.table a one level name
+    dot = name.find(".")
+    while dot >= 0 and _MACRO_REFERENCE_END.search(name, 0, dot):
+        dot = name.find(".", dot + 1)
+    if dot <= 0 or dot == len(name) - 1:
+        return ("work", name)
+    return (name[:dot], name[dot + 1:])
+
+
+def sql_statement_tables(content):
+    """Tables read and written by each statement of a PROC SQL step, in one pass.
+    INPUT:  text of the step
+    OUTPUT: (inputs, outputs) of each statement reading or writing tables, as lists of (library, table)
+            without repeats, in the order they are named
+    """
+    inputs = {}
+    outputs = {}
+    stack = []
+    state = None
+    selected = False
+    first = None
+    opening = None
+    for match in _SQL_TOKEN.finditer(content):
+        kind = match.lastindex
+        if kind == 3:
+            if state == NATIVE:
+                continue
+            name = match.group(3)
+            keyword = name.lower()
+            if first is None:
+                first = keyword
+                if keyword == "update":
+                    state = TARGET
+                    continue
+                if keyword == "execute":
+                    opening = NATIVE
+                    continue
+            elif state is None and keyword not in _STATEMENT_KEYWORDS:
+                continue
+            if state == TABLE:
+                if keyword == "connection":
+                    opening = NATIVE
+                    state = ALIAS
+                elif keyword != "as" and not name.startswith("%"):
+                    inputs[split_data_name(name)] = None
+                    state = ALIAS
+            elif state == TARGET:
+                outputs[split_data_name(name)] = None
+                state = AFTER_TARGET
+            elif keyword == "select":
+                selected = True
+            elif keyword == "from":
+                # FROM only lists tables in a query and in DELETE, not in functions: substring(x from 2)
+                if first == "delete" and not stack and not selected:
+                    state = TARGET
+                elif selected:
+                    state = TABLE
+            elif keyword in ("table", "view"):
+                if first == "create" and state is None and not stack and not outputs:
+                    state = TARGET
+            elif keyword == "into":
+                if first == "insert" and state is None and not stack and not outputs:
+                    state = TARGET
+            elif state == AFTER_TARGET:
+                if keyword == "like":
+                    state = TABLE
+                elif keyword == "as":
+                    state = None
+            elif state in (ALIAS, CONDITION):
+                # Any other name after a table is its alias or a JOIN word
+                if keyword == "join":
+                    state = TABLE
+                elif keyword in ("on", "using"):
+                    state = CONDITION
+                elif keyword in _CLAUSE_END:
+                    state = None
+        elif kind == 5:
+            mark = match.group(5)
+            if mark == "(":
+                stack.append((state, selected))
+                state = NATIVE if state == NATIVE or opening == NATIVE else None
+                selected = False
+                opening = None
+            elif mark == ")":
+                if stack:
+                    former, selected = stack.pop()
+                    # An inline view or pass-through query is followed by its alias
+                    state = ALIAS if former == TABLE else former
+            elif state in (ALIAS, CONDITION):
+                state = TABLE
+        elif kind == 6:
+            if inputs or outputs:
+                yield list(inputs), list(outputs)
+            inputs, outputs = {}, {}
+            del stack[:]
+            state, selected, first, opening = None, False, None, None
+        elif state == TABLE:
+            if kind == 2:
+                # A physical file: from "/data/t.sas7bdat"
+                inputs[("none", match.group(2))] = None
+                state = ALIAS
+            elif kind == 4:
+                state = None
+    if inputs or outputs:
+        yield list(inputs), list(outputs)
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing and counters of the parsers
+
+.. pseudocode::
+
+    - Each parse records, for each named stage, its number of calls, its wall time and the number of
+      items it produced (components found, messages segmented, procedures grouped...)
+    - The time of a stage excludes the stages nested in it, so the stages of a parse add up to its time
+    - Stats of many files are merged into the stats of a batch
+    - Stats are written in the Prometheus text format, for the node exporter textfile collector
+    - A disabled StageStats records nothing: each stage then costs one attribute check
+"""
+import os
+import time
+import tempfile
+import functools
+
+
+class Stage:
+    """Timing of one run of a stage. Set items to the number of items the stage produced."""
+    __slots__ = ("stats", "name", "items", "start", "nested")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.items = 0
+
+    def enter(self):
+        self.nested = 0.0
+        self.stats.active.append(self)
+        self.start = time.perf_counter()
+
+    def exit(self):
+        """Stop the stage. Returns its time, without the time of the stages nested in it."""
+        elapsed = time.perf_counter() - self.start
+        active = self.stats.active
+        active.pop()
+        if active:
+            active[-1].nested += elapsed
+        return elapsed - self.nested
+
+    def __enter__(self):
+        self.enter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.record(self.name, self.exit(), self.items)
+        return False
+
+
+class NullStage:
+    """Stage of a disabled StageStats."""
+    __slots__ = ("items",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class StageStats:
+    """Wall time, calls and items of the named stages of one or many parses, and named counters.
+    INPUT:  enabled, False to record nothing
+    OUTPUT: stages {name: [calls, seconds, items]}, counters {name: count}
+    """
+    __slots__ = ("enabled", "stages", "counters", "active")
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.active = []
+
+    def stage(self, name):
+        """Context manager timing a run of stage name."""
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def record(self, name, seconds, items=0, calls=1):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [calls, seconds, items]
+        else:
+            stage[0] += calls
+            stage[1] += seconds
+            stage[2] += items
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed_iter(self, name, iterable):
+        """Iterate over iterable, timing the production of its items as one run of stage name."""
+        if not self.enabled:
+            return iterable
+        return self.iter_stage(name, iterable)
+
+    def iter_stage(self, name, iterable):
+        iterator = iter(iterable)
+        stage = Stage(self, name)
+        seconds = 0.0
+        items = 0
+        try:
+            while True:
+                stage.enter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += stage.exit()
+                items += 1
+                yield item
+        finally:
+            self.record(name, seconds, items)
+
+    def merge(self, other):
+        for name, (calls, seconds, items) in other.stages.items():
+            self.record(name, seconds, items, calls)
+        for name, n in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        return self
+
+    def seconds(self):
+        return sum(seconds for calls, seconds, items in self.stages.values())
+
+    def rows(self):
+        """(stage, calls, seconds, items) from the slowest stage."""
+        return sorted(((name,) + tuple(stage) for name, stage in self.stages.items()),
+                      key=lambda row: row[2], reverse=True)
+
+
+def instrumented(name, items=None):
+    """Record the calls of a method as a stage of self.stats.
+    name is the stage name, or a function of the arguments of the call returning it. items is a function
+    of the result returning the number of items produced.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stats = self.stats
+            if not stats.enabled:
+                return method(self, *args, **kwargs)
+            with stats.stage(name(self, *args, **kwargs) if callable(name) else name) as stage:
+                result = method(self, *args, **kwargs)
+                if items is not None:
+                    stage.items = items(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def prometheus_labels(labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join('{}="{}"'.format(key, escape(value)) for key, value in labels) + "}"
+
+
+def prometheus_text(series, prefix="sas_parser"):
+    """Stats in the Prometheus text format.
+    INPUT:  (labels, StageStats) pairs, labels being (name, value) pairs common to the samples of the
+            stats, metric name prefix
+    OUTPUT: <prefix>_stage_seconds_total, <prefix>_stage_calls_total, <prefix>_stage_items_total
+            labelled by stage, <prefix>_count_total labelled by counter
+    """
+    series = list(series)
+    lines = []
+    for metric, index, help_text in (("stage_seconds_total", 1, "Wall time spent in the parser stage"),
+                                     ("stage_calls_total", 0, "Runs of the parser stage"),
+                                     ("stage_items_total", 2, "Items produced by the parser stage")):
+        lines.append("# HELP {}_{} {}".format(prefix, metric, help_text))
+        lines.append("# TYPE {}_{} counter".format(prefix, metric))
+        for labels, stats in series:
+            for name, stage in sorted(stats.stages.items()):
+                lines.append("{}_{}{} {}".format(prefix, metric, prometheus_labels(list(labels) + [("stage", name)]),
+                                                 repr(float(stage[index])) if index == 1 else stage[index]))
+    lines.append("# HELP {}_count_total Parser counters".format(prefix))
+    lines.append("# TYPE {}_count_total counter".format(prefix))
+    for labels, stats in series:
+        for name, n in sorted(stats.counters.items()):
+            lines.append("{}_count_total{} {}".format(prefix, prometheus_labels(list(labels) + [("counter", name)]), n))
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, text):
+    # Replaced atomically, so that a collector never reads the file half written
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as outfile:
+        outfile.write(text)
+    # mkstemp creates the file readable by its owner only, the collector may run as another user
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def merge_stats(file_stats):
+    """Stats of many files merged by kind.
+    INPUT:  (file, kind, StageStats) of each file
+    OUTPUT: {kind: StageStats}
+    """
+    merged = {}
+    for file, kind, stats in file_stats:
+        merged.setdefault(kind, StageStats()).merge(stats)
+    return merged
+
+
+def write_file_stats(path, file_stats, per_file=False):
+    """Write the stats of the files parsed to a Prometheus text file: the stats merged by kind of file
+    and, with per_file, the stats of each file as sas_parser_file_* metrics, so that a sum over one
+    metric never counts a file twice."""
+    file_stats = list(file_stats)
+    text = prometheus_text(((("kind", kind),), stats) for kind, stats in sorted(merge_stats(file_stats).items()))
+    if per_file:
+        text += prometheus_text([((("file", file), ("kind", kind)), stats) for file, kind, stats in file_stats],
+                                prefix="sas_parser_file")
+    write_prometheus(path, text)
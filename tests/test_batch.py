@@ -0,0 +1,43 @@
+"""Batch driver: results in a deterministic order, failures recorded instead of raised."""
+import os
+
+from sas_batch import run_batch
+from sas_output import MemorySink
+from sas_synthetic import write_job
+
+
+def batch(logs, programs, workers=1):
+    sink = MemorySink()
+    report = run_batch(logs, programs, workers=workers, sink=sink)
+    return report, sink.files
+
+
+def test_same_outputs_whatever_the_workers(tmp_path):
+    paths = [write_job(str(tmp_path), "job{}".format(i), 100, seed=i) for i in range(4)]
+    logs = [log for program, log in paths]
+    programs = [program for program, log in paths]
+    report, files = batch(logs, programs, workers=1)
+    parallel_report, parallel_files = batch(list(reversed(logs)), list(reversed(programs)), workers=2)
+    assert parallel_files == files
+    assert [(result.kind, result.path) for result in parallel_report.results] == \
+        [(result.kind, result.path) for result in report.results]
+    assert list(parallel_report.mapping_rows()) == list(report.mapping_rows())
+    assert not report.failures
+
+
+def test_failure_is_recorded(tmp_path):
+    program, log = write_job(str(tmp_path), "job", 100)
+    missing = str(tmp_path / "missing.sas")
+    report, files = batch([log], [program, missing])
+    assert [result.path for result in report.failures] == [missing]
+    assert "mapping_job.csv" in files and "mapping_log_job.csv" in files
+
+
+def test_same_stem_in_two_folders_is_a_failure(tmp_path):
+    for folder in ("a", "b"):
+        os.makedirs(str(tmp_path / folder))
+        write_job(str(tmp_path / folder), "job", 100)
+    programs = [str(tmp_path / "a" / "job.sas"), str(tmp_path / "b" / "job.sas")]
+    report, files = batch([], programs)
+    assert [result.path for result in report.failures] == [programs[1]]
+    assert "already written for" in report.failures[0].error
@@ -0,0 +1,102 @@
+"""A parse running over its time budget is replaced by the degraded parse of its kind, flagged as partial."""
+import csv
+import os
+import signal
+import time
+
+import pytest
+
+from sas_batch import run_batch
+from sas_budget import TimeBudget, ParseBudgetExceeded
+from sas_log_parser import scan_log, iter_log_procedures
+from sas_output import MemorySink
+from sas_program_mapper import scan_program
+from sas_synthetic import write_job
+
+PROGRAM = """data work.stage;
+  set lib.raw;
+run;
+proc sql;
+  create table mart.facts as
+  select * from work.stage a
+  left join lib.rates b on a.id = b.id;
+quit;
+"""
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="the budget relies on setitimer")
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return [write_job(str(tmp_path), "job{}".format(i), 300, seed=i) for i in range(2)]
+
+
+def test_time_budget():
+    former_handler = signal.getsignal(signal.SIGALRM)
+    with pytest.raises(ParseBudgetExceeded):
+        with TimeBudget(0.01):
+            while True:
+                pass
+    assert signal.getsignal(signal.SIGALRM) is former_handler
+    with TimeBudget(None):
+        time.sleep(0.02)
+    with TimeBudget(1.0):
+        pass
+    # Disarmed when the block ends
+    time.sleep(0.02)
+
+
+def test_scan_log_finds_the_data_sets(jobs):
+    program, log = jobs[0]
+    steps = [(name, data_in, data_out) for name, start, end, data_in, data_out in scan_log(log)]
+    assert steps
+    assert steps == [(sasproc.ProcType.upper(), sasproc.data_in, sasproc.data_out)
+                     for sasproc in iter_log_procedures(log) if sasproc.data_in or sasproc.data_out]
+
+
+def test_scan_program(tmp_path):
+    path = tmp_path / "job.sas"
+    path.write_text(PROGRAM)
+    assert scan_program(str(path)) == [
+        ["DataStep", 0, 2, [("lib", "raw")], [("work", "stage")]],
+        ["ProcSQL", 4, 7, [("work", "stage"), ("lib", "rates")], [("mart", "facts")]],
+    ]
+
+
+def test_over_budget_is_partial(tmp_path, jobs):
+    logs = [log for program, log in jobs]
+    programs = [program for program, log in jobs]
+    cache_dir = str(tmp_path / "cache")
+    sink = MemorySink()
+    report = run_batch(logs, programs, workers=1, cache_dir=cache_dir, budget=1e-6, sink=sink)
+    report.write(sink)
+    assert not report.failures
+    assert sorted(result.path for result in report.partials) == sorted(logs + programs)
+    assert all("budget" in result.partial for result in report.partials)
+
+    # The degraded parse still maps the data sets
+    program, log = jobs[0]
+    log_result = next(result for result in report.results if result.path == log)
+    assert log_result.edges == [(x, y, name, None) for name, start, end, data_in, data_out in scan_log(log)
+                                for x in data_in for y in data_out]
+    assert sink.files["summary_log_job0.txt"].startswith("Partial parse:")
+    assert sink.files["summary_job0.txt"].startswith("Partial parse:")
+    mapping = list(csv.reader(sink.files["mapping_job0.csv"].splitlines()))
+    assert len(mapping) - 1 == len(scan_program(program))
+    partial_rows = list(csv.reader(sink.files["batch_partial.csv"].splitlines()))[1:]
+    assert sorted(row[0] for row in partial_rows) == sorted(logs + programs)
+
+    # Partial records are not cached: the next batch parses the files again, in full with no budget
+    report = run_batch(logs, programs, workers=1, cache_dir=cache_dir, sink=MemorySink())
+    assert not report.partials
+    assert not any(result.cached for result in report.results)
+
+
+def test_within_budget_is_full(jobs):
+    sink = MemorySink()
+    report = run_batch([log for program, log in jobs], [program for program, log in jobs], workers=1,
+                       budget=60, sink=sink)
+    assert not report.partials and not report.failures
+    # Only the partial parse of a log writes a summary
+    assert "summary_log_job0.txt" not in sink.files
+    assert not sink.files["summary_job0.txt"].startswith("Partial parse:")
@@ -0,0 +1,94 @@
+"""Parse cache: keys, hits and misses, eviction, and the outputs restored from a hit."""
+import os
+import shutil
+import time
+
+from sas_batch import run_batch
+from sas_cache import ParseCache, content_key
+from sas_output import MemorySink
+from sas_synthetic import write_job
+
+
+def test_content_key(tmp_path):
+    (tmp_path / "a.sas").write_text("data a; set b; run;\n")
+    (tmp_path / "b.sas").write_text("data a; set b; run;\n")
+    (tmp_path / "c.sas").write_text("data a; set c; run;\n")
+    key = content_key(str(tmp_path / "a.sas"), "program")
+    assert content_key(str(tmp_path / "b.sas"), "program") == key
+    assert content_key(str(tmp_path / "c.sas"), "program") != key
+    assert content_key(str(tmp_path / "a.sas"), "log") != key
+    assert content_key(str(tmp_path / "a.sas"), "program", parser_version="0") != key
+
+
+def test_get_put(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, {"mapping": [["1", "2"]]})
+    assert cache.get("ab" * 32) == {"mapping": [["1", "2"]]}
+    # A damaged entry is a miss
+    with open(cache.entry_path("ab" * 32), "wb") as outfile:
+        outfile.write(b"not zlib")
+    assert cache.get("ab" * 32) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    keys = ["{:02d}".format(i) * 32 for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"text": "x" * 1000})
+        os.utime(cache.entry_path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get(keys[0])
+    size = os.path.getsize(cache.entry_path(keys[0]))
+    cache.max_bytes = 2 * size
+    assert cache.evict() == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def batch(logs, programs, cache_dir=None):
+    sink = MemorySink()
+    report = run_batch(logs, programs, workers=1, cache_dir=cache_dir, sink=sink)
+    return report, sink.files
+
+
+def test_hit_restores_the_outputs(tmp_path):
+    paths = [write_job(str(tmp_path), "job{}".format(i), 100, seed=i) for i in range(2)]
+    logs = [log for program, log in paths]
+    programs = [program for program, log in paths]
+    cache_dir = str(tmp_path / "cache")
+    report, files = batch(logs, programs)
+
+    miss_report, miss_files = batch(logs, programs, cache_dir)
+    assert miss_report.cache_misses == 4 and miss_report.cache_hits == 0
+    hit_report, hit_files = batch(logs, programs, cache_dir)
+    assert hit_report.cache_hits == 4 and hit_report.cache_misses == 0
+    assert miss_files == files
+    assert hit_files == files
+    assert [result.mapping for result in hit_report.results] == [result.mapping for result in report.results]
+
+
+def test_changed_content_is_a_miss(tmp_path):
+    program, log = write_job(str(tmp_path), "job", 100)
+    cache_dir = str(tmp_path / "cache")
+    batch([], [program], cache_dir)
+    with open(program, "a") as outfile:
+        outfile.write("data work.extra;\n  set lib.more;\nrun;\n")
+    report, files = batch([], [program], cache_dir)
+    assert report.cache_misses == 1
+    assert ("lib.more", "work.extra", "DataStep") in [tuple(edge) for edge in report.results[0].edges]
+
+
+def test_same_content_under_two_names(tmp_path):
+    program, log = write_job(str(tmp_path), "job", 100)
+    other = str(tmp_path / "other" / "copy.sas")
+    os.makedirs(os.path.dirname(other))
+    shutil.copy(program, other)
+    cache_dir = str(tmp_path / "cache")
+    batch([], [program], cache_dir)
+    report, files = batch([], [other], cache_dir)
+    assert report.cache_hits == 1
+    fresh_report, fresh_files = batch([], [other])
+    assert files == fresh_files
+    assert "residuals_copy.txt" in files["summary_copy.txt"]
+    assert "residuals_job.txt" not in files["summary_copy.txt"]
@@ -0,0 +1,37 @@
+"""Compact components: slotted objects whose text is sliced from the buffer of the whole file."""
+import pytest
+
+from sas_log_parser import SASLog, SASLogMappedBuffer
+from sas_program_mapper import SASProgram
+from sas_synthetic import write_job
+
+
+@pytest.fixture(scope="module")
+def job(tmp_path_factory):
+    return write_job(str(tmp_path_factory.mktemp("jobs")), "job", 300)
+
+
+def test_program_components(job):
+    program, log = job
+    sas = SASProgram(program, write_outputs=False)
+    data_names = {}
+    for comp in sas.components:
+        assert not hasattr(comp, "__dict__"), type(comp).__name__
+        assert comp.buffer is sas.source
+        assert comp.content == sas.source[comp.begin:comp.stop]
+        for data_name in getattr(comp, "data_in", []) + getattr(comp, "data_out", []):
+            # Each data name is held once, whatever the number of components naming it
+            assert data_names.setdefault(data_name, data_name) is data_name
+
+
+def test_log_messages(job):
+    program, log = job
+    sas_log = SASLog(log, write_outputs=False)
+    lines = sas_log.log_lines
+    assert isinstance(sas_log.log_buffer, SASLogMappedBuffer)
+    for message in sas_log.log_messages:
+        assert not hasattr(message, "__dict__"), type(message).__name__
+        assert message.buffer is sas_log.log_buffer
+        assert message.contents == "".join(lines[message.start_line - 1:message.end_line])
+    for sasproc in sas_log.SAS_procedures:
+        assert not hasattr(sasproc, "__dict__")
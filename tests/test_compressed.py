@@ -0,0 +1,82 @@
+"""Compressed logs and programs parse as their plain copies do."""
+import gzip
+import os
+
+import pytest
+
+from sas_input import compression, list_input_files, open_input
+from sas_log_parser import SASLog, iter_log_procedures, scan_log
+from sas_program_mapper import SASProgram, scan_program
+from sas_synthetic import write_job
+
+
+def compress(path, kind):
+    with open(path, "rb") as infile:
+        data = infile.read()
+    if kind == "gzip":
+        compressed = path + ".gz"
+        with gzip.open(compressed, "wb") as outfile:
+            outfile.write(data)
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        compressed = path + ".zst"
+        with open(compressed, "wb") as outfile:
+            outfile.write(zstandard.ZstdCompressor().compress(data))
+    return compressed
+
+
+@pytest.fixture(scope="module")
+def job(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("jobs"))
+    return write_job(folder, "job", 500)
+
+
+def log_key(log):
+    return (log.log_length, log.log_lines, [(type(comp).__name__, comp.start_line, comp.end_line, comp.contents)
+                                            for comp in log.log_messages])
+
+
+def procedure_keys(sasprocs):
+    return [(sasproc.ProcType, sasproc.start_line, sasproc.end_line, sasproc.data_in, sasproc.data_out,
+             sasproc.data_in_obs, sasproc.data_out_obs, sorted(sasproc.stats.items())) for sasproc in sasprocs]
+
+
+def program_key(sas):
+    return ([(type(comp).__name__, comp.start, comp.end, comp.content) for comp in sas.components],
+            sas.script, list(sas.lineage_edges()))
+
+
+@pytest.mark.parametrize("kind", ["gzip", "zstd"])
+def test_log(job, kind):
+    program, log = job
+    compressed = compress(log, kind)
+    assert compression(compressed) == kind and compression(log) is None
+    assert log_key(SASLog(compressed, write_outputs=False)) == log_key(SASLog(log, write_outputs=False))
+    assert procedure_keys(iter_log_procedures(compressed)) == procedure_keys(iter_log_procedures(log))
+    assert scan_log(compressed) == scan_log(log)
+
+
+@pytest.mark.parametrize("kind", ["gzip", "zstd"])
+def test_program(job, kind):
+    program, log = job
+    compressed = compress(program, kind)
+    assert program_key(SASProgram(compressed, write_outputs=False)) == \
+        program_key(SASProgram(program, write_outputs=False))
+    assert scan_program(compressed) == scan_program(program)
+
+
+def test_compression_from_content(tmp_path):
+    # The first bytes tell the compression, not the name
+    path = str(tmp_path / "renamed.log")
+    with gzip.open(path, "wb") as outfile:
+        outfile.write(b"NOTE: hello\n")
+    assert compression(path) == "gzip"
+    with open_input(path) as infile:
+        assert infile.read() == b"NOTE: hello\n"
+
+
+def test_list_input_files(tmp_path):
+    for name in ("a.log", "b.log.gz", "c.log.zst", "d.sas", "e.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert sorted(os.path.basename(path) for path in list_input_files(str(tmp_path), ".log")) == \
+        ["a.log", "b.log.gz", "c.log.zst"]
@@ -0,0 +1,31 @@
+"""Data sets read and written by the DATA steps of SASProgram."""
+import pytest
+
+from bench_data_steps import STEPS, data_name
+from sas_program_mapper import SASProgram
+
+
+def data_step_edges(tmp_path, text):
+    path = tmp_path / "steps.sas"
+    path.write_text(text)
+    sas = SASProgram(str(path), write_outputs=False)
+    return {(data_name(x), data_name(y)) for step in sas.data_step for x in step.data_in for y in step.data_out}
+
+
+@pytest.mark.parametrize("generate", STEPS, ids=[generate.__name__ for generate in STEPS])
+def test_step_edges(tmp_path, generate):
+    text, expected = generate(0)
+    assert data_step_edges(tmp_path, text) == expected
+
+
+def test_statement_options_after_slash(tmp_path):
+    text = ("data out;\n  set x key=k / unique;\nrun;\n"
+            "data out2;\n  merge a b / nowarn;\n  by id;\nrun;\n")
+    assert data_step_edges(tmp_path, text) == {("work.x", "work.out"), ("work.a", "work.out2"),
+                                               ("work.b", "work.out2")}
+
+
+def test_program_of_all_steps(tmp_path):
+    text = "".join(generate(i)[0] for i, generate in enumerate(STEPS))
+    expected = set().union(*(generate(i)[1] for i, generate in enumerate(STEPS)))
+    assert data_step_edges(tmp_path, text) == expected
@@ -0,0 +1,64 @@
+"""The log, program and batch commands write the same lineage files, where their options say.
+Importing the parsers loads no heavy dependency and writes nothing."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import sas_batch
+import sas_log_parser
+import sas_program_mapper
+import sas_parser
+from conftest import ROOT
+from sas_synthetic import write_job
+
+
+@pytest.fixture
+def job(tmp_path):
+    folder = tmp_path / "jobs"
+    folder.mkdir()
+    return write_job(str(folder), "job", 100)
+
+
+@pytest.mark.parametrize("command", ["log", "program", "batch"])
+def test_lineage_written_once_after_the_files(tmp_path, monkeypatch, job, command):
+    monkeypatch.chdir(tmp_path)
+    program, log = job
+    lineage = str(tmp_path / "graph" / "lineage.json")
+    output = str(tmp_path / "out")
+    if command == "log":
+        sas_log_parser.main([log, "--lineage", lineage, "--output", output])
+    elif command == "program":
+        sas_program_mapper.main([program, "--lineage", lineage, "--output", output])
+    else:
+        sas_batch.main(["--logs", os.path.dirname(log), "--programs", os.path.dirname(program), "--workers", "1",
+                        "--lineage", lineage, "--output", output])
+    with open(lineage) as infile:
+        assert len(json.load(infile)["files"]) == (2 if command == "batch" else 1)
+    assert os.path.isfile(os.path.join(output, "lineage.dot"))
+    # Nothing goes to output/ when --output and --lineage point elsewhere
+    assert not os.path.exists(tmp_path / "output")
+
+
+@pytest.mark.parametrize("module", ["sas_log_parser", "sas_program_mapper", "sas_parser", "sas_batch"])
+def test_import_is_light(tmp_path, module):
+    code = ("import sys; sys.path.insert(0, {!r}); import {}; "
+            "print(','.join(m for m in ('pandas', 'networkx', 'matplotlib', 'tkinter') if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", code.format(ROOT, module)], cwd=str(tmp_path), check=True,
+                            capture_output=True, text=True).stdout.strip()
+    assert loaded == ""
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_library_api_writes_nothing(tmp_path, monkeypatch, job):
+    monkeypatch.chdir(tmp_path)
+    program, log = job
+    sas_log = sas_parser.parse_log(log, instrument=True)
+    sas_program = sas_parser.parse_program(program)
+    assert sas_log.SAS_procedures
+    assert list(sas_program.lineage_edges())
+    assert sas_log.stats.rows()
+    assert [sas_log.path for sas_log in sas_parser.parse_logs([os.path.dirname(log)])] == [log]
+    assert sorted(os.listdir(str(tmp_path))) == ["jobs"]
@@ -0,0 +1,78 @@
+"""A followed log yields the procedures of the whole log, whatever the bytes appended per poll."""
+import random
+
+from sas_log_parser import SASLogFollower, iter_log_procedures
+from sas_synthetic import generate_job
+
+
+def procedure_key(sasproc):
+    return (sasproc.ProcType, sasproc.start_line, sasproc.end_line, sasproc.data_in, sasproc.data_out,
+            sasproc.data_in_obs, sasproc.data_out_obs, sorted(sasproc.stats.items()),
+            [note.contents for note in sasproc.buffer])
+
+
+def follow(path, data, rng, max_bytes):
+    """Procedures of a follower of path, data being appended to it by up to max_bytes between polls."""
+    follower = SASLogFollower(str(path))
+    SAS_procedures = []
+    nb_polls_with_procedures = 0
+    position = 0
+    while position < len(data):
+        size = rng.randint(1, max_bytes)
+        with open(path, "ab") as outfile:
+            outfile.write(data[position:position + size])
+        position += size
+        polled = follower.poll()
+        nb_polls_with_procedures += bool(polled)
+        SAS_procedures.extend(polled)
+    SAS_procedures.extend(follower.close())
+    return SAS_procedures, nb_polls_with_procedures
+
+
+def test_append_and_poll(tmp_path):
+    program, log = generate_job(1000, seed=1)
+    data = log.encode("utf-8")
+    expected = [procedure_key(sasproc) for sasproc in iter_log_procedures(_write(tmp_path / "whole.log", data))]
+    assert expected
+
+    path = tmp_path / "job.log"
+    path.write_bytes(b"")
+    SAS_procedures, nb_polls_with_procedures = follow(path, data, random.Random(0), 4000)
+    assert [procedure_key(sasproc) for sasproc in SAS_procedures] == expected
+    # Procedures come out while the log grows, not all of them at close
+    assert nb_polls_with_procedures > 1
+
+
+def test_no_final_line_break(tmp_path):
+    program, log = generate_job(200, seed=3)
+    data = log.encode("utf-8")
+    # The log stops on the last note of a step, without its line break
+    data = data[:data.rindex(b"NOTE: SAS Institute")].rstrip(b"\n ")
+    expected = [procedure_key(sasproc) for sasproc in iter_log_procedures(_write(tmp_path / "whole.log", data))]
+
+    path = tmp_path / "job.log"
+    path.write_bytes(b"")
+    SAS_procedures, nb_polls_with_procedures = follow(path, data, random.Random(1), 4000)
+    assert [procedure_key(sasproc) for sasproc in SAS_procedures] == expected
+
+
+def test_poll_after_truncation(tmp_path):
+    program, log = generate_job(200, seed=2)
+    data = log.encode("utf-8")
+    path = tmp_path / "job.log"
+    path.write_bytes(data)
+    follower = SASLogFollower(str(path))
+    follower.poll()
+    # A new run of the job replaces the log: the follower starts over
+    path.write_bytes(data[:len(data) // 2])
+    SAS_procedures = follower.poll()
+    with open(path, "ab") as outfile:
+        outfile.write(data[len(data) // 2:])
+    SAS_procedures += follower.poll() + follower.close()
+    expected = [procedure_key(sasproc) for sasproc in iter_log_procedures(str(path))]
+    assert [procedure_key(sasproc) for sasproc in SAS_procedures] == expected
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
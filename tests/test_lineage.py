@@ -0,0 +1,105 @@
+"""Corpus wide lineage graph: WORK namespaces, incremental replacement of the edges of a file."""
+import pytest
+
+pytest.importorskip("networkx")
+
+from sas_batch import run_batch
+from sas_lineage import LineageGraph, qualify_data_name, lineage_edge
+from sas_output import MemorySink
+from sas_synthetic import write_job
+
+EXTRACT = [["LIB.RAW", "WORK.STAGE", "DATASTEP"], ["WORK.STAGE", "Shared.Facts", "PROC SORT"]]
+REPORT = [["shared.FACTS", "WORK.STAGE", "PROC SQL", 12], ["WORK.STAGE", "OUT.REPORT", "DATASTEP", 12]]
+
+
+def edges(lineage):
+    return sorted((node_in, node_out, attributes["label"], attributes["file"], attributes.get("weight"))
+                  for node_in, node_out, attributes in lineage.graph.edges(data=True))
+
+
+def test_qualify_data_name():
+    assert qualify_data_name("Shared.Facts", "a.sas") == "shared.facts"
+    assert qualify_data_name("WORK.Stage", "a.sas") == "a.sas::work.stage"
+    assert qualify_data_name("_NULL_", "a.sas") == "_NULL_"
+
+
+def test_lineage_edge():
+    assert lineage_edge(("a.x", "b.y", "DATASTEP")) == ["a.x", "b.y", "DATASTEP", None]
+    assert lineage_edge(("a.x", "b.y", "DATASTEP", "7")) == ["a.x", "b.y", "DATASTEP", 7]
+
+
+def test_files_share_libraries_not_work():
+    lineage = LineageGraph()
+    assert lineage.replace_file("extract.sas", "program", EXTRACT)
+    assert lineage.replace_file("report.log", "log", REPORT)
+    assert edges(lineage) == [
+        ("extract.sas::work.stage", "shared.facts", "PROC SORT", "extract.sas", None),
+        ("lib.raw", "extract.sas::work.stage", "DATASTEP", "extract.sas", None),
+        ("report.log::work.stage", "out.report", "DATASTEP", "report.log", 12),
+        ("shared.facts", "report.log::work.stage", "PROC SQL", "report.log", 12),
+    ]
+    # The tables of one program flow into those of the other through their shared library
+    assert lineage.downstream("lib.raw") == {"extract.sas::work.stage", "shared.facts",
+                                             "report.log::work.stage", "out.report"}
+    assert lineage.upstream("out.report") == {"lib.raw", "extract.sas::work.stage", "shared.facts",
+                                              "report.log::work.stage"}
+
+
+def test_replace_file():
+    lineage = LineageGraph()
+    lineage.replace_file("extract.sas", "program", EXTRACT)
+    lineage.replace_file("report.log", "log", REPORT)
+    # Unchanged edges leave the graph as it is
+    assert not lineage.replace_file("extract.sas", "program", [list(edge) for edge in EXTRACT])
+    # Changed edges replace those of the file only, nodes referenced by no edge left go with them
+    assert lineage.replace_file("extract.sas", "program", [["LIB.RAW", "SHARED.FACTS", "PROC SORT"]])
+    assert edges(lineage) == [
+        ("lib.raw", "shared.facts", "PROC SORT", "extract.sas", None),
+        ("report.log::work.stage", "out.report", "DATASTEP", "report.log", 12),
+        ("shared.facts", "report.log::work.stage", "PROC SQL", "report.log", 12),
+    ]
+    assert "extract.sas::work.stage" not in lineage.graph
+    lineage.remove_file("report.log")
+    assert len(lineage) == 1
+    assert sorted(lineage.graph.nodes()) == ["lib.raw", "shared.facts"]
+
+
+def test_save_and_load(tmp_path):
+    lineage = LineageGraph()
+    lineage.replace_file("extract.sas", "program", EXTRACT)
+    lineage.replace_file("report.log", "log", REPORT)
+    path = str(tmp_path / "lineage.json")
+    lineage.save(path)
+    loaded = LineageGraph.load(path)
+    assert loaded.files == lineage.files
+    assert edges(loaded) == edges(lineage)
+    assert not loaded.replace_file("report.log", "log", REPORT)
+    assert len(LineageGraph.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_write_dot():
+    lineage = LineageGraph()
+    lineage.replace_file("C:\\jobs\\extract.sas", "program", EXTRACT)
+    sink = MemorySink()
+    lineage.write_dot(sink)
+    text = sink.files["lineage.dot"]
+    # Namespaces and Windows paths are quoted, not read as ports
+    assert '"C:/jobs/extract.sas::work.stage"' in text
+    assert '"shared.facts"' in text
+
+
+def test_batch_updates_changed_files_only(tmp_path):
+    paths = [write_job(str(tmp_path), "job{}".format(i), 60, seed=i) for i in range(2)]
+    logs = [log for program, log in paths]
+    programs = [program for program, log in paths]
+    lineage = LineageGraph()
+    report = run_batch(logs, programs, workers=1, sink=MemorySink())
+    assert report.update_lineage(lineage) == 4
+    nb_edges = lineage.graph.number_of_edges()
+    assert nb_edges == sum(len(result.edges) for result in report.results)
+
+    # job0 is run again, its program and log changing: only their edges are replaced
+    write_job(str(tmp_path), "job0", 80, seed=10)
+    report = run_batch(logs, programs, workers=1, sink=MemorySink())
+    assert report.update_lineage(lineage) == 2
+    assert lineage.graph.number_of_edges() == sum(len(result.edges) for result in report.results)
@@ -0,0 +1,65 @@
+"""MappingTable writes the csv files the former one-row DataFrame appends wrote, byte for byte."""
+import csv
+
+import pytest
+
+from bench_mapping_export import export_columnar, export_row_appends, mapping_rows
+from sas_log_parser import SASLog, log_mapping_row
+from sas_output import MappingTable, MAPPING_COLUMNS, MemorySink, csv_text
+from sas_synthetic import write_job
+
+# Values needing quotes: commas, quotes, line breaks of macro values
+QUOTED_ROWS = [
+    ["1", "1", "3", "DATASTEP", "lib.a|lib.b", "work.x", "1|2", "3", "4"],
+    ["2", "4", "9", "PROC SQL", "lib.\"c\"", "work.y, work.z", "", "", ""],
+    ["3", "10", "12", "MACRO", "", "work.w", "a\nb", "", ""],
+]
+
+
+def test_rows_and_columns():
+    table = MappingTable(MAPPING_COLUMNS)
+    table.extend(QUOTED_ROWS)
+    assert len(table) == len(QUOTED_ROWS)
+    assert [list(row) for row in table.rows()] == QUOTED_ROWS
+
+
+def test_wrong_row_length():
+    table = MappingTable(MAPPING_COLUMNS)
+    with pytest.raises(AssertionError):
+        table.append(["1", "2"])
+
+
+@pytest.mark.parametrize("nb_rows", [0, 1, 250])
+def test_same_bytes_as_row_appends(tmp_path, nb_rows):
+    pytest.importorskip("pandas")
+    export_columnar(str(tmp_path / "columnar.csv"), nb_rows)
+    export_row_appends(str(tmp_path / "appends.csv"), nb_rows)
+    assert (tmp_path / "columnar.csv").read_bytes() == (tmp_path / "appends.csv").read_bytes()
+
+
+def test_quoting_same_bytes_as_dataframe(tmp_path):
+    pandas = pytest.importorskip("pandas")
+    table = MappingTable(MAPPING_COLUMNS)
+    table.extend(QUOTED_ROWS)
+    table.write_csv(str(tmp_path / "columnar.csv"))
+    pandas.DataFrame(QUOTED_ROWS, columns=MAPPING_COLUMNS).to_csv(str(tmp_path / "frame.csv"), index=False)
+    assert (tmp_path / "columnar.csv").read_bytes() == (tmp_path / "frame.csv").read_bytes()
+    assert table.to_dataframe().equals(pandas.DataFrame(QUOTED_ROWS, columns=MAPPING_COLUMNS))
+
+
+def test_csv_text():
+    text = csv_text(MAPPING_COLUMNS, QUOTED_ROWS)
+    assert list(csv.reader(text.splitlines(keepends=True))) == [MAPPING_COLUMNS] + QUOTED_ROWS
+    assert "\r" not in text
+
+
+def test_log_mapping_schema(tmp_path):
+    program, log = write_job(str(tmp_path), "job", 50, seed=2)
+    sink = MemorySink()
+    sas_log = SASLog(log, sink=sink)
+    rows = list(csv.reader(sink.files["mapping_log_job.csv"].splitlines()))
+    assert rows[0] == MAPPING_COLUMNS
+    expected = [log_mapping_row(i, sasproc) for i, sasproc in enumerate(sas_log.SAS_procedures)]
+    expected = [row for row in expected if row is not None]
+    assert expected
+    assert rows[1:] == [[str(value) for value in row] for row in expected]
@@ -0,0 +1,36 @@
+"""The precompiled NOTE classifier agrees with the former per-note regex cascade."""
+import random
+
+import pytest
+
+from bench_note_classifier import NOTE_SAMPLES, LegacyNote
+from sas_log_parser import Note
+
+
+def note_key(note):
+    return (note.Type, note.data_name, note.End_Proc)
+
+
+@pytest.mark.parametrize("contents", NOTE_SAMPLES)
+def test_parity_with_cascade(contents):
+    assert note_key(Note(1, 1, contents)) == note_key(LegacyNote(1, 1, contents))
+
+
+@pytest.mark.parametrize("contents, expected", [
+    (NOTE_SAMPLES[0], ("INPUT", "XREF.ALMDTLIM", False)),
+    (NOTE_SAMPLES[2], ("OUTPUT", "WORK.TRNS", False)),
+    (NOTE_SAMPLES[3], ("DATASTEP", "", True)),
+    (NOTE_SAMPLES[4], ("PROC SORT", "", True)),
+    (NOTE_SAMPLES[6], ("LIBREFDEASSIGN", "XREF", True)),
+    (NOTE_SAMPLES[8], ("", "", True)),
+    (NOTE_SAMPLES[12], ("", "", False)),
+])
+def test_classification(contents, expected):
+    assert note_key(Note(1, 1, contents)) == expected
+
+
+def test_parity_with_cascade_on_mixed_case():
+    rng = random.Random(0)
+    for _ in range(500):
+        contents = "".join(c.lower() if rng.random() < 0.3 else c for c in rng.choice(NOTE_SAMPLES))
+        assert note_key(Note(1, 1, contents)) == note_key(LegacyNote(1, 1, contents)), contents
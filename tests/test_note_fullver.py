@@ -0,0 +1,52 @@
+"""Note_fullver parses its notes by rules table, and groups them into procedures like Note."""
+import pytest
+
+from bench_note_classifier import NOTE_SAMPLES
+from sas_log_parser import Note_fullver, iter_log_procedures
+from sas_synthetic import generate_job
+
+
+def fullver_key(note):
+    return (note.note_type, note.data_input, note.data_output, note.resource, note.observations, note.variables)
+
+
+@pytest.mark.parametrize("contents, expected", [
+    (NOTE_SAMPLES[0], ("READ", "XREF.ALMDTLIM", "", "", 217, None)),
+    (NOTE_SAMPLES[1], ("WRITE", "", "WORK.ERR6", "", 0, None)),
+    (NOTE_SAMPLES[2], ("WRITE", "", "WORK.TRNS", "", 217, 1)),
+    (NOTE_SAMPLES[3], ("STATS", "", "", "DATA statement", None, None)),
+    (NOTE_SAMPLES[4], ("STATS", "", "", "PROCEDURE SORT", None, None)),
+    (NOTE_SAMPLES[5], ("READ", "FLT", "", "", 48079, None)),
+    (NOTE_SAMPLES[7], ("LIBREF", "", "XREF", "C:\\data\\xref", None, None)),
+    (NOTE_SAMPLES[9], ("FILEREF", "", "FLT", "Filename=C:\\data\\flt.txt", None, None)),
+    (NOTE_SAMPLES[10], ("READ", "WORK.ERR7", "", "", 0, None)),
+    (NOTE_SAMPLES[11], ("MISC", "", "", "", None, None)),
+])
+def test_parse_contents(contents, expected):
+    assert fullver_key(Note_fullver(1, 1, contents)) == expected
+
+
+@pytest.mark.parametrize("contents, expected", [
+    (NOTE_SAMPLES[0], ("INPUT", "XREF.ALMDTLIM", False)),
+    (NOTE_SAMPLES[2], ("OUTPUT", "WORK.TRNS", False)),
+    (NOTE_SAMPLES[3], ("DATASTEP", "", True)),
+    (NOTE_SAMPLES[4], ("PROC SORT", "", True)),
+    (NOTE_SAMPLES[7], ("LIBREFASSIGN", "XREF", True)),
+])
+def test_procedure_attributes(contents, expected):
+    note = Note_fullver(1, 1, contents)
+    assert (note.Type, note.data_name, note.End_Proc) == expected
+
+
+def test_full_mode_groups_like_short_mode(tmp_path):
+    program, log = generate_job(300, seed=5)
+    path = tmp_path / "job.log"
+    path.write_text(log, encoding="utf-8")
+
+    def procedure_key(sasproc):
+        return (sasproc.ProcType, sasproc.start_line, sasproc.end_line, sasproc.data_in, sasproc.data_out)
+
+    short = [procedure_key(sasproc) for sasproc in iter_log_procedures(str(path))]
+    full = [procedure_key(sasproc) for sasproc in iter_log_procedures(str(path), note_mode="full")]
+    assert short
+    assert full == short
@@ -0,0 +1,73 @@
+"""Every sink writes out the same output files, whatever its kind and buffer size."""
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from sas_batch import run_batch
+from sas_output import OutputSink, MemorySink, DirectorySink, open_sink
+from sas_synthetic import write_job
+
+
+@pytest.fixture(scope="module")
+def batch_files(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("jobs"))
+    paths = [write_job(folder, "job{}".format(i), 100, seed=i) for i in range(3)]
+    sink = MemorySink()
+    run_batch([log for program, log in paths], [program for program, log in paths], workers=1, sink=sink)
+    return dict(sink.files)
+
+
+def read_back(path):
+    if os.path.isdir(path):
+        files = {}
+        for name in os.listdir(path):
+            with open(os.path.join(path, name)) as infile:
+                files[name] = infile.read()
+        return files
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            return {name: archive.read(name).decode("utf-8") for name in archive.namelist()}
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as infile:
+            return {item["name"]: item["text"] for item in map(json.loads, infile)}
+    with tarfile.open(path) as archive:
+        return {member.name: archive.extractfile(member).read().decode("utf-8") for member in archive.getmembers()}
+
+
+def test_batch_outputs(batch_files):
+    names = set(batch_files)
+    for stem in ("job0", "job1", "job2"):
+        assert {"mapping_{}.csv".format(stem), "macros_{}.csv".format(stem), "residuals_{}.txt".format(stem),
+                "summary_{}.txt".format(stem), "flow_{}.dot".format(stem), "mapping_log_{}.csv".format(stem),
+                "stats_{}.csv".format(stem), "flow_log_{}.dot".format(stem)} <= names
+    assert "batch_mapping.csv" not in names
+
+
+@pytest.mark.parametrize("name", ["output", "output.zip", "output.tar", "output.tar.gz", "output.jsonl"])
+@pytest.mark.parametrize("buffer_bytes", [0, 1000, None])
+def test_sinks_write_the_same_files(tmp_path, batch_files, name, buffer_bytes):
+    path = str(tmp_path / name)
+    sink = open_sink(path) if buffer_bytes is None else open_sink(path, buffer_bytes)
+    with sink:
+        for filename, text in batch_files.items():
+            sink.write(filename, text)
+    assert read_back(path) == batch_files
+
+
+def test_rewritten_file_replaces_the_buffered_one(tmp_path):
+    with DirectorySink(str(tmp_path / "output")) as sink:
+        sink.write("a.csv", "first\n")
+        sink.write("a.csv", "second\n")
+        assert sink.pending_bytes == len("second\n")
+    assert read_back(str(tmp_path / "output")) == {"a.csv": "second\n"}
+
+
+def test_incomplete_sink_fails_when_created():
+    class NoWriteSink(OutputSink):
+        pass
+
+    with pytest.raises(TypeError):
+        NoWriteSink()
@@ -0,0 +1,15 @@
+"""Programs built to make regular expressions backtrack are parsed within a fixed time bound."""
+import pytest
+
+from bench_pathological import CORPUS, parse_time
+
+SIZE = 20000
+BOUND = 10.0
+
+
+@pytest.mark.parametrize("generate", CORPUS, ids=[generate.__name__ for generate in CORPUS])
+def test_parse_within_bound(tmp_path, generate):
+    # Parsed in a child process, killed at the bound
+    seconds, error = parse_time(str(tmp_path), generate.__name__, generate(SIZE), BOUND)
+    assert seconds is not None, "parse ran over {} seconds".format(BOUND)
+    assert error is None
@@ -0,0 +1,34 @@
+"""Data sets read and written by the PROC steps SASProgram has a handler for."""
+import pytest
+
+from bench_proc_handlers import PROCEDURES
+from sas_program_mapper import SASProgram
+
+
+def proc_edges(tmp_path, text):
+    path = tmp_path / "procs.sas"
+    path.write_text(text)
+    sas = SASProgram(str(path), write_outputs=False)
+    return {(data_in, data_out) for data_in, data_out, name in sas.lineage_edges()}
+
+
+@pytest.mark.parametrize("generate", PROCEDURES, ids=[generate.__name__ for generate in PROCEDURES])
+def test_step_edges(tmp_path, generate):
+    text, expected = generate(0)
+    assert proc_edges(tmp_path, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("proc sort nodupkey data=a out=b;\n  by id;\nrun;\n", {("work.a", "work.b")}),
+    ("proc sort force data=lib.a;\n  by id;\nrun;\n", {("lib.a", "lib.a")}),
+    ("proc import out=work.b dbms=csv datafile='in.csv' replace;\nrun;\n", {("none.'in.csv'", "work.b")}),
+    ("proc export dbms=csv outfile=\"out.csv\" data=lib.a replace;\nrun;\n", {("lib.a", "none.\"out.csv\"")}),
+], ids=["sort_nodupkey", "sort_force", "import", "export"])
+def test_options_before_data(tmp_path, text, expected):
+    assert proc_edges(tmp_path, text) == expected
+
+
+def test_program_of_all_procedures(tmp_path):
+    text = "".join(generate(i)[0] for i, generate in enumerate(PROCEDURES))
+    expected = set().union(*(generate(i)[1] for i, generate in enumerate(PROCEDURES)))
+    assert proc_edges(tmp_path, text) == expected
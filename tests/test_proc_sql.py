@@ -0,0 +1,34 @@
+"""Tables read and written by PROC SQL steps, whatever the statements, subqueries, comments and quotes."""
+import pytest
+
+from bench_proc_sql import FIXTURES
+from sas_program_mapper import SASProgram
+
+
+def sql_edges(tmp_path, text):
+    path = tmp_path / "sql.sas"
+    path.write_text(text)
+    sas = SASProgram(str(path), write_outputs=False)
+    return {(data_in, data_out) for data_in, data_out, name in sas.lineage_edges() if name == "ProcSQL"}
+
+
+@pytest.mark.parametrize("text, expected", [fixture[1:] for fixture in FIXTURES],
+                         ids=[fixture[0] for fixture in FIXTURES])
+def test_step_edges(tmp_path, text, expected):
+    assert sql_edges(tmp_path, text) == expected
+
+
+def test_one_step_of_all_statements(tmp_path):
+    # The statements of every fixture in one step, as in a long PROC SQL step
+    bodies = [text.split("\n", 1)[1].rsplit("quit;", 1)[0] for name, text, expected in FIXTURES]
+    text = "proc sql;\n" + "".join(bodies) + "quit;\n"
+    assert sql_edges(tmp_path, text) == set().union(*(expected for name, text, expected in FIXTURES))
+
+
+def test_steps_after_sql(tmp_path):
+    # The end of the step is found: the DATA step after it is not read as SQL
+    text = FIXTURES[0][1] + "data work.x;\n  set work.a;\nrun;\n"
+    path = tmp_path / "sql.sas"
+    path.write_text(text)
+    sas = SASProgram(str(path), write_outputs=False)
+    assert set(sas.lineage_edges()) == {("lib.b", "work.a", "ProcSQL"), ("work.a", "work.x", "DataStep")}
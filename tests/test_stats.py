@@ -0,0 +1,114 @@
+"""Per-stage timing: nested stages excluded, disabled stats recording nothing, Prometheus text files."""
+import os
+import stat
+
+from sas_batch import run_batch
+from sas_output import MemorySink
+from sas_parser import parse_log, parse_program
+from sas_stats import StageStats, instrumented, merge_stats, prometheus_text, write_file_stats
+from sas_synthetic import write_job
+
+
+class Parser:
+    def __init__(self, stats):
+        self.stats = stats
+
+    @instrumented("find", items=len)
+    def find(self, text):
+        return text.split()
+
+
+def test_nested_stages_excluded():
+    stats = StageStats()
+    with stats.stage("outer") as outer:
+        outer.items = 2
+        with stats.stage("inner"):
+            sum(range(100000))
+    with stats.stage("outer"):
+        pass
+    assert {name: (calls, items) for name, calls, seconds, items in stats.rows()} == \
+        {"outer": (2, 2), "inner": (1, 0)}
+    # Each second is counted in one stage only
+    assert stats.stages["inner"][1] > 0
+    assert abs(stats.seconds() - sum(seconds for _, _, seconds, _ in stats.rows())) < 1e-12
+
+
+def test_timed_iter_and_instrumented():
+    stats = StageStats()
+    assert list(stats.timed_iter("group", iter("abc"))) == ["a", "b", "c"]
+    assert Parser(stats).find("x y z") == ["x", "y", "z"]
+    stats.count("messages:note", 3)
+    assert stats.stages["group"][0] == 1 and stats.stages["group"][2] == 3
+    assert stats.stages["find"][0] == 1 and stats.stages["find"][2] == 3
+    assert stats.counters == {"messages:note": 3}
+
+
+def test_disabled_records_nothing():
+    stats = StageStats(enabled=False)
+    iterable = iter("abc")
+    assert stats.timed_iter("group", iterable) is iterable
+    with stats.stage("outer") as stage:
+        stage.items = 1
+    Parser(stats).find("x y")
+    stats.count("messages:note")
+    assert stats.stages == {} and stats.counters == {}
+
+
+def test_parse_stages(tmp_path):
+    program, log = write_job(str(tmp_path), "job", 100)
+    sas_log = parse_log(log, instrument=True)
+    assert {"segment_classify", "group"} <= set(sas_log.stats.stages)
+    assert sas_log.stats.stages["group"][2] == len(sas_log.SAS_procedures)
+    assert sas_log.stats.counters["messages:Note"] == len(sas_log.note_messages)
+    assert parse_program(program, instrument=True).stats.enabled
+    assert parse_log(log).stats.stages == {}
+
+
+def test_merge_stats():
+    a, b, c = StageStats(), StageStats(), StageStats()
+    a.record("group", 1.0, 10)
+    b.record("group", 2.0, 5)
+    c.record("find", 0.5, 1)
+    a.count("messages:note", 2)
+    b.count("messages:note", 3)
+    merged = merge_stats([("a.log", "log", a), ("b.log", "log", b), ("c.sas", "program", c)])
+    assert merged["log"].stages == {"group": [2, 3.0, 15]} and merged["log"].counters == {"messages:note": 5}
+    assert merged["program"].stages == {"find": [1, 0.5, 1]}
+    # The stats merged are left as they were
+    assert a.stages == {"group": [1, 1.0, 10]}
+
+
+def test_prometheus_text():
+    stats = StageStats()
+    stats.record("group", 1.5, 10)
+    stats.count("messages:note", 4)
+    assert prometheus_text([((("kind", "log"), ("file", 'C:\\a "b".log')), stats)]).splitlines() == [
+        "# HELP sas_parser_stage_seconds_total Wall time spent in the parser stage",
+        "# TYPE sas_parser_stage_seconds_total counter",
+        'sas_parser_stage_seconds_total{kind="log",file="C:\\\\a \\"b\\".log",stage="group"} 1.5',
+        "# HELP sas_parser_stage_calls_total Runs of the parser stage",
+        "# TYPE sas_parser_stage_calls_total counter",
+        'sas_parser_stage_calls_total{kind="log",file="C:\\\\a \\"b\\".log",stage="group"} 1',
+        "# HELP sas_parser_stage_items_total Items produced by the parser stage",
+        "# TYPE sas_parser_stage_items_total counter",
+        'sas_parser_stage_items_total{kind="log",file="C:\\\\a \\"b\\".log",stage="group"} 10',
+        "# HELP sas_parser_count_total Parser counters",
+        "# TYPE sas_parser_count_total counter",
+        'sas_parser_count_total{kind="log",file="C:\\\\a \\"b\\".log",counter="messages:note"} 4',
+    ]
+
+
+def test_write_file_stats(tmp_path):
+    paths = [write_job(str(tmp_path), "job{}".format(i), 60, seed=i) for i in range(2)]
+    report = run_batch([log for program, log in paths], [program for program, log in paths], workers=1,
+                       instrument=True, sink=MemorySink())
+    path = str(tmp_path / "sas_parser.prom")
+    write_file_stats(path, report.file_stats(), per_file=True)
+    with open(path) as infile:
+        lines = infile.read().splitlines()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert 'sas_parser_stage_calls_total{kind="log",stage="group"} 2' in lines
+    assert any(line.startswith('sas_parser_stage_calls_total{kind="program",') for line in lines)
+    for program, log in paths:
+        assert 'sas_parser_file_stage_calls_total{{file="{}",kind="log",stage="group"}} 1'.format(log) in lines
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")]
@@ -0,0 +1,91 @@
+"""STIMER and FULLSTIMER statistics of the steps of a log, ranked from the most expensive step."""
+import csv
+
+import pytest
+
+from sas_log_parser import SASLog, iter_log_procedures, parse_step_stats, log_stats_row, rank_step_stats
+from sas_output import MemorySink, STEP_STATS_COLUMNS
+
+LOG = """NOTE: SAS (r) Proprietary Software 9.4 (TS1M3)
+1          data work.a;
+2            set lib.raw;
+3          run;
+
+NOTE: There were 10 observations read from the data set LIB.RAW.
+NOTE: The data set WORK.A has 10 observations and 2 variables.
+NOTE: DATA statement used (Total process time):
+      real time           0.50 seconds
+      cpu time            0.25 seconds
+      
+
+4          proc sort data=work.a out=lib.sorted;
+5            by id;
+6          run;
+
+NOTE: There were 10 observations read from the data set WORK.A.
+NOTE: The data set LIB.SORTED has 10 observations and 2 variables.
+NOTE: PROCEDURE SORT used (Total process time):
+      real time           1:02.50
+      user cpu time       1.50 seconds
+      system cpu time     0.50 seconds
+      memory              2.5m
+      OS Memory           20480.00k
+      Timestamp           06/04/2018 09:12:01 AM
+      
+
+7          proc print data=lib.sorted;
+8          run;
+
+NOTE: There were 10 observations read from the data set LIB.SORTED.
+NOTE: PROCEDURE PRINT used (Total process time):
+      
+
+"""
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / "job.log"
+    path.write_text(LOG)
+    return str(path)
+
+
+def test_parse_step_stats():
+    assert parse_step_stats("NOTE: DATA statement used (Total process time):\n"
+                            "      real time           0.01 seconds\n"
+                            "      cpu time            0.02 seconds\n") == {"real_time": 0.01, "cpu_time": 0.02}
+    stats = parse_step_stats("NOTE: PROCEDURE SQL used (Total process time):\n"
+                             "      real time           1:00:01.50\n"
+                             "      user cpu time       0.75 seconds\n"
+                             "      system cpu time     0.25 seconds\n"
+                             "      memory              1024.53k\n"
+                             "      OS Memory           1g\n"
+                             "      Timestamp           06/04/2018 09:12:01 AM\n")
+    assert stats == {"real_time": 3601.5, "user_cpu_time": 0.75, "system_cpu_time": 0.25, "cpu_time": 1.0,
+                     "memory": 1024.53, "os_memory": 1024.0 * 1024, "timestamp": "06/04/2018 09:12:01 AM"}
+    assert parse_step_stats("NOTE: PROCEDURE PRINT used (Total process time):\n") == {}
+
+
+def test_procedure_stats(log_path):
+    SAS_procedures = list(iter_log_procedures(log_path))
+    assert [sasproc.ProcType for sasproc in SAS_procedures] == ["DATASTEP", "PROC SORT", "PROC PRINT"]
+    assert SAS_procedures[0].stats == {"real_time": 0.5, "cpu_time": 0.25}
+    assert SAS_procedures[1].stats == {"real_time": 62.5, "user_cpu_time": 1.5, "system_cpu_time": 0.5,
+                                       "cpu_time": 2.0, "memory": 2560.0, "os_memory": 20480.0,
+                                       "timestamp": "06/04/2018 09:12:01 AM"}
+    assert SAS_procedures[2].stats == {}
+    assert log_stats_row(2, SAS_procedures[2]) is None
+    rows = [log_stats_row(i, sasproc) for i, sasproc in enumerate(SAS_procedures)]
+    assert [row[0] for row in rank_step_stats(row for row in rows if row is not None)] == ["1", "0"]
+
+
+def test_stats_file(log_path):
+    sink = MemorySink()
+    SASLog(log_path, sink=sink)
+    rows = list(csv.reader(sink.files["stats_job.csv"].splitlines()))
+    assert rows == [
+        STEP_STATS_COLUMNS,
+        ["1", "1", "17", "27", "PROC SORT", "WORK.A", "LIB.SORTED", "62.5", "2.0", "1.5", "0.5", "2560.0", "20480.0",
+         "06/04/2018 09:12:01 AM"],
+        ["2", "0", "1", "12", "DATASTEP", "LIB.RAW", "WORK.A", "0.5", "0.25", "", "", "", "", ""],
+    ]
@@ -0,0 +1,91 @@
+"""Row volumes of the steps of a log, weighting their lineage edges and aggregated over the runs of a job."""
+import csv
+
+from sas_batch import run_batch
+from sas_lineage import aggregate_edge_volumes
+from sas_log_parser import iter_log_procedures, log_mapping_row, log_lineage_edges, note_counts
+from sas_output import MemorySink, VOLUME_COLUMNS
+
+LOG = """NOTE: SAS (r) Proprietary Software 9.4 (TS1M3)
+1          data work.both;
+2            merge lib.left lib.right;
+3            by id;
+4          run;
+
+NOTE: There were {left} observations read from the data set LIB.LEFT.
+NOTE: There were 7 observations read from the data set LIB.RIGHT.
+NOTE: The data set WORK.BOTH has {both} observations and 5 variables.
+NOTE: DATA statement used (Total process time):
+      real time           0.50 seconds
+      cpu time            0.25 seconds
+      
+
+5          data work.empty;
+6            set work.both;
+7            where id < 0;
+8          run;
+
+NOTE: No observations were selected from data set WORK.BOTH.
+NOTE: No observations in data set WORK.EMPTY.
+NOTE: DATA statement used (Total process time):
+      real time           0.10 seconds
+      cpu time            0.05 seconds
+      
+
+"""
+
+
+def write_log(folder, name, left, both):
+    path = folder / name
+    path.write_text(LOG.format(left=left, both=both))
+    return str(path)
+
+
+def test_note_counts():
+    assert note_counts("NOTE: There were 217 observations read from the data set XREF.A.\n") == (217, None)
+    assert note_counts("NOTE: The data set WORK.TRNS has 217 observations and 1 variables.\n") == (217, 1)
+    assert note_counts("NOTE: 48079 records were read from the infile FLT.\n") == (48079, None)
+    assert note_counts("NOTE: No observations in data set WORK.ERR6.\n") == (0, None)
+    assert note_counts("NOTE: Libref XREF has been deassigned.\n") == (None, None)
+
+
+def test_procedure_volumes(tmp_path):
+    both, empty = iter_log_procedures(write_log(tmp_path, "job.log", 12, 19))
+    assert (both.data_in, both.data_in_obs) == (["LIB.LEFT", "LIB.RIGHT"], [12, 7])
+    assert (both.data_out, both.data_out_obs, both.data_out_vars) == (["WORK.BOTH"], [19], [5])
+    assert log_mapping_row(0, both)[-3:] == ["12|7", "19", "5"]
+    assert log_lineage_edges(both) == [("LIB.LEFT", "WORK.BOTH", "DATASTEP", 12),
+                                       ("LIB.RIGHT", "WORK.BOTH", "DATASTEP", 7)]
+    # "No observations" notes are 0 rows, not unknown ones. As in the former classifier, "No
+    # observations in data set" is an input and "No observations were selected" is neither, so the
+    # step has no edge.
+    assert (empty.data_in, empty.data_in_obs, empty.data_out) == (["WORK.EMPTY"], [0], [])
+    assert log_lineage_edges(empty) == []
+
+
+def test_aggregate_edge_volumes():
+    rows = aggregate_edge_volumes([
+        ("a.log", "lib.x", "work.y", "DATASTEP", 10),
+        ("b.log", "LIB.X", "WORK.Y", "DATASTEP", 30),
+        ("c.log", "lib.x", "work.y", "DATASTEP", 20),
+        ("a.log", "work.y", "lib.z", "PROC SQL", None),
+        ("a.log", "lib.x", "lib.w", "PROC SORT", 5),
+    ])
+    assert rows == [
+        ["LIB.X", "WORK.Y", "DATASTEP", 3, 10, 20, 30],
+        ["LIB.X", "LIB.W", "PROC SORT", 1, 5, 5, 5],
+        ["WORK.Y", "LIB.Z", "PROC SQL", 1, None, None, None],
+    ]
+
+
+def test_batch_volumes(tmp_path):
+    logs = [write_log(tmp_path, "run{}.log".format(i), left, both)
+            for i, (left, both) in enumerate([(12, 19), (100, 107), (50, 57)])]
+    sink = MemorySink()
+    run_batch(logs, [], workers=1, sink=sink).write(sink)
+    rows = list(csv.reader(sink.files["batch_volumes.csv"].splitlines()))
+    assert rows == [
+        VOLUME_COLUMNS,
+        ["LIB.LEFT", "WORK.BOTH", "DATASTEP", "3", "12", "50", "100"],
+        ["LIB.RIGHT", "WORK.BOTH", "DATASTEP", "3", "7", "7", "7"],
+    ]